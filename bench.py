@@ -0,0 +1,325 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+# Benchmark suite for the hot paths of this tool: project generation, template syncing, and
+# file hashing/comparison.
+#
+# Everything runs offline against a synthetic SDK tree of configurable size, and against a
+# temporary copy of the MaximSDK template folders, so the working tree is never modified.  Each
+# benchmark records wall time (median of several repeats), syscall counts and bytes read and
+# written (from /proc/self/io, where available), and peak Python memory (from a separate traced
+# run, since tracing slows everything down).
+#
+#   python bench.py --out bench.json                  # Run the suite
+#   python bench.py --save-baseline bench-base.json   # Save the results as the baseline
+#   python bench.py --baseline bench-base.json        # Fail (exit 1) on regressions
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+here = Path(__file__).parent
+sys.path.insert(0, str(here))
+
+import utils
+
+# Metrics compared against the baseline, with the absolute change below which a difference is
+# considered noise
+COMPARED = {
+    "wall": 0.002,     # seconds
+    "syscalls": 50,
+    "peak_kb": 256
+}
+
+def _proc_io():
+    """Read this process's I/O counters, or None on platforms without /proc/self/io"""
+    try:
+        with open("/proc/self/io", "r") as f:
+            return {k: int(v) for k, v in (line.split(":") for line in f)}
+    except OSError:
+        return None
+
+def make_sdk(root: Path, targets=2, boards=3, examples=20, files=200, file_size=16, seed=0):
+    """
+    Create a synthetic MaximSDK tree: 'examples' example projects and 'boards' BSPs per target,
+    plus a peripheral driver tree of 'files' source files of about 'file_size' KB each.  Files
+    are backdated so that the hash index will accept them.
+    """
+    rng = random.Random(seed)
+    old = time.time() - 3600
+    written = []
+
+    def write(path, data):
+        os.makedirs(path.parent, exist_ok=True)
+        path.write_bytes(data)
+        written.append(path)
+
+    for t in range(targets):
+        target = f"MAX{78000 + t * 2}"
+        for b in range(boards):
+            write(root.joinpath("Libraries", "Boards", target, f"Board_{b}", "board.mk"), b"# Board\n")
+        for e in range(examples):
+            example = root.joinpath("Examples", target, f"Example_{e:03}")
+            write(example.joinpath("Makefile"), b"include $(MAXIM_PATH)/Libraries/CMSIS/Device/Maxim/GCC/gcc.mk\n")
+            write(example.joinpath("project.mk"), b"# Project options\n")
+            write(example.joinpath("main.c"), b"int main(void) { return 0; }\n" * 32)
+
+    for f in range(files):
+        path = root.joinpath("Libraries", "PeriphDrivers", "Source", f"PER{f % 16}", f"per_{f:04}.c")
+        write(path, rng.randbytes(file_size * 1024))
+
+    for path in written:
+        os.utime(path, (old, old))
+
+    return written
+
+def make_workspace(root: Path):
+    """Copy the MaximSDK template folders into 'root' so sync() and generate don't touch the repo"""
+    shutil.copytree(here.joinpath("MaximSDK"), root.joinpath("MaximSDK"), ignore=shutil.ignore_patterns("Template"))
+    os.makedirs(root.joinpath("MaximSDK", "Template"))
+    shutil.copytree(here.joinpath("MaximSDK", "Template", ".vscode"), root.joinpath("MaximSDK", "Template", ".vscode"),
+                    ignore=shutil.ignore_patterns("README.md"))
+    shutil.copy(here.joinpath("README.md"), root)
+
+def measure(setup, fn, repeat) -> dict:
+    """
+    Time 'fn' over 'repeat' runs, calling 'setup' (untimed) before each one.  If 'fn' returns a
+    number it's used as the wall time instead of the measured one (and I/O isn't recorded, since
+    the work happened in another process).  Output from the code under test is discarded.
+    """
+    walls = []
+    ios = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            setup()
+            before = _proc_io()
+            start = time.perf_counter()
+            res = fn()
+            wall = time.perf_counter() - start
+            after = _proc_io()
+            if isinstance(res, float):
+                walls.append(res)
+            else:
+                walls.append(wall)
+                if before is not None:
+                    ios.append({k: after[k] - before[k] for k in ("syscr", "syscw", "rchar", "wchar")})
+
+        setup()
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    result = {
+        "wall": statistics.median(walls),
+        "wall_min": min(walls),
+        "repeat": repeat,
+        "peak_kb": peak // 1024
+    }
+    if ios:
+        result["syscalls"] = min(io["syscr"] + io["syscw"] for io in ios)
+        result["read_bytes"] = min(io["rchar"] for io in ios)
+        result["write_bytes"] = min(io["wchar"] for io in ios)
+    return result
+
+def benchmarks(ws: Path, sdk_dir: Path):
+    """
+    Return the suite as a list of (name, setup, fn).  Imports happen here, after the environment
+    has been pointed at the workspace.
+    """
+    import generate
+    import maintain
+    import sdk
+
+    maintain._vscode_dir = ws
+    generate.template_dir = ws.joinpath("MaximSDK", "Template")
+    generate._defaults = ws.joinpath("MaximSDK", "Inject", ".vscode", "settings.json")
+
+    out_dir = ws.joinpath("out")
+    specs = generate.example_specs(sdk_dir, index=sdk.SDKIndex(sdk_dir))
+    for spec in specs:
+        spec["out_root"] = out_dir.joinpath(spec["target"])
+
+    def clean():
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    def reset_caches():
+        clean()
+        generate._template_cache.clear()
+        generate._defaults_cache = (None, None)
+        generate.synced = False
+        maintain._last_sync = None
+        utils._default_hash_index = None
+        index_file = Path(os.environ["VSCODE_MAXIM_HASH_INDEX"])
+        if index_file.exists():
+            os.remove(index_file)
+
+    def create(**options):
+        for spec in specs:
+            generate.create_project(**{**spec, **options})
+
+    def generated():
+        if not out_dir.exists():
+            create()
+
+    def dirty():
+        generated()
+        for spec in specs:
+            with open(Path(spec["out_root"], spec["out_stem"], ".vscode", "flash.gdb"), "a") as f:
+                f.write("# Local change\n")
+
+    flash_gdb = ws.joinpath("MaximSDK", "Inject", ".vscode", "flash.gdb")
+    flash_gdb_content = flash_gdb.read_bytes()
+    def touch_inject():
+        maintain._last_sync = None
+        flash_gdb.write_bytes(flash_gdb_content + f"# {time.perf_counter()}\n".encode())
+
+    def unsynced():
+        maintain._last_sync = None
+
+    drivers = sdk_dir.joinpath("Libraries", "PeriphDrivers")
+    index = utils.HashIndex(ws.joinpath("bench-hashindex.jsonl"), algorithm="blake2b")
+    def warm_index():
+        if not index._entries:
+            utils.hash_folder(drivers, algorithm="blake2b", index=index)
+
+    content = "".join(f"line {i} of the comparison benchmark\n" for i in range(100000))
+    same = ws.joinpath("compare_same.txt")
+    different = ws.joinpath("compare_different.txt")
+    utils.atomic_write(same, content.replace("\n", os.linesep).encode("utf-8"))
+    utils.atomic_write(different, (content[:-2] + "X\n").replace("\n", os.linesep).encode("utf-8"))
+
+    def import_generate():
+        res = subprocess.run(
+            [sys.executable, "-c", "import time; t = time.perf_counter(); import generate; print(time.perf_counter() - t)"],
+            cwd=here, capture_output=True, text=True, check=True
+        )
+        return float(res.stdout)
+
+    def nothing():
+        pass
+
+    return [
+        ("create_project.cold", reset_caches, create),
+        ("create_project.warm", clean, create),
+        ("create_project.overwrite", generated, lambda: create(overwrite=True)),
+        ("create_project.backup", dirty, lambda: create(overwrite=True, backup=True)),
+        ("sync.unchanged", unsynced, maintain.sync),
+        ("sync.changed", touch_inject, maintain.sync),
+        ("hash_folder.cold", nothing, lambda: utils.hash_folder(drivers, algorithm="blake2b")),
+        ("hash_folder.indexed", warm_index, lambda: utils.hash_folder(drivers, algorithm="blake2b", index=index)),
+        ("compare_content.same", nothing, lambda: utils.compare_content(content, same)),
+        ("compare_content.different", nothing, lambda: utils.compare_content(content, different)),
+        ("import.generate", nothing, import_generate)
+    ]
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compare 'results' to 'baseline' and return a list of regression messages.  A metric regresses
+    when it's more than 'threshold' (a fraction) above the baseline, and the difference is above
+    the metric's noise floor.
+    """
+    regressions = []
+    for name, base in baseline.get("results", {}).items():
+        new = results["results"].get(name)
+        if new is None:
+            continue
+        for metric, floor in COMPARED.items():
+            if metric not in base or metric not in new:
+                continue
+            if new[metric] > base[metric] * (1 + threshold) and new[metric] - base[metric] > floor:
+                regressions.append(f"{name} {metric}: {base[metric]:.4g} -> {new[metric]:.4g} (+{(new[metric] / base[metric] - 1) * 100 if base[metric] else float('inf'):.0f}%)")
+    return regressions
+
+def run_suite(targets=2, boards=3, examples=20, files=200, file_size=16, repeat=5, only=None) -> dict:
+    with tempfile.TemporaryDirectory(prefix="vscode-maxim-bench-") as tmp:
+        ws = Path(tmp)
+        sdk_dir = ws.joinpath("sdk")
+        make_sdk(sdk_dir, targets, boards, examples, files, file_size)
+        make_workspace(ws)
+
+        os.environ["VSCODE_MAXIM_HASH_INDEX"] = str(ws.joinpath("hashindex.jsonl"))
+        os.environ["VSCODE_MAXIM_SDK_INDEX_DIR"] = str(ws.joinpath("sdkindex"))
+
+        results = {}
+        for name, setup, fn in benchmarks(ws, sdk_dir):
+            if only and not any(o in name for o in only):
+                continue
+            results[name] = measure(setup, fn, repeat)
+            r = results[name]
+            print(f"{name:<28} {r['wall'] * 1000:9.2f} ms  {r.get('syscalls', '-'):>8} syscalls  {r['peak_kb']:>7} KB peak")
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "size": {"targets": targets, "boards": boards, "examples": examples, "files": files, "file_size_kb": file_size},
+            "repeat": repeat
+        },
+        "results": results
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("VSCode-Maxim benchmarks")
+    parser.add_argument("--out", type=str, default="bench.json", help="Where to write the results (JSON).")
+    parser.add_argument("--baseline", type=str, required=False, help="Compare against a saved baseline and exit with an error on regressions.")
+    parser.add_argument("--save-baseline", type=str, required=False, help="Also save the results as a baseline to this file.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown relative to the baseline, as a fraction (default 0.25).")
+    parser.add_argument("--targets", type=int, default=2, help="Number of targets in the synthetic SDK.")
+    parser.add_argument("--boards", type=int, default=3, help="Number of boards per target.")
+    parser.add_argument("--examples", type=int, default=20, help="Number of examples per target.")
+    parser.add_argument("--files", type=int, default=200, help="Number of peripheral driver source files to hash.")
+    parser.add_argument("--file-size", type=int, default=16, help="Size of each peripheral driver source file in KB.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs per benchmark.")
+    parser.add_argument("--only", type=str, nargs="+", required=False, help="Only run benchmarks whose name contains one of these strings.")
+    args = parser.parse_args()
+
+    results = run_suite(args.targets, args.boards, args.examples, args.files, args.file_size, args.repeat, args.only)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=4)
+    if args.save_baseline:
+        shutil.copy(args.out, args.save_baseline)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline["meta"]["size"] != results["meta"]["size"]:
+            print(f"[WARNING] Baseline was recorded with a different SDK size: {baseline['meta']['size']}")
+        regressions = compare(results, baseline, args.threshold)
+        for r in regressions:
+            print(f"[REGRESSION] {r}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
@@ -0,0 +1,371 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+# Build matrix analysis for 'maintain.py test'.
+#
+# Not every example can be built for every board of its target: some pin BOARD in their
+# project.mk, some reject boards with $(error ...), and some need hardware (a camera, a display)
+# whose drivers only some boards' board.mk files pull in.  This module works that out up-front
+# from the makefiles and sources, without running make, so impossible builds can be skipped.
+#
+# The analysis is conservative: anything it can't resolve (unknown variables, includes under
+# non-board #if's, headers from outside the board support files) never prunes a build.
+#
+# It also picks a "representative subset" of a matrix: the fewest (example, board) builds that
+# still compile every board support source, use every peripheral driver the examples use, enable
+# every library they enable, and build every example at least once.
+
+import os
+import re
+from pathlib import Path
+
+try:
+    from . import sdk
+except ImportError:
+    import sdk
+
+# Example makefile variables that only make sense on a board whose board.mk references drivers
+# for the matching hardware (ex: CAMERA=OV7692 needs a board with camera drivers)
+CAPABILITY_VARIABLES = {
+    "CAMERA": "camera",
+    "TFT": "tft"
+}
+
+_ASSIGN = re.compile(r"^\s*(?:override\s+|export\s+)?([A-Za-z_][A-Za-z0-9_]*)\s*(\+=|\?=|::=|:=|=)\s*(.*?)\s*$")
+_VAR = re.compile(r"\$[({]([A-Za-z_][A-Za-z0-9_]*)[)}]")
+_BOARD_COND = re.compile(r"""^\s*(ifeq|ifneq)\s*[("']\s*\$[({]BOARD[)}]\s*["']?\s*[,\s]\s*["']?\s*([A-Za-z0-9_]+)""")
+_INCLUDE = re.compile(r'^\s*#\s*include\s*"([^"]+)"')
+_PP_IF = re.compile(r"^\s*#\s*(if|ifdef|ifndef|elif|else|endif)\b(.*)$")
+_PP_BOARD = re.compile(r"^\s*(?:defined\s*\(?\s*)?BOARD_([A-Za-z0-9_]+)\s*\)?\s*$")
+
+SOURCE_SUFFIXES = (".c", ".h", ".cpp", ".hpp", ".cc")
+
+def _mk_lines(path):
+    """Read a makefile with comments stripped and continuation lines joined"""
+    try:
+        with open(path, "r", errors="replace") as f:
+            text = f.read()
+    except OSError:
+        return []
+    text = text.replace("\\\n", " ")
+    return [line.split("#", 1)[0].rstrip() for line in text.splitlines()]
+
+def _expand(value, variables, depth=0):
+    if depth > 8:
+        return value
+    expanded = _VAR.sub(lambda m: variables.get(m.group(1), m.group(0)), value)
+    return expanded if expanded == value else _expand(expanded, variables, depth + 1)
+
+def _mk_variables(lines, variables):
+    """
+    Collect the variable assignments in a makefile, following every branch of every conditional.
+    Values are expanded with 'variables' (updated in place) as far as possible.
+    """
+    for line in lines:
+        match = _ASSIGN.match(line)
+        if not match:
+            continue
+        name, op, value = match.groups()
+        value = _expand(value, variables)
+        if op == "+=":
+            variables[name] = f"{variables.get(name, '')} {value}".strip()
+        elif op == "?=":
+            variables.setdefault(name, value)
+        else:
+            variables[name] = value
+    return variables
+
+def _base_variables(maxim_path, target, board):
+    libs = maxim_path.joinpath("Libraries").as_posix()
+    return {
+        "MAXIM_PATH": maxim_path.as_posix(),
+        "LIBS_DIR": libs,
+        "CMSIS_ROOT": f"{libs}/CMSIS",
+        "MISC_DRIVERS_DIR": f"{libs}/MiscDrivers",
+        "BOARD_DIR": f"{libs}/Boards/{target}/{board}",
+        "TARGET": target,
+        "TARGET_UC": target.upper(),
+        "TARGET_LC": target.lower(),
+        "BOARD": board
+    }
+
+def _dirs(value, base: Path):
+    """Resolve a whitespace-separated list of folders, dropping anything that doesn't exist"""
+    dirs = []
+    for item in (value or "").split():
+        if "$" in item:
+            continue # Unresolved variable
+        path = base.joinpath(item).resolve()
+        if path.is_dir():
+            dirs.append(path)
+    return dirs
+
+def _headers(dirs):
+    headers = set()
+    for d in dirs:
+        with os.scandir(d) as it:
+            headers.update(e.name for e in it if e.name.endswith((".h", ".hpp")))
+    return headers
+
+def board_info(maxim_path, target, board) -> dict:
+    """
+    Analyze a BSP's board.mk.  Returns {"sources": board support source files (relative to
+    maxim_path), "headers": headers on its include paths, "capabilities": lowercase names of its
+    sources and driver folders}.
+    """
+    maxim_path = Path(maxim_path).resolve()
+    board_dir = maxim_path.joinpath("Libraries", "Boards", target, board)
+    variables = _mk_variables(_mk_lines(board_dir.joinpath("board.mk")), _base_variables(maxim_path, target, board))
+
+    vpath = _dirs(variables.get("VPATH"), board_dir) + [board_dir.joinpath("Source")]
+    ipath = _dirs(variables.get("IPATH"), board_dir) + [board_dir.joinpath("Include")]
+
+    sources = set()
+    for src in variables.get("SRCS", "").split():
+        if "$" in src:
+            continue
+        for d in vpath:
+            if d.joinpath(src).is_file():
+                sources.add(d.joinpath(src).relative_to(maxim_path).as_posix())
+                break
+
+    capabilities = {Path(s).stem.lower() for s in sources}
+    capabilities.update(d.name.lower() for d in vpath + ipath)
+
+    return {
+        "sources": sorted(sources),
+        "headers": _headers(d for d in ipath if d.is_dir()),
+        "capabilities": capabilities
+    }
+
+def _scan_includes(path, includes):
+    """
+    Record the quoted #includes of a source file in 'includes' as {header: boards}, where
+    'boards' is None for includes that apply to every board, or the set of BOARD_<NAME> macro
+    names for includes that only apply inside #ifdef BOARD_<NAME> blocks.  Includes under any
+    other conditional are optional, so they're left out.
+    """
+    stack = [] # Board macro name, or None for any other condition
+    try:
+        with open(path, "r", errors="replace") as f:
+            lines = f.readlines()
+    except OSError:
+        return
+
+    for line in lines:
+        pp = _PP_IF.match(line)
+        if pp:
+            directive, condition = pp.groups()
+            if directive in ("if", "ifdef"):
+                board = _PP_BOARD.match(condition)
+                stack.append(board.group(1).upper() if board else None)
+            elif directive == "ifndef":
+                stack.append(None)
+            elif directive == "elif" and stack:
+                board = _PP_BOARD.match(condition)
+                stack[-1] = board.group(1).upper() if board else None
+            elif directive == "else" and stack:
+                stack[-1] = None
+            elif directive == "endif" and stack:
+                stack.pop()
+            continue
+
+        match = _INCLUDE.match(line)
+        if not match or None in stack:
+            continue
+        header = Path(match.group(1)).name
+        guards = set(stack)
+        if len(guards) > 1:
+            continue # Nested checks for different boards can never all be true
+        if not guards:
+            includes[header] = None
+        elif includes.get(header, set()) is not None:
+            includes.setdefault(header, set()).update(guards)
+
+def example_info(maxim_path, target, example) -> dict:
+    """
+    Analyze an example's project.mk and sources.  Returns {"variables": its project.mk variables,
+    "pinned": the board it fixes BOARD to, "requires": boards it accepts (from ifneq/$(error)
+    checks, or None), "rejects": boards it rejects, "includes": see _scan_includes, "headers":
+    headers it provides itself, "sources": SDK driver sources it adds to its build, "libraries":
+    libraries it enables (LIB_X=1)}.
+    """
+    maxim_path = Path(maxim_path).resolve()
+    example = Path(example)
+    lines = _mk_lines(example.joinpath("project.mk"))
+
+    # Variables set by the example itself (not just defaulted with ?=)
+    variables = {}
+    for line in lines:
+        match = _ASSIGN.match(line)
+        if match and match.group(2) != "?=":
+            variables[match.group(1)] = match.group(3)
+    pinned = sdk.find_pinned_board(lines)
+
+    # Boards rejected with $(error ...) inside 'ifeq/ifneq ($(BOARD),X)' blocks
+    requires = None
+    rejects = set()
+    stack = [] # (equal, board) for BOARD comparisons, None for other conditionals
+    for line in lines:
+        cond = _BOARD_COND.match(line)
+        if cond:
+            stack.append((cond.group(1) == "ifeq", cond.group(2)))
+        elif sdk._MK_COND.match(line):
+            stack.append(None)
+        elif line.strip() == "else" and stack and stack[-1] is not None:
+            stack[-1] = (not stack[-1][0], stack[-1][1])
+        elif line.strip() == "else" and stack:
+            pass
+        elif line.strip() == "endif" and stack:
+            stack.pop()
+        elif "$(error" in line and len(stack) == 1 and stack[0] is not None:
+            equal, board = stack[0]
+            if equal:
+                rejects.add(board)
+            else:
+                requires = (requires or set()) | {board}
+
+    includes = {}
+    for dirpath, subdirs, files in os.walk(example):
+        subdirs[:] = sorted(d for d in subdirs if d not in ("build", ".vscode"))
+        for file in sorted(files):
+            if file.endswith(SOURCE_SUFFIXES):
+                _scan_includes(Path(dirpath).joinpath(file), includes)
+
+    # Headers the example provides itself: its own tree, and anything on its project.mk IPATH
+    expanded = _mk_variables(lines, _base_variables(maxim_path, target, "$(BOARD)"))
+    headers = set()
+    for dirpath, subdirs, files in os.walk(example):
+        headers.update(f for f in files if f.endswith((".h", ".hpp")))
+    headers |= _headers(_dirs(expanded.get("IPATH"), example))
+
+    # SDK driver sources the example compiles in itself (ex: MiscDrivers added with VPATH/SRCS)
+    sources = set()
+    libraries_dir = maxim_path.joinpath("Libraries")
+    vpath = _dirs(expanded.get("VPATH"), example)
+    for src in expanded.get("SRCS", "").split():
+        for d in vpath:
+            if d.joinpath(src).is_file() and libraries_dir in d.parents:
+                sources.add(d.joinpath(src).relative_to(maxim_path).as_posix())
+                break
+
+    return {
+        "variables": variables,
+        "pinned": pinned,
+        "requires": requires,
+        "rejects": rejects,
+        "includes": includes,
+        "headers": headers,
+        "sources": sorted(sources),
+        "libraries": sorted(k for k, v in variables.items() if k.startswith("LIB_") and v.strip() == "1")
+    }
+
+def check(example: dict, board: str, info: dict, board_headers: set):
+    """
+    Check whether an example (see example_info) can be built for 'board' (see board_info).
+    'board_headers' is the set of headers provided by any board of the target.  Returns None if
+    it can, or the reason it can't.
+    """
+    if example["pinned"] is not None and example["pinned"] != board:
+        return f"project.mk sets BOARD={example['pinned']}"
+    if example["requires"] is not None and board not in example["requires"]:
+        return f"project.mk only supports {', '.join(sorted(example['requires']))}"
+    if board in example["rejects"]:
+        return f"project.mk rejects BOARD={board}"
+
+    for var, capability in CAPABILITY_VARIABLES.items():
+        if example["variables"].get(var) and not any(capability in c for c in info["capabilities"]):
+            return f"{var}={example['variables'][var]} needs a board with {capability} drivers"
+
+    macro = board.upper()
+    for header, guards in sorted(example["includes"].items()):
+        if guards is not None and macro not in guards:
+            continue
+        if header in board_headers and header not in info["headers"] and header not in example["headers"]:
+            return f"includes {header}, which {board} doesn't provide"
+
+    return None
+
+def _periph_headers(maxim_path, target):
+    include = maxim_path.joinpath("Libraries", "PeriphDrivers", "Include")
+    if include.joinpath(target).is_dir():
+        include = include.joinpath(target)
+    return _headers([include]) if include.is_dir() else set()
+
+def analyze(maxim_path, target, boards, examples):
+    """
+    Work out which (example, board) combinations of a target's matrix can be built.  Returns
+    (valid, pruned) where 'valid' maps each combination to the set of driver units it covers
+    (board support sources, peripheral driver headers used, and libraries enabled), and 'pruned'
+    maps each impossible combination to the reason.
+    """
+    maxim_path = Path(maxim_path).resolve()
+    boards_info = {b: board_info(maxim_path, target, b) for b in boards}
+    board_headers = set().union(*(i["headers"] for i in boards_info.values())) if boards_info else set()
+    periph = _periph_headers(maxim_path, target)
+
+    valid = {}
+    pruned = {}
+    for example in examples:
+        e = example_info(maxim_path, target, example)
+        for board in boards:
+            info = boards_info[board]
+            reason = check(e, board, info, board_headers)
+            if reason is not None:
+                pruned[(example, board)] = reason
+                continue
+
+            units = set(info["sources"]) | set(e["sources"])
+            macro = board.upper()
+            units.update(f"PeriphDrivers/{h}" for h, guards in e["includes"].items()
+                         if h in periph and (guards is None or macro in guards))
+            units.update(f"lib:{lib}" for lib in e["libraries"])
+            valid[(example, board)] = units
+
+    return valid, pruned
+
+def representative(valid: dict) -> list:
+    """
+    Pick the fewest combinations (greedily) from analyze()'s 'valid' matrix that together cover
+    every driver unit covered by the full matrix, plus one build of every example the cover
+    missed.  Ties go to the first combination in sorted order, so the subset is stable between
+    runs.  If no driver units were found at all there's nothing to cover, so the full matrix is
+    returned.
+    """
+    candidates = sorted(valid, key=lambda c: (str(c[0]), c[1]))
+    remaining = set().union(*valid.values()) if valid else set()
+    if not remaining:
+        return candidates
+
+    chosen = []
+    while remaining:
+        best = max(candidates, key=lambda c: len(valid[c] & remaining))
+        gain = valid[best] & remaining
+        if not gain:
+            break
+        chosen.append(best)
+        remaining -= gain
+        candidates.remove(best)
+
+    # Every example still gets built once, on the board that exercises the most of it
+    built = {example for example, board in chosen}
+    for example in sorted({c[0] for c in candidates} - built, key=str):
+        chosen.append(max((c for c in candidates if c[0] == example), key=lambda c: len(valid[c])))
+    return chosen
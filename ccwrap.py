@@ -0,0 +1,427 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+# Compiler launcher used by the maintain.py build tests.
+#
+# Shim scripts named after the toolchain compilers (see install_shims) are put at the front of the
+# PATH for a build.  Each shim runs this script with the name of the compiler it stands in for,
+# which runs the real compiler further down the PATH and, if MSDK_CCWRAP_PROFILE is set, appends
+# a JSON record of the invocation (wall time, CPU time, peak memory) to that file.  If
+# MSDK_CCWRAP_COMPDB is set, each compile's command line is also appended to that file, for
+# building a compile_commands.json (see compdb.py).
+#
+# If MSDK_CCWRAP_CACHE is set, compiles also go through a content-addressed object cache in that
+# folder.  An external 'ccache' is used when one is installed, otherwise a pure-Python stand-in
+# caches objects keyed on the preprocessed source (like ccache's preprocessor mode), evicting
+# the least recently used objects to stay under MSDK_CCWRAP_CACHE_SIZE.
+
+import os, sys
+import json
+import hashlib
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+# Also run directly by the compiler shims, outside of the package
+try:
+    from . import utils
+except ImportError:
+    import utils
+
+COMPILERS = [
+    "arm-none-eabi-gcc",
+    "arm-none-eabi-g++",
+    "riscv-none-elf-gcc",
+    "riscv-none-elf-g++"
+]
+
+SOURCE_SUFFIXES = (".c", ".cc", ".cpp", ".cxx", ".s", ".S")
+
+DEFAULT_CACHE_SIZE = 5 * 1024 * 1024 * 1024
+
+# Options that only affect preprocessing.  Their effect shows up in the preprocessed output, so
+# they're left out of the cache key.  Options in the second list take a separate value.
+_PREPROCESSOR_FLAGS = ("-I", "-D", "-U", "-MD", "-MMD", "-MP")
+_PREPROCESSOR_ARGS = ("-MF", "-MT", "-MQ", "-isystem", "-iquote", "-idirafter", "-include", "-imacros")
+
+# Options whose extra outputs the Python cache doesn't handle
+_UNCACHEABLE = ("-save-temps", "--coverage", "-ftest-coverage", "-fprofile-arcs", "-M", "-MM", "-E", "-S")
+
+# Sources that don't go through the preprocessor, so "-E" prints nothing to key them on
+_UNPREPROCESSED_SUFFIXES = (".s",)
+
+def default_cache_dir() -> Path:
+    return Path(os.environ.get("MSDK_CCWRAP_CACHE", Path.home().joinpath(".cache", "vscode-maxim", "ccache")))
+
+def parse_size(size) -> int:
+    """
+    Parse a cache size such as 500M, 5G, or a plain number of bytes
+    """
+    size = str(size).strip().upper()
+    for suffix, scale in [("K", 1024), ("M", 1024 ** 2), ("G", 1024 ** 3)]:
+        if size.endswith(suffix):
+            return int(float(size[:-1]) * scale)
+    return int(size)
+
+def install_shims(shim_dir, compilers=COMPILERS, env=None):
+    """
+    Write a shim for each compiler into 'shim_dir' that runs it through this launcher, and return
+    'shim_dir'.  Put 'shim_dir' at the front of the PATH to use them.  Any 'env' variables are
+    set by the shims themselves (ex: MSDK_CCWRAP_CACHE for the shims used by generated projects).
+    """
+    shim_dir = Path(shim_dir).resolve()
+    os.makedirs(shim_dir, exist_ok=True)
+    launcher = Path(__file__).resolve()
+    env = dict(env or {}, MSDK_CCWRAP_SHIMS=str(shim_dir))
+    for compiler in compilers:
+        if sys.platform == "win32":
+            shim = shim_dir.joinpath(f"{compiler}.cmd")
+            lines = ["@echo off"] + [f'set "{k}={v}"' for k, v in env.items()]
+            lines.append(f'"{sys.executable}" "{launcher}" {compiler} %*')
+            shim.write_text("\r\n".join(lines) + "\r\n")
+        else:
+            shim = shim_dir.joinpath(compiler)
+            lines = ["#!/bin/sh"] + [f'export {k}="{v}"' for k, v in env.items()]
+            lines.append(f'exec "{sys.executable}" "{launcher}" {compiler} "$@"')
+            shim.write_text("\n".join(lines) + "\n")
+            shim.chmod(0o755)
+    return shim_dir
+
+def find_compiler(name, env=None):
+    """
+    Locate the real compiler (or other tool) on the PATH, skipping the shim folder.  'env'
+    defaults to this process's environment.
+    """
+    env = os.environ if env is None else env
+    shim_dir = env.get("MSDK_CCWRAP_SHIMS")
+    path = env.get("PATH", "").split(os.pathsep)
+    if shim_dir is not None:
+        path = [p for p in path if p and Path(p).resolve() != Path(shim_dir).resolve()]
+    return shutil.which(name, path=os.pathsep.join(path))
+
+def cache_tool(env=None):
+    """
+    Return the external ccache executable to use, or None to use the Python cache.  Setting
+    MSDK_CCWRAP_CACHE_TOOL=python forces the Python cache.  'env' defaults to this process's
+    environment.
+    """
+    env = os.environ if env is None else env
+    if env.get("MSDK_CCWRAP_CACHE_TOOL") == "python":
+        return None
+    return find_compiler("ccache", env)
+
+def classify(args):
+    """
+    Return (kind, source, output) for a compiler command line.  'kind' is "compile" for a single
+    translation unit (-c), "link" when an output is produced without -c, and "other" otherwise.
+    """
+    output = None
+    if "-o" in args and args.index("-o") + 1 < len(args):
+        output = args[args.index("-o") + 1]
+
+    sources = [a for a in args if a.endswith(SOURCE_SUFFIXES) and not a.startswith("-")]
+    if "-c" in args and len(sources) == 1:
+        return ("compile", sources[0], output)
+    if output is not None and not any(a in args for a in ["-c", "-E", "-S", "-M", "-MM"]):
+        return ("link", None, output)
+    return ("other", None, output)
+
+def run(cmd, capture=False):
+    """
+    Run a command and return (return code, CPU time, peak RSS in KB, captured stdout)
+    """
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE if capture else None)
+    output = p.stdout.read() if capture else None
+    cpu_time = peak_rss = None
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(p.pid, 0)
+        p.returncode = os.waitstatus_to_exitcode(status)
+        cpu_time = usage.ru_utime + usage.ru_stime
+        peak_rss = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    else:
+        p.wait()
+    if capture:
+        p.stdout.close()
+    return (p.returncode, cpu_time, peak_rss, output)
+
+def _arg_value(args, flag):
+    if flag in args and args.index(flag) + 1 < len(args):
+        return args[args.index(flag) + 1]
+    return None
+
+# Stands in for the object path in cached dependency files
+_DEP_TARGET = "@@CCWRAP_TARGET@@"
+
+# Options that change what goes into the dependency file, so they're part of the cache key
+_DEP_MODE_FLAGS = ("-MD", "-MMD", "-MP")
+
+# A bucket is checked against its size limit after about one in this many stores
+_EVICT_EVERY = 32
+
+def cached_compile(compiler, args, cache_dir, max_size):
+    """
+    Compile through the Python object cache.  Returns (return code, cache status, CPU time, peak RSS)
+    where the cache status is "hit", "miss", or "uncacheable".
+    """
+    kind, source, output = classify(args)
+    if (kind != "compile" or output is None or any(a in _UNCACHEABLE for a in args)
+            or source.endswith(_UNPREPROCESSED_SUFFIXES) or _arg_value(args, "-x") == "assembler"):
+        returncode, cpu_time, peak_rss, _ = run([compiler] + args)
+        return (returncode, "uncacheable", cpu_time, peak_rss)
+
+    # Split the command line into what goes into the key, and what's only needed to preprocess
+    key_args = []
+    pp_args = []
+    i = 0
+    while i < len(args):
+        a = args[i]
+        if a in ("-o",) + _PREPROCESSOR_ARGS:
+            if a != "-o" and a not in ("-MF", "-MT", "-MQ"):
+                pp_args += args[i:i + 2]
+            i += 2
+            continue
+        if a == "-c" or a.startswith(_PREPROCESSOR_FLAGS):
+            if a.startswith(("-I", "-D", "-U")):
+                pp_args.append(a)
+        elif a == source:
+            pp_args.append(a)
+        else:
+            key_args.append(a)
+            pp_args.append(a)
+        i += 1
+
+    returncode, pp_cpu, pp_rss, preprocessed = run([compiler] + pp_args + ["-E"], capture=True)
+    if returncode != 0:
+        # Let the real compile report the error
+        returncode, cpu_time, peak_rss, _ = run([compiler] + args)
+        return (returncode, "uncacheable", cpu_time, peak_rss)
+
+    st = os.stat(compiler)
+    h = hashlib.blake2b(digest_size=20)
+    dep_mode = [a for a in args if a in _DEP_MODE_FLAGS]
+    h.update(json.dumps([compiler, st.st_size, st.st_mtime_ns, key_args, dep_mode]).encode("utf-8"))
+    if any(a.startswith("-g") and a != "-g0" for a in args):
+        h.update(os.getcwd().encode("utf-8")) # Debug info embeds the working directory
+    h.update(preprocessed)
+    key = h.hexdigest()
+
+    # Dependency file written by -MD/-MMD, and the make target named in it
+    dep_file = None
+    if "-MD" in args or "-MMD" in args:
+        dep_file = Path(_arg_value(args, "-MF") or Path(output).with_suffix(".d"))
+    dep_target = _arg_value(args, "-MT") or _arg_value(args, "-MQ") or output
+
+    bucket = Path(cache_dir).joinpath(key[0])
+    cached_obj = bucket.joinpath(f"{key}.o")
+    cached_dep = bucket.joinpath(f"{key}.d")
+    if cached_obj.exists() and (dep_file is None or cached_dep.exists()):
+        shutil.copyfile(cached_obj, output)
+        if dep_file is not None:
+            with open(cached_dep, "r", encoding="utf-8") as f:
+                dep_file.write_text(f.read().replace(_DEP_TARGET, dep_target, 1), encoding="utf-8")
+        os.utime(cached_obj) # Mark as recently used for LRU eviction
+        return (0, "hit", pp_cpu, pp_rss)
+
+    returncode, cpu_time, peak_rss, _ = run([compiler] + args)
+    if cpu_time is not None:
+        cpu_time += pp_cpu
+        peak_rss = max(peak_rss, pp_rss)
+    if returncode == 0:
+        os.makedirs(bucket, exist_ok=True)
+        if dep_file is not None and dep_file.exists():
+            with open(dep_file, "r", encoding="utf-8") as f:
+                utils.atomic_write(cached_dep, f.read().replace(dep_target, _DEP_TARGET, 1).encode("utf-8"))
+        with open(output, "rb") as f:
+            utils.atomic_write(cached_obj, f.read())
+        # Each of the 16 buckets gets an even share of the size limit.  Walking the bucket is
+        # expensive, so it's only done for a fixed subset of keys (about one store in _EVICT_EVERY).
+        # 'maintain.py test' also evicts the whole cache at the end of a run.
+        if int(key[1:5], 16) % _EVICT_EVERY == 0:
+            evict(bucket, max_size // 16)
+
+    return (returncode, "miss", cpu_time, peak_rss)
+
+def evict(cache_dir, max_size):
+    """
+    Delete the least recently used objects in 'cache_dir' (recursively) until it holds at most
+    'max_size' bytes.  Returns the size of the cache afterwards.
+    """
+    entries = []
+    for dirpath, _, files in os.walk(cache_dir):
+        for f in files:
+            if f.endswith(".o"):
+                obj = Path(dirpath).joinpath(f)
+                try:
+                    st = obj.stat()
+                    dep = obj.with_suffix(".d")
+                    size = st.st_size + (dep.stat().st_size if dep.exists() else 0)
+                except FileNotFoundError:
+                    continue # Evicted by another process
+                entries.append((st.st_mtime, size, obj))
+
+    total = sum(e[1] for e in entries)
+    for _, size, obj in sorted(entries):
+        if total <= max_size:
+            break
+        for f in (obj, obj.with_suffix(".d")):
+            try:
+                os.remove(f)
+            except FileNotFoundError:
+                pass
+        total -= size
+
+    return total
+
+def main(argv):
+    name, args = argv[1], argv[2:]
+    compiler = find_compiler(name)
+    if compiler is None:
+        print(f"ccwrap: failed to find '{name}' on the PATH", file=sys.stderr)
+        return 127
+
+    start = time.perf_counter()
+    cache_status = None
+    cache_dir = os.environ.get("MSDK_CCWRAP_CACHE")
+    if cache_dir:
+        max_size = parse_size(os.environ.get("MSDK_CCWRAP_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+        tool = cache_tool()
+        if tool is not None:
+            os.environ.setdefault("CCACHE_DIR", str(Path(cache_dir).joinpath("ccache")))
+            os.environ.setdefault("CCACHE_MAXSIZE", str(max_size))
+            returncode, cpu_time, peak_rss, _ = run([tool, compiler] + args)
+        else:
+            returncode, cache_status, cpu_time, peak_rss = cached_compile(compiler, args, cache_dir, max_size)
+    else:
+        returncode, cpu_time, peak_rss, _ = run([compiler] + args)
+    wall = time.perf_counter() - start
+
+    stats = os.environ.get("MSDK_CCWRAP_STATS")
+    if stats and cache_status is not None:
+        with open(stats, "a") as f:
+            f.write(f"{cache_status}\n")
+
+    profile = os.environ.get("MSDK_CCWRAP_PROFILE")
+    if profile:
+        kind, source, output = classify(args)
+        record = {
+            "compiler": name,
+            "kind": kind,
+            "cwd": os.getcwd(),
+            "source": source,
+            "output": output,
+            "returncode": returncode,
+            "wall_time": wall,
+            "cpu_time": cpu_time,
+            "peak_rss_kb": peak_rss,
+            "cache": cache_status
+        }
+        # Single appends of one line are atomic enough for parallel make jobs
+        with open(profile, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    compdb = os.environ.get("MSDK_CCWRAP_COMPDB")
+    if compdb and classify(args)[0] == "compile":
+        with open(compdb, "a") as f:
+            f.write(json.dumps({"directory": os.getcwd(), "arguments": [name] + args}) + "\n")
+
+    return returncode
+
+def cache_stats(stats_file) -> dict:
+    """
+    Count the hits, misses, and uncacheable compiles recorded to a stats file by the Python cache
+    """
+    counts = {"hit": 0, "miss": 0, "uncacheable": 0}
+    if Path(stats_file).exists():
+        with open(stats_file, "r") as f:
+            for line in f:
+                if line.strip() in counts:
+                    counts[line.strip()] += 1
+    return counts
+
+def load_profile(profile):
+    """
+    Read the invocation records written to a profile file.  Missing files give no records.
+    """
+    records = []
+    if Path(profile).exists():
+        with open(profile, "r") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return records
+
+def profile_report(builds, maxim_path, top=20) -> dict:
+    """
+    Aggregate the profiles of a whole build matrix into ranked hot-spot lists.  'builds' is a list
+    of dicts with "target", "board", "project", "wall_time", "peak_rss_kb", and "records" (from
+    load_profile).  Source files are reported relative to 'maxim_path' where possible.
+    """
+    maxim_path = Path(maxim_path)
+    sources = {}
+    links = []
+    examples = {}
+    boards = {}
+    for b in builds:
+        examples.setdefault(f"{b['target']}/{b['project']}", 0.0)
+        examples[f"{b['target']}/{b['project']}"] += b["wall_time"] or 0.0
+        boards.setdefault(f"{b['target']}/{b['board']}", 0.0)
+        boards[f"{b['target']}/{b['board']}"] += b["wall_time"] or 0.0
+
+        for r in b["records"]:
+            if r["kind"] == "compile":
+                source = Path(os.path.normpath(Path(r["cwd"]).joinpath(r["source"])))
+                try:
+                    source = source.relative_to(maxim_path).as_posix()
+                except ValueError:
+                    source = source.as_posix()
+
+                s = sources.setdefault(source, {"source": source, "count": 0, "total_time": 0.0, "max_time": 0.0, "peak_rss_kb": 0})
+                s["count"] += 1
+                s["total_time"] += r["wall_time"]
+                s["max_time"] = max(s["max_time"], r["wall_time"])
+                s["peak_rss_kb"] = max(s["peak_rss_kb"], r["peak_rss_kb"] or 0)
+
+            elif r["kind"] == "link":
+                links.append({
+                    "target": b["target"],
+                    "board": b["board"],
+                    "project": b["project"],
+                    "wall_time": r["wall_time"],
+                    "peak_rss_kb": r["peak_rss_kb"]
+                })
+
+    for s in sources.values():
+        s["mean_time"] = s["total_time"] / s["count"]
+
+    rank = lambda d: sorted(({"name": k, "total_time": v} for k, v in d.items()), key=lambda e: e["total_time"], reverse=True)[:top]
+    return {
+        "sources": sorted(sources.values(), key=lambda s: s["total_time"], reverse=True)[:top],
+        "links": sorted(links, key=lambda l: l["wall_time"], reverse=True)[:top],
+        "examples": rank(examples),
+        "boards": rank(boards),
+        "peak_rss": sorted(({"name": f"{b['target']}/{b['board']}/{b['project']}", "peak_rss_kb": b["peak_rss_kb"] or 0} for b in builds),
+                           key=lambda e: e["peak_rss_kb"], reverse=True)[:top]
+    }
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
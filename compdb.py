@@ -0,0 +1,160 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+# Per-project compile_commands.json (JSON compilation database) generation.
+#
+# IntelliSense only needs the include paths and defines that a project's sources are actually
+# compiled with.  The database is built from a dry run of the project's Makefile ('make -n -B -w'
+# prints every compile without running it, along with the directory each recipe runs in), or from
+# the compiles that the ccwrap shims record during a real build (MSDK_CCWRAP_COMPDB).
+
+import json
+import os
+import re
+import shlex
+import subprocess
+from pathlib import Path
+
+try:
+    from . import ccwrap
+    from . import utils
+except ImportError:
+    import ccwrap
+    import utils
+
+_DIRECTORY = re.compile(r"^\S*?(?:\[\d+\])?: (Entering|Leaving) directory [`'\"](.*)['\"]\s*$")
+
+# Shell operators that separate the commands on a recipe line
+_SEPARATORS = ("&&", "||", ";", "|", "&", ";;")
+
+def is_compiler(arg) -> bool:
+    name = Path(arg).name
+    if name.lower().endswith(".exe"):
+        name = name[:-4]
+    return name in ccwrap.COMPILERS or name.endswith(("gcc", "g++", "clang", "clang++"))
+
+def _entry(directory, arguments):
+    """
+    Return the database entry for a compiler command line, or None if it doesn't compile a single
+    translation unit
+    """
+    kind, source, output = ccwrap.classify(arguments[1:])
+    if kind != "compile":
+        return None
+    entry = {
+        "directory": Path(directory).as_posix(),
+        "arguments": arguments,
+        "file": Path(directory).joinpath(source).resolve().as_posix()
+    }
+    if output is not None:
+        entry["output"] = output
+    return entry
+
+def parse_dry_run(output: str, directory) -> list:
+    """
+    Parse the commands printed by 'make -n -w' into compilation database entries.  'directory' is
+    the folder make was started in.  Only the first compile of each source file is kept.
+    """
+    directories = [str(directory)]
+    entries = {}
+
+    lines = iter(output.splitlines())
+    for line in lines:
+        # Recipe lines continued with a trailing backslash are printed as-is
+        while line.endswith("\\"):
+            line = line[:-1] + next(lines, "")
+
+        m = _DIRECTORY.match(line)
+        if m:
+            if m.group(1) == "Entering":
+                directories.append(m.group(2))
+            elif len(directories) > 1:
+                directories.pop()
+            continue
+
+        try:
+            lexer = shlex.shlex(line, posix=True, punctuation_chars=True)
+            lexer.whitespace_split = True
+            tokens = list(lexer)
+        except ValueError:
+            continue # Unbalanced quotes, not a command we can use
+
+        command = []
+        for token in tokens + [";"]:
+            if token not in _SEPARATORS:
+                command.append(token)
+                continue
+            if command and is_compiler(command[0]):
+                entry = _entry(directories[-1], command)
+                if entry is not None:
+                    entries.setdefault(entry["file"], entry)
+            command = []
+
+    return list(entries.values())
+
+def from_make(project, target, board, maxim_path=None, env=None, timeout=120, make_args=None) -> list:
+    """
+    Dry-run a project's Makefile for 'target' and 'board' and return its compilation database
+    entries.  Raises an Exception if make fails.  'make_args' are any extra variables to pass
+    (ex: "BUILD_DIR=...").
+    """
+    project = Path(project).resolve()
+    cmd = ["make", "-n", "-B", "-w", "-r", f"TARGET={target.upper()}", f"BOARD={board}"]
+    if maxim_path is not None:
+        cmd.append(f"MAXIM_PATH={Path(maxim_path).as_posix()}")
+    cmd += list(make_args or [])
+
+    # Force the C locale so the "Entering directory" lines aren't translated
+    env = dict(env if env is not None else os.environ, LC_ALL="C")
+    res = subprocess.run(cmd, cwd=project, env=env, capture_output=True, text=True, timeout=timeout)
+    if res.returncode != 0:
+        raise Exception(f"'{' '.join(cmd)}' failed in {project} with return code {res.returncode}: {res.stderr.strip()}")
+
+    return parse_dry_run(res.stdout, project)
+
+def from_records(records) -> list:
+    """
+    Build compilation database entries from the compile records written by the ccwrap shims
+    when MSDK_CCWRAP_COMPDB is set (see ccwrap.main).  Only the first compile of each source
+    file is kept.
+    """
+    entries = {}
+    for r in records:
+        entry = _entry(r["directory"], r["arguments"])
+        if entry is not None:
+            entries.setdefault(entry["file"], entry)
+    return list(entries.values())
+
+def dumps(entries) -> str:
+    return json.dumps(sorted(entries, key=lambda e: e["file"]), indent=4) + "\n"
+
+def write(entries, path) -> bool:
+    """
+    Write a compile_commands.json file, sorted by source file.  The file is only replaced if its
+    content changed, so IntelliSense doesn't re-parse the project for nothing.  Returns True if
+    the file was written.
+    """
+    path = Path(path)
+    content = dumps(entries)
+    if utils.compare_content(content, path):
+        return False
+    os.makedirs(path.parent, exist_ok=True)
+    utils.atomic_write(path, content.replace("\n", os.linesep).encode("utf-8"), mode=utils.PROJECT_FILE_MODE)
+    return True
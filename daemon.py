@@ -0,0 +1,261 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+# Long-running project generation service ('maintain.py serve' and 'maintain.py watch').
+#
+# Every generate.create_project() call in a fresh process pays for the import, parsing the
+# defaults, sync(), and loading the template.  The service does all of that once and keeps the
+# compiled templates and the SDK index in memory, so a generation request only costs the
+# render and the file writes.
+#
+# Every project generated through the service is remembered.  The Inject and Template folders
+# are polled for changes (a stat per file, so a short interval is cheap), and when they change
+# the template is re-synced and the remembered projects are regenerated with the spec they were
+# created with, so a project created without 'overwrite' never has its existing files replaced.
+# Only files whose content actually changes are rewritten (see generate.create_projects).
+#
+# The protocol is one JSON object per line over a TCP socket, with one JSON reply line per request:
+#   {"id", "op": "create_project", "args": {create_project arguments}, "watch": true}
+#   {"id", "op": "create_projects", "specs": [create_projects specs], "watch": true}
+#       -> {"id", "ok": true, "reports": [{"path", "written", "skipped", "unchanged"}]}
+#   {"id", "op": "inject", "targets": [...], "options": {...}}   Every example in the SDK
+#   {"id", "op": "unwatch", "paths": [...]}                       Forget generated projects
+#   {"id", "op": "status"} -> {"id", "ok": true, "maxim_path", "projects", "requests", "regenerations"}
+# Failed requests get {"id", "ok": false, "error"}.  If a token is set, every request must
+# carry it in a "token" field.  Connections are kept open, so clients should reuse them.
+
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from pathlib import Path
+
+try:
+    from . import generate
+    from . import sdk
+except ImportError:
+    import generate
+    import sdk
+
+DEFAULT_PORT = 8710
+DEFAULT_POLL = 0.5 # Seconds between checks of the Inject and Template folders
+
+def _report_to_json(report: dict) -> dict:
+    return {k: str(v) if k == "path" else [str(f) for f in v] for k, v in report.items()}
+
+def _tree_stats(*folders) -> dict:
+    """
+    Map every file below 'folders' to its (size, mtime).  Used to notice edits, additions,
+    and removals without reading anything.
+    """
+    stats = {}
+    for folder in folders:
+        for dirpath, subdirs, files in os.walk(folder):
+            for f in files:
+                path = os.path.join(dirpath, f)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                stats[path] = (st.st_size, st.st_mtime_ns)
+    return stats
+
+class GenerationService:
+    """
+    Warm project generator.  'sync' is the function that copies the master Inject folder into
+    the template (maintain.sync), and 'maxim_path' is the SDK used by "inject" requests (optional).
+    Requests are handled one at a time, and 'workers' threads write each request's files.
+    """
+    def __init__(self, sync, maxim_path=None, workers=8, token=None, logger=print):
+        self.sync = sync
+        self.maxim_path = None if maxim_path is None else Path(maxim_path).resolve()
+        self.workers = workers
+        self.token = token
+        self.logger = logger
+        self.projects = {} # Output folder -> spec of every project to regenerate on template changes
+        self.requests = 0
+        self.regenerations = 0
+        self.lock = threading.RLock()
+
+        # Pay the cold-start costs up-front
+        self.sync()
+        generate.synced = True
+        generate.get_defaults()
+        generate._load_template()
+        self.index = None if self.maxim_path is None else sdk.SDKIndex(self.maxim_path)
+        self._inject_dir = generate.here.joinpath("MaximSDK", "Inject")
+        self._inputs = self._input_stats()
+
+    def _input_stats(self):
+        return _tree_stats(self._inject_dir, generate.template_dir)
+
+    def generate(self, specs: list, watch=True) -> list:
+        with self.lock:
+            reports = generate.create_projects(specs, workers=self.workers)
+            if watch:
+                for spec, report in zip(specs, reports):
+                    self.projects[str(report["path"])] = dict(spec)
+            return reports
+
+    def inject(self, targets=None, watch=True, **options) -> list:
+        """Generate every example project in the SDK (see maintain.inject)"""
+        if self.index is None:
+            raise Exception("The service was started without a MAXIM_PATH")
+        with self.lock:
+            self.index.refresh()
+            options.setdefault("overwrite", True)
+            return self.generate(generate.example_specs(self.maxim_path, targets, index=self.index, **options), watch)
+
+    def poll(self) -> list:
+        """
+        Re-sync and regenerate the remembered projects if anything in the Inject or Template
+        folders changed since the last poll.  Returns the regenerated projects' reports.
+        """
+        with self.lock:
+            inputs = self._input_stats()
+            if inputs == self._inputs:
+                return []
+
+            self.sync()
+            self._inputs = self._input_stats()
+            if not self.projects:
+                return []
+
+            start = time.perf_counter()
+            reports = generate.create_projects(list(self.projects.values()), workers=self.workers)
+            self.regenerations += 1
+            written = [r for r in reports if r["written"]]
+            self.logger(f"[WATCH] Template changed, regenerated {len(reports)} project(s) in {time.perf_counter() - start:.3f}s ({len(written)} updated)")
+            return reports
+
+    def watch(self, stop: threading.Event, interval=DEFAULT_POLL):
+        """Poll for template changes every 'interval' seconds until 'stop' is set"""
+        while not stop.wait(interval):
+            try:
+                self.poll()
+            except Exception as e:
+                self.logger(f"[WATCH] Failed to regenerate projects: {e}")
+
+    def handle(self, request: dict) -> dict:
+        """Handle one protocol request (see the top of this file) and return the reply"""
+        reply = {"id": request.get("id")}
+        if self.token and request.get("token") != self.token:
+            return dict(reply, ok=False, error="Bad or missing token")
+
+        op = request.get("op")
+        with self.lock:
+            self.requests += 1
+        try:
+            if op == "create_project":
+                reports = self.generate([request["args"]], request.get("watch", True))
+            elif op == "create_projects":
+                reports = self.generate(request["specs"], request.get("watch", True))
+            elif op == "inject":
+                reports = self.inject(request.get("targets"), request.get("watch", True), **request.get("options", {}))
+            elif op == "unwatch":
+                with self.lock:
+                    for path in request["paths"]:
+                        self.projects.pop(str(Path(path)), None)
+                return dict(reply, ok=True)
+            elif op == "status":
+                return dict(reply, ok=True, maxim_path=None if self.maxim_path is None else str(self.maxim_path),
+                            projects=len(self.projects), requests=self.requests, regenerations=self.regenerations)
+            else:
+                return dict(reply, ok=False, error=f"Unknown op '{op}'")
+        except Exception as e:
+            return dict(reply, ok=False, error=f"{type(e).__name__}: {e}")
+
+        return dict(reply, ok=True, reports=[_report_to_json(r) for r in reports])
+
+class _Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # Replies are small, don't wait to batch them
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("Requests must be JSON objects")
+            except ValueError as e:
+                reply = {"id": None, "ok": False, "error": f"Bad JSON: {e}"}
+            else:
+                reply = self.server.service.handle(request)
+            self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+class GenerationServer(socketserver.ThreadingTCPServer):
+    """
+    Serves a GenerationService over the line-based JSON protocol.  Bind it to localhost unless
+    the clients really are on other machines - requests can write files anywhere the server can.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, service: GenerationService):
+        super().__init__(address, _Handler)
+        self.service = service
+
+class Client:
+    """
+    Connection to a GenerationServer.  request() sends one request and returns its reply,
+    raising an Exception if the request failed.
+    """
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, token=None, timeout=None):
+        self.token = token
+        self._next_id = 0
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile("rwb")
+
+    def request(self, op, **params) -> dict:
+        self._next_id += 1
+        request = dict(params, id=self._next_id, op=op)
+        if self.token:
+            request["token"] = self.token
+        self._file.write(json.dumps(request).encode("utf-8") + b"\n")
+        self._file.flush()
+
+        line = self._file.readline()
+        if not line:
+            raise Exception("The generation server closed the connection")
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise Exception(reply.get("error"))
+        return reply
+
+    def create_project(self, watch=True, **args) -> dict:
+        """Same arguments as generate.create_project.  Returns the project's report."""
+        return self.request("create_project", args=args, watch=watch)["reports"][0]
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
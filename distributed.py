@@ -0,0 +1,356 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+# Distributed execution of the 'maintain.py test' build matrix.
+#
+# Workers ('maintain.py worker') are small HTTP servers that build shards of the matrix in their
+# own SDK checkout and send back the results and build logs.  The coordinator ('maintain.py test
+# --workers ...') splits the matrix into shards sized from historical build durations, hands
+# them out longest-first, and gives each worker its next shard as soon as it returns the last
+# one, so fast workers naturally take on more of the matrix.  Shards from a worker that stops
+# responding, or that takes far longer than its shard's estimated duration, are handed to the
+# others.  A worker that times out is only dropped if it doesn't answer /cancel or keeps timing
+# out (see WORKER_TIMEOUT_BUDGET).  A shard the worker rejects (ex: a build that isn't in its
+# SDK) fails with the worker's error message instead.
+#
+# The protocol is JSON over HTTP:
+#   GET  /status   Worker info: {"protocol", "maxim_path", "jobs", "make_jobs", "active"}
+#   POST /shard    {"builds": [{"target", "board", "project"}], "timeout", "fail_fast"}
+#                  -> {"results": [{"build_cmd", "build", "clean", "footprint", "dependencies", "log"} or null]}
+#   POST /cancel   Stop every shard the worker is running
+# Projects are given relative to the SDK root.  Logs are gzipped and base64-encoded.  If a token
+# is set, every request must carry it in an X-MSDK-Token header.
+
+import base64
+import gzip
+import json
+import queue
+import socket
+import statistics
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from subprocess import CompletedProcess
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 8700
+SHARDS_PER_WORKER = 4 # Smaller shards balance better, larger ones cost fewer round trips
+DEFAULT_ESTIMATE = 30.0 # Seconds, for builds with no history at all
+SHARD_TIMEOUT_FACTOR = 3 # A shard is given up on after this many times its estimated duration...
+SHARD_TIMEOUT_MIN = 120.0 # ...or this many seconds, whichever is longer
+WORKER_TIMEOUT_BUDGET = 2 # Timed out shards a worker that still answers /cancel is allowed before it's dropped
+
+_RESULT_FIELDS = ("returncode", "duration", "cpu_time", "peak_rss", "errors", "warnings", "first_error", "timed_out", "cancelled", "stdout")
+
+class ShardError(Exception):
+    """A worker rejected a shard.  Every build in the shard resolves to this error."""
+
+def result_to_json(res) -> dict:
+    """Serialize a streaming.stream_cmd() result"""
+    return None if res is None else {f: getattr(res, f, None) for f in _RESULT_FIELDS}
+
+def result_from_json(d: dict, log_path=None):
+    """Rebuild a streaming.stream_cmd()-style result from result_to_json() output"""
+    if d is None:
+        return None
+    res = CompletedProcess("", d["returncode"], stdout=d["stdout"], stderr="")
+    for f in _RESULT_FIELDS:
+        if f not in ("returncode", "stdout"):
+            setattr(res, f, d.get(f))
+    res.diagnostics = []
+    res.log_path = log_path
+    return res
+
+def encode_log(data: bytes) -> str:
+    return base64.b64encode(gzip.compress(data, mtime=0)).decode("ascii")
+
+def decode_log(text: str) -> bytes:
+    return gzip.decompress(base64.b64decode(text))
+
+class _Handler(BaseHTTPRequestHandler):
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self):
+        if self.server.token and self.headers.get("X-MSDK-Token") != self.server.token:
+            self._reply(403, {"error": "Bad or missing token"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == "/status":
+            self._reply(200, dict(self.server.info, protocol=PROTOCOL_VERSION, active=len(self.server.active)))
+        else:
+            self._reply(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._reply(400, {"error": "Bad JSON"})
+            return
+
+        if self.path == "/shard":
+            cancel = threading.Event()
+            with self.server.lock:
+                self.server.active.add(cancel)
+            try:
+                results = self.server.run_shard(request, cancel)
+            except Exception as e:
+                self._reply(400, {"error": str(e)})
+                return
+            finally:
+                with self.server.lock:
+                    self.server.active.discard(cancel)
+            self._reply(200, {"results": results})
+
+        elif self.path == "/cancel":
+            with self.server.lock:
+                for cancel in self.server.active:
+                    cancel.set()
+            self._reply(200, {})
+
+        else:
+            self._reply(404, {"error": f"Unknown path {self.path}"})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class WorkerServer(ThreadingHTTPServer):
+    """
+    HTTP server for a build worker.  'run_shard(request, cancel)' builds a shard request and
+    returns its list of results; 'cancel' is a threading.Event that's set by POST /cancel.
+    'info' is reported by GET /status.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, run_shard, info, token=None, verbose=False):
+        super().__init__(address, _Handler)
+        self.run_shard = run_shard
+        self.info = info
+        self.token = token
+        self.verbose = verbose
+        self.active = set()
+        self.lock = threading.Lock()
+
+def plan_shards(builds: list, estimates: dict, workers: int, shards_per_worker=SHARDS_PER_WORKER) -> list:
+    """
+    Split 'builds' (a list of keys) into shards of about equal estimated duration.  'estimates'
+    maps keys to seconds; builds with no estimate get the median of the known ones.  Builds are
+    placed longest-first (LPT), and the shards are returned longest-first, so the slowest work
+    starts early and short shards fill in the gaps at the end.
+    """
+    known = [estimates[b] for b in builds if b in estimates]
+    default = statistics.median(known) if known else DEFAULT_ESTIMATE
+    cost = {b: estimates.get(b, default) for b in builds}
+
+    count = max(1, min(len(builds), workers * shards_per_worker))
+    shards = [[0.0, []] for _ in range(count)]
+    for b in sorted(builds, key=lambda b: -cost[b]):
+        shard = min(shards, key=lambda s: s[0])
+        shard[0] += cost[b]
+        shard[1].append(b)
+
+    return [s for s in sorted(shards, key=lambda s: -s[0]) if s[1]]
+
+def shard_timeout(estimate: float) -> float:
+    """Seconds to wait for a shard with an 'estimate'd duration before giving it to another worker"""
+    return max(SHARD_TIMEOUT_MIN, SHARD_TIMEOUT_FACTOR * estimate)
+
+class Coordinator:
+    """
+    Hands shards of the build matrix out to workers and collects the results.  'workers' is a
+    list of "host:port" strings.  'timeout' overrides the time a worker gets to finish a shard,
+    which otherwise comes from the shard's estimated duration (see shard_timeout).
+    """
+    def __init__(self, workers: list, token=None, logger=print, timeout=None):
+        self.workers = []
+        self.token = token
+        self.logger = logger
+        self.request_timeout = timeout
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._timeouts = {} # url -> shards it has timed out on
+
+        for w in workers:
+            url = f"http://{w if ':' in w else f'{w}:{DEFAULT_PORT}'}"
+            try:
+                status = self._request(url, "/status")
+            except (OSError, ValueError) as e:
+                logger(f"[WORKERS] {url} is unreachable ({e}), skipping it")
+                continue
+            if status.get("protocol") != PROTOCOL_VERSION:
+                logger(f"[WORKERS] {url} speaks protocol {status.get('protocol')}, expected {PROTOCOL_VERSION}, skipping it")
+                continue
+            logger(f"[WORKERS] {url}: {status['jobs']} job(s) x {status['make_jobs']} make job(s), SDK at {status['maxim_path']}")
+            self.workers.append(url)
+
+        if not self.workers:
+            raise Exception("None of the build workers are reachable.")
+
+    def _request(self, url, path, body=None, timeout=10):
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        req = urllib.request.Request(url + path, data=data, method="GET" if body is None else "POST")
+        req.add_header("Content-Type", "application/json")
+        if self.token:
+            req.add_header("X-MSDK-Token", self.token)
+        with urllib.request.urlopen(req, timeout=timeout) as res:
+            return json.loads(res.read())
+
+    def submit(self, builds: dict, estimates: dict, options: dict, on_result=None) -> dict:
+        """
+        Start building.  'builds' maps keys to shard entries ({"target", "board", "project"}),
+        'estimates' maps keys to expected durations in seconds, and 'options' is copied into
+        every shard request.  'on_result(key, result)' is called as results arrive (from the
+        worker threads) and can replace the result.  Returns a concurrent.futures.Future per key.
+        Cancelled builds resolve to None after stop().  Builds in a shard that a worker rejected,
+        and builds left over when every worker has been dropped, raise ShardError.
+        """
+        self._futures = {key: Future() for key in builds}
+        self._builds = builds
+        self._options = options
+        self._on_result = on_result
+
+        for estimate, shard in plan_shards(list(builds), estimates, len(self.workers)):
+            self._queue.put((shard, estimate))
+        self._pending = len(builds)
+
+        self._threads = []
+        for url in self.workers:
+            t = threading.Thread(target=self._work, args=(url,), name=f"worker {url}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+        return dict(self._futures)
+
+    def _work(self, url):
+        while not self._stopped.is_set():
+            try:
+                shard, estimate = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                # Keep polling until everything is done, in case another worker's shard comes back
+                with self._lock:
+                    if self._pending == 0:
+                        return
+                continue
+
+            timeout = self.request_timeout if self.request_timeout is not None else shard_timeout(estimate)
+            try:
+                body = dict(self._options, builds=[self._builds[key] for key in shard])
+                results = self._request(url, "/shard", body, timeout=timeout)["results"]
+            except urllib.error.HTTPError as e:
+                # The worker is up, but can't build this shard.  Fail its builds and carry on.
+                try:
+                    message = json.loads(e.read())["error"]
+                except (OSError, ValueError, KeyError, TypeError):
+                    message = str(e)
+                self.logger(f"[WORKERS] {url} rejected a shard of {len(shard)} build(s): {message}")
+                with self._lock:
+                    for key in shard:
+                        self._pending -= 1
+                        if not self._futures[key].done():
+                            self._futures[key].set_exception(ShardError(f"Shard rejected by {url}: {message}"))
+                continue
+            except (OSError, ValueError, KeyError) as e:
+                # Give the shard to the other workers.  A shard that timed out gets twice as long
+                # on the next worker, in case its estimate was just too low.
+                self.logger(f"[WORKERS] {url} failed ({e}), moving its shard to the other workers")
+                timed_out = isinstance(e, socket.timeout)
+                keep = False
+                if timed_out:
+                    # Stop the worker's builds.  If it answers, it's busy rather than hung, so it
+                    # stays in use until it runs out of its timeout budget.
+                    try:
+                        self._request(url, "/cancel", {}, timeout=5)
+                        self._timeouts[url] = self._timeouts.get(url, 0) + 1
+                        keep = self._timeouts[url] < WORKER_TIMEOUT_BUDGET
+                    except (OSError, ValueError):
+                        pass
+                self._queue.put((shard, estimate * 2 if timed_out else estimate))
+                if keep:
+                    continue
+                self.logger(f"[WORKERS] No longer using {url}")
+                with self._lock:
+                    self.workers.remove(url)
+                    if not self.workers:
+                        self._fail_remaining("No build workers left")
+                return
+
+            for key, result in zip(shard, results):
+                error = None
+                try:
+                    if self._on_result is not None:
+                        result = self._on_result(key, result)
+                except Exception as e:
+                    error = e
+                with self._lock:
+                    self._pending -= 1
+                    if self._futures[key].done():
+                        continue
+                    if error is not None:
+                        self._futures[key].set_exception(error)
+                    else:
+                        self._futures[key].set_result(result)
+
+    def _fail_remaining(self, reason):
+        self.logger(f"[WORKERS] {reason}")
+        self._stopped.set()
+        for future in self._futures.values():
+            if not future.done():
+                future.set_exception(ShardError(reason))
+
+    def stop(self):
+        """Stop handing out shards, cancel the shards that are running, and resolve every remaining build to None"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        for url in list(self.workers):
+            try:
+                self._request(url, "/cancel", {})
+            except (OSError, ValueError):
+                pass
+        with self._lock:
+            while not self._queue.empty():
+                for key in self._queue.get_nowait()[0]:
+                    if not self._futures[key].done():
+                        self._futures[key].set_result(None)
+
+    def close(self):
+        """stop(), and resolve anything still running to None"""
+        self.stop()
+        with self._lock:
+            for future in self._futures.values():
+                if not future.done():
+                    future.set_result(None)
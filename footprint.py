@@ -0,0 +1,234 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+# Flash and RAM footprint of built firmware, without the toolchain's 'size'.
+#
+# The ELF's section header table gives the Berkeley-style totals that 'arm-none-eabi-size'
+# prints: "text" is allocated read-only sections (code and constants), "data" is allocated
+# writable sections with contents (stored in flash, copied to RAM), and "bss" is allocated
+# sections without contents (RAM only).  Only the ELF header, the section header table, and the
+# section name table are read, so this costs a few small reads however large the image is.
+#
+# The linker's .map file breaks the totals down by object file.  Each input section is counted
+# under the ELF output section it was placed in, so debug info and discarded sections drop out.
+
+import json
+import os
+import re
+import struct
+from pathlib import Path
+
+_SHT_NOBITS = 8
+_SHF_WRITE = 0x1
+_SHF_ALLOC = 0x2
+
+# (ELF header after e_ident, section header) layouts for 32- and 64-bit ELFs
+_LAYOUTS = {
+    1: ("HHIIIIIHHHHHH", "IIIIIIIIII"),
+    2: ("HHIQQQIHHHHHH", "IIQQQQIIQQ")
+}
+
+def elf_sections(path) -> dict:
+    """
+    Return {section name: (kind, size)} for the allocated sections of an ELF file, where 'kind'
+    is "text", "data", or "bss"
+    """
+    with open(path, "rb") as f:
+        ident = f.read(16)
+        if len(ident) < 16 or ident[:4] != b"\x7fELF" or ident[4] not in _LAYOUTS or ident[5] not in (1, 2):
+            raise Exception(f"{path} is not an ELF file")
+        endian = "<" if ident[5] == 1 else ">"
+        header_layout, section_layout = _LAYOUTS[ident[4]]
+        header = struct.Struct(endian + header_layout)
+        section = struct.Struct(endian + section_layout)
+
+        (_, _, _, _, _, shoff, _, _, _, _, shentsize, shnum, shstrndx) = header.unpack(f.read(header.size))
+        if shoff == 0:
+            return {}
+
+        f.seek(shoff)
+        first = section.unpack(f.read(section.size))
+        if shnum == 0:
+            shnum = first[5] # More sections than fit in e_shnum, the real count is in section 0
+        if shstrndx == 0xffff:
+            shstrndx = first[6]
+
+        f.seek(shoff)
+        table = f.read(shnum * shentsize)
+        headers = [section.unpack_from(table, i * shentsize) for i in range(shnum)]
+
+        strtab = headers[shstrndx]
+        f.seek(strtab[4])
+        names = f.read(strtab[5])
+
+    sections = {}
+    for name, type, flags, _, _, size, _, _, _, _ in headers:
+        if not flags & _SHF_ALLOC:
+            continue
+        if type == _SHT_NOBITS:
+            kind = "bss"
+        elif flags & _SHF_WRITE:
+            kind = "data"
+        else:
+            kind = "text"
+        sections[names[name:names.index(b"\0", name)].decode("utf-8", "replace")] = (kind, size)
+    return sections
+
+def elf_sizes(path) -> dict:
+    """Return the {"text", "data", "bss"} totals of an ELF file, like 'size' does"""
+    sizes = {"text": 0, "data": 0, "bss": 0}
+    for kind, size in elf_sections(path).values():
+        sizes[kind] += size
+    return sizes
+
+# An input section with its address, size, and object on one line, or just its name when the
+# name is too long and the rest is on the next line
+_INPUT = re.compile(r"^ (\S+)(?:\s+0x([0-9a-fA-F]+)\s+0x([0-9a-fA-F]+)\s+(\S.*))?$")
+_CONTINUATION = re.compile(r"^\s+0x([0-9a-fA-F]+)\s+0x([0-9a-fA-F]+)\s+(\S.*)$")
+_OUTPUT = re.compile(r"^(\S+)(?:\s+0x[0-9a-fA-F]+\s+0x[0-9a-fA-F]+.*)?$")
+
+def map_objects(path, sections: dict) -> dict:
+    """
+    Return {object: {"text", "data", "bss"}} from a GNU ld map file.  'sections' is the
+    elf_sections() of the linked image, which decides what each output section counts as.
+    """
+    objects = {}
+    kind = None
+    pending = None # Input section name whose address and size are on the next line
+
+    def add(size, obj):
+        if size and kind is not None:
+            sizes = objects.setdefault(obj.strip(), {"text": 0, "data": 0, "bss": 0})
+            sizes[kind] += int(size, 16)
+
+    with open(path, "r", errors="replace") as f:
+        for line in f:
+            if line.startswith("Linker script and memory map"):
+                break
+        for line in f:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            if line.startswith(("OUTPUT(", "Cross Reference Table")):
+                break
+
+            if pending is not None:
+                pending = None
+                m = _CONTINUATION.match(line)
+                if m:
+                    add(m.group(2), m.group(3))
+                    continue
+
+            if line[0] not in " \t":
+                m = _OUTPUT.match(line)
+                if m:
+                    entry = sections.get(m.group(1))
+                    kind = entry[0] if entry is not None else None
+                continue
+
+            if kind is None or len(line) < 2 or line[1] in " \t" or line.startswith(" *"):
+                continue # Symbols, assignments, fill, and linker script statements
+
+            m = _INPUT.match(line)
+            if m is None:
+                continue
+            if m.group(2) is None:
+                pending = m.group(1)
+            else:
+                add(m.group(3), m.group(4))
+
+    return objects
+
+def measure(build_dir, root=None) -> dict:
+    """
+    Measure the firmware in a build folder: the newest .elf file in it, and the .map file with
+    the same name (if there is one).  Object paths under 'root' are made relative to it.
+    Returns {"elf", "text", "data", "bss", "objects"}, or None if there's no ELF.
+    """
+    build_dir = Path(build_dir)
+    try:
+        elfs = [e for e in os.scandir(build_dir) if e.name.endswith(".elf") and e.is_file()]
+    except OSError:
+        return None
+    if not elfs:
+        return None
+    elf = Path(max(elfs, key=lambda e: e.stat().st_mtime_ns).path)
+
+    sections = elf_sections(elf)
+    result = {"elf": elf.name, "text": 0, "data": 0, "bss": 0, "objects": {}}
+    for kind, size in sections.values():
+        result[kind] += size
+
+    map_file = elf.with_suffix(".map")
+    if map_file.exists():
+        prefix = None if root is None else Path(root).resolve().as_posix().rstrip("/") + "/"
+        for obj, sizes in map_objects(map_file, sections).items():
+            obj = obj.replace("\\", "/")
+            if prefix is not None and obj.startswith(prefix):
+                obj = obj[len(prefix):]
+            totals = result["objects"].setdefault(obj, {"text": 0, "data": 0, "bss": 0})
+            for kind, size in sizes.items():
+                totals[kind] += size
+
+    return result
+
+def flash(sizes) -> int:
+    return sizes["text"] + sizes["data"]
+
+def ram(sizes) -> int:
+    return sizes["data"] + sizes["bss"]
+
+def compare(footprints: dict, baseline: dict, threshold=0.01, floor=64, top=3) -> list:
+    """
+    Compare footprints ({"target/board/project": measure() result}) to a baseline saved in the
+    same form and return a list of regression messages.  Flash or RAM use regresses when it grows
+    by more than 'threshold' (a fraction) and by more than 'floor' bytes.  Each message names the
+    'top' objects that grew the most.
+    """
+    regressions = []
+    for name, new in sorted(footprints.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric, fn in (("flash", flash), ("ram", ram)):
+            old_size, new_size = fn(base), fn(new)
+            if new_size - old_size <= floor or new_size <= old_size * (1 + threshold):
+                continue
+
+            growth = []
+            old_objects = base.get("objects", {})
+            for obj, sizes in new.get("objects", {}).items():
+                delta = fn(sizes) - (fn(old_objects[obj]) if obj in old_objects else 0)
+                if delta > 0:
+                    growth.append((delta, obj))
+            growth.sort(reverse=True)
+            grew = ", ".join(f"{obj} +{delta}" for delta, obj in growth[:top])
+
+            regressions.append(f"{name} {metric}: {old_size} -> {new_size} bytes (+{new_size - old_size}, "
+                               f"+{(new_size / old_size - 1) * 100 if old_size else float('inf'):.1f}%){f'.  Grew: {grew}' if grew else ''}")
+    return regressions
+
+def load(path) -> dict:
+    with open(path, "r") as f:
+        return json.load(f)["footprints"]
+
+def save(footprints: dict, path, meta=None):
+    with open(path, "w") as f:
+        json.dump({"meta": meta or {}, "footprints": footprints}, f, indent=4, sort_keys=True)
@@ -19,12 +19,14 @@
  ##############################################################################
 
 import sys, os
+import re
 import shutil
-import stat
 # from utils import *
-from . import utils
+try:
+    from . import utils
+except ImportError:
+    import utils
 from pathlib import Path
-from .maintain import sync
 
 # Get location of this file.
 # Need to use this so that template look-ups are decoupled from the caller's working directory 
@@ -32,8 +34,23 @@ here = Path(__file__).parent
 _defaults = here.joinpath("MaximSDK/Inject/.vscode/settings.json")
 template_dir = here.joinpath("MaximSDK/Template").resolve()
 
-# Load default values for template from master "inject" folder so that we don't have to maintain multiple copies of the settings
-defaults = utils.parse_json(_defaults)
+# Default values for the template are loaded from the master "inject" folder so that we don't have to
+# maintain multiple copies of the settings.  They're parsed on first use, and re-parsed if settings.json changes.
+_defaults_cache = (None, None)
+
+def get_defaults() -> utils.UpperDict:
+    global _defaults_cache
+    st = _defaults.stat()
+    key = (st.st_size, st.st_mtime_ns)
+    if _defaults_cache[0] != key:
+        _defaults_cache = (key, utils.parse_json(_defaults))
+    return _defaults_cache[1]
+
+def __getattr__(name):
+    # Keep 'generate.defaults' available without parsing settings.json at import time
+    if name == "defaults":
+        return get_defaults()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 synced=False
 
@@ -52,51 +69,213 @@ whitelist = [
     "MAX78002"
 ]
 
-def create_project(
-    out_root: str,
-    out_stem: str,
-    target: str,
-    board: str,
-    overwrite = False,
-    backup = False,
-    program_file: str = defaults["PROGRAM_FILE"],
-    symbol_file: str = defaults["SYMBOL_FILE"],
-    m4_ocd_interface_file: str = defaults["M4_OCD_INTERFACE_FILE"],
-    m4_ocd_target_file: str = defaults["M4_OCD_TARGET_FILE"],
-    rv_ocd_interface_file: str = defaults["RV_OCD_INTERFACE_FILE"],
-    rv_ocd_target_file: str = defaults["RV_OCD_TARGET_FILE"],
-    defines: list = defaults["C_CPP.DEFAULT.DEFINES"],
-    i_paths: list = defaults["C_CPP.DEFAULT.INCLUDEPATH"],
-    v_paths: list = defaults["C_CPP.DEFAULT.BROWSE.PATH"],
-    v_arm_gcc: str = defaults["V_ARM_GCC"],
-    v_xpack_gcc: str = defaults["V_XPACK_GCC"],
-    ocd_path: str = defaults["OCD_PATH"],
-    arm_gcc_path: str = defaults["ARM_GCC_PATH"],
-    xpack_gcc_path: str = defaults["XPACK_GCC_PATH"],
-    make_path: str = defaults["MAKE_PATH"],
-    msys_path: str = defaults["MSYS_PATH"]
-):
+# Maps create_project/create_projects arguments to their default values in the template settings
+_spec_defaults = {
+    "program_file": "PROGRAM_FILE",
+    "symbol_file": "SYMBOL_FILE",
+    "m4_ocd_interface_file": "M4_OCD_INTERFACE_FILE",
+    "m4_ocd_target_file": "M4_OCD_TARGET_FILE",
+    "rv_ocd_interface_file": "RV_OCD_INTERFACE_FILE",
+    "rv_ocd_target_file": "RV_OCD_TARGET_FILE",
+    "defines": "C_CPP.DEFAULT.DEFINES",
+    "i_paths": "C_CPP.DEFAULT.INCLUDEPATH",
+    "v_paths": "C_CPP.DEFAULT.BROWSE.PATH",
+    "v_arm_gcc": "V_ARM_GCC",
+    "v_xpack_gcc": "V_XPACK_GCC",
+    "ocd_path": "OCD_PATH",
+    "arm_gcc_path": "ARM_GCC_PATH",
+    "xpack_gcc_path": "XPACK_GCC_PATH",
+    "make_path": "MAKE_PATH",
+    "msys_path": "MSYS_PATH"
+}
+
+template_prefix = "template"
+# Filenames beginning with this will have substitution
+
+# Placeholders supported in template files.  List placeholders are written inside quotes in the
+# template ("##__I_PATHS__##") and replace the quotes too, since they expand to a quoted list.
+placeholders = {
+    "TARGET": False,
+    "BOARD": False,
+    "PROGRAM_FILE": False,
+    "SYMBOL_FILE": False,
+    "M4_OCD_INTERFACE_FILE": False,
+    "M4_OCD_TARGET_FILE": False,
+    "RV_OCD_INTERFACE_FILE": False,
+    "RV_OCD_TARGET_FILE": False,
+    "I_PATHS": True,
+    "DEFINES": True,
+    "V_PATHS": True,
+    "V_ARM_GCC": False,
+    "V_XPACK_GCC": False,
+    "OCD_PATH": False,
+    "ARM_GCC_PATH": False,
+    "XPACK_GCC_PATH": False,
+    "MAKE_PATH": False,
+    "MSYS_PATH": False,
+    "CC_SHIM_PATH": False,
+    "CC_SHIM_PATH_WIN": False,
+    "COMPILE_COMMANDS": False
+}
+
+class Template:
     """
-    Generates Visual Studio Code project files from the VSCode-Maxim project.
+    A template file compiled into literal and placeholder segments.  Rendering is a single join,
+    so substituted values are never themselves scanned for placeholders.
     """
+    _pattern = re.compile(r'(")?##__([A-Za-z0-9_]+?)__##(")?')
 
-    global synced
-    if not synced:
-        sync()
-        synced = True
+    def __init__(self, text: str, name: str = "<template>"):
+        self.name = name
+        self.literals = []  # Literal text before each placeholder, plus the trailing text
+        self.names = []
+
+        pos = 0
+        literal = ""
+        for m in self._pattern.finditer(text):
+            placeholder = m.group(2)
+            if placeholder not in placeholders:
+                raise Exception(f"Unknown placeholder '##__{placeholder}__##' in template '{name}'.")
+
+            literal += text[pos:m.start()]
+            if not placeholders[placeholder]:
+                # Scalar placeholder, keep any surrounding quotes as literal text
+                literal += m.group(1) or ""
+                self.literals.append(literal)
+                literal = m.group(3) or ""
+            else:
+                self.literals.append(literal)
+                literal = ""
+            self.names.append(placeholder)
+            pos = m.end()
+
+        self.literals.append(literal + text[pos:])
+
+    def render(self, values: dict) -> str:
+        missing = [n for n in self.names if n not in values]
+        if missing:
+            raise Exception(f"Missing value(s) for placeholder(s) {missing} in template '{self.name}'.")
 
-    out_path = Path(out_root).joinpath(out_stem)
+        segments = [self.literals[0]]
+        for placeholder, literal in zip(self.names, self.literals[1:]):
+            segments.append(values[placeholder])
+            segments.append(literal)
+        return "".join(segments)
 
-    template_prefix = "template"
-    # Filenames beginning with this will have substitution
+# Compiled templates are cached between calls, keyed on their stat info
+_template_cache = {}
 
+def _load_template():
+    """
+    Walk the template folder and return a list of (relative dir, output filename, source file,
+    template) entries.  'template' is the compiled Template for files that need substitution and
+    None for files that are copied as-is.
+    """
     if not template_dir.exists():
         raise Exception(f"Failed to find project template folder '{template_dir}'.")
 
+    entries = []
+    for directory, subdirs, files in os.walk(template_dir):
+        subdirs.sort()
+        rel_dir = Path(directory).relative_to(template_dir)
+
+        for file in sorted(files):
+            source = Path(directory).joinpath(file)
+            if not file.startswith(template_prefix):
+                entries.append((rel_dir, file, source, None))
+                continue
+
+            st = source.stat()
+            cached = _template_cache.get(source)
+            if cached is None or cached[0] != (st.st_size, st.st_mtime_ns):
+                with open(source, 'r', encoding="UTF-8") as f:
+                    cached = _template_cache[source] = ((st.st_size, st.st_mtime_ns), Template(f.read(), str(source)))
+
+            entries.append((rel_dir, file[len(template_prefix):], source, cached[1]))  # Remove prefix
+
+    return entries
+
+_shim_dir = None
+
+def _compiler_cache_shims() -> Path:
+    """
+    Install the compiler cache shims (see ccwrap.py) used by generated projects, once per process
+    """
+    global _shim_dir
+    if _shim_dir is None:
+        try: # Imported on first use to keep import time down
+            from . import ccwrap
+        except ImportError:
+            import ccwrap
+        cache_dir = ccwrap.default_cache_dir()
+        _shim_dir = ccwrap.install_shims(cache_dir.joinpath("bin"), env={"MSDK_CCWRAP_CACHE": str(cache_dir)})
+    return _shim_dir
+
+# Settings that can appear in the include and browse paths, and the spec arguments they come from
+_path_variables = {
+    "config:v_Arm_GCC": "v_arm_gcc",
+    "config:v_xPack_GCC": "v_xpack_gcc",
+    "config:OCD_path": "ocd_path",
+    "config:ARM_GCC_path": "arm_gcc_path",
+    "config:xPack_GCC_path": "xpack_gcc_path",
+    "config:Make_path": "make_path",
+    "config:MSYS_path": "msys_path"
+}
+
+_variable_pattern = re.compile(r"\$\{([^}]+)\}")
+
+def _trim_paths(paths: list, variables: dict, drop_globs=False) -> list:
+    """
+    Drop the entries of an include or browse path list that name folders that don't exist.
+    Entries are expanded with 'variables' (ex: {"config:target": "MAX78000"}) first, and any
+    that can't be fully expanded are kept.  If 'drop_globs' is set, recursive ("/**") entries
+    are dropped too.
+    """
+    trimmed = []
+    for path in paths:
+        if drop_globs and path.replace("\\", "/").endswith("/**"):
+            continue
+
+        expanded = path
+        for _ in range(5): # Settings can refer to other settings (ex: ARM_GCC_path uses v_Arm_GCC)
+            expanded = _variable_pattern.sub(lambda m: variables.get(m.group(1), m.group(0)), expanded)
+        if "${" in expanded or "*" in expanded or os.path.isdir(expanded):
+            trimmed.append(path)
+    return trimmed
+
+def _parse_spec(spec, compile_commands: str = None) -> dict:
+    """
+    Fill in a project spec's defaults and calculate the placeholder values substituted into the template.
+    'compile_commands' is the project's compile_commands.json setting, if one was generated.
+    """
+    spec = dict(spec)
+    defaults = get_defaults()
+    for arg, key in _spec_defaults.items():
+        if spec.get(arg) is None:
+            spec[arg] = defaults[key]
+    target = spec["target"]
+
+    # Trim the include and browse paths to the folders that exist for this target and board.
+    # With a compile_commands.json IntelliSense gets each source's exact include paths from
+    # the database, so the recursive workspace glob isn't needed either.
+    if spec.get("trim_paths") or spec.get("compile_commands"):
+        maxim_path = spec.get("maxim_path") or os.environ.get("MAXIM_PATH")
+        variables = {
+            "workspaceFolder": Path(spec["out_root"]).joinpath(spec["out_stem"]).as_posix(),
+            "config:target": target.upper(),
+            "config:board": spec["board"]
+        }
+        if maxim_path:
+            variables["config:MAXIM_PATH"] = Path(maxim_path).as_posix()
+        for variable, arg in _path_variables.items():
+            variables[variable] = spec[arg]
+        spec["i_paths"] = _trim_paths(spec["i_paths"], variables, drop_globs=compile_commands is not None)
+        spec["v_paths"] = _trim_paths(spec["v_paths"], variables, drop_globs=compile_commands is not None)
+
     tmp = []  # Work-horse list, linter be nice
     # Parse compiler definitions...
-    if defines != []:
-        tmp = defines
+    if spec["defines"] != []:
+        tmp = spec["defines"]
         tmp = list(map(lambda s: s.strip("-D"), tmp))  # VS Code doesn't want -D
         tmp = list(map(lambda s: f"\"{s}\"", tmp))  # Surround with quotes
         defines_parsed = ",\n        ".join(tmp)  # csv, newline, and tab (w/ spaces) alignment
@@ -104,97 +283,263 @@ def create_project(
         defines_parsed = ""
 
     # Parse include paths...
-    tmp = i_paths
+    tmp = spec["i_paths"]
     tmp = list(map(lambda s: f"\"{s}\"", tmp))  # Surround with quotes
     i_paths_parsed = ",\n        ".join(tmp).replace(target, "${config:target}").replace("\\", "/")
 
     # Parse browse paths...
-    tmp = v_paths
+    tmp = spec["v_paths"]
     tmp = list(map(lambda s: f"\"{s}\"", tmp))  # Surround with quotes
     v_paths_parsed = ",\n        ".join(tmp).replace(target, "${config:target}").replace("\\", "/")
 
-    updated = []
-    # Create template...
-    for directory, _, files in sorted(os.walk(template_dir)):
-        # ^ For each directory in the directory tree rooted at top (including top itself,
-        # but excluding '.' and '..'), yields a 3-tuple (dirpath, dirnames, filenames)
-
-        # Get current directory relative to root
-        rel_dir = Path(directory).relative_to(Path(template_dir))
-
-        # Figure out whether we're in a subfolder of the template directory,
-        # and form output path accordingly.
-        if rel_dir != Path('.'):
-            # We're in a sub-folder.  Replicate this folder in the output directory
-            out_path = Path(out_path).joinpath(rel_dir)
-            os.makedirs(out_path, exist_ok=True)
+    # Put the compiler cache shims at the front of the terminal PATH, so the build task's
+    # compiles go through the cache
+    cc_shim_path = cc_shim_path_win = ""
+    if spec.get("compiler_cache"):
+        shim_dir = _compiler_cache_shims().as_posix()
+        cc_shim_path = f"{shim_dir}:"
+        cc_shim_path_win = f"{shim_dir};"
+
+    return {
+        "TARGET": target.upper(),
+        "BOARD": spec["board"],
+        "PROGRAM_FILE": spec["program_file"],
+        "SYMBOL_FILE": spec["symbol_file"],
+        "M4_OCD_INTERFACE_FILE": spec["m4_ocd_interface_file"],
+        "M4_OCD_TARGET_FILE": spec["m4_ocd_target_file"],
+        "RV_OCD_INTERFACE_FILE": spec["rv_ocd_interface_file"],
+        "RV_OCD_TARGET_FILE": spec["rv_ocd_target_file"],
+        "I_PATHS": i_paths_parsed,
+        "DEFINES": defines_parsed,
+        "V_PATHS": v_paths_parsed,
+        "V_ARM_GCC": spec["v_arm_gcc"],
+        "V_XPACK_GCC": spec["v_xpack_gcc"],
+        "OCD_PATH": spec["ocd_path"],
+        "ARM_GCC_PATH": spec["arm_gcc_path"],
+        "XPACK_GCC_PATH": spec["xpack_gcc_path"],
+        "MAKE_PATH": spec["make_path"],
+        "MSYS_PATH": spec["msys_path"],
+        "CC_SHIM_PATH": cc_shim_path,
+        "CC_SHIM_PATH_WIN": cc_shim_path_win,
+        # The whole setting, so that it's left out entirely when there's no compile_commands.json
+        "COMPILE_COMMANDS": f"\n    \"C_Cpp.default.compileCommands\":\"{compile_commands}\"," if compile_commands else ""
+    }
+
+_file_mode = utils.PROJECT_FILE_MODE
+
+def _write_file(out_file, source, content, overwrite, backup, hash_index):
+    """
+    Write a single project file.  'content' is the rendered text for template files, or None
+    to copy 'source' as-is.  Returns "written", "skipped" (exists, no overwrite) or "unchanged".
+    """
+    if out_file.exists():
+        if not overwrite:
+            return "skipped"
+
+        if content is not None:
+            if utils.compare_content(content, out_file):
+                return "unchanged"
+        elif hash_index.hash_file(source) == hash_index.hash_file(out_file):
+            return "unchanged"
+
+    # Files are written to a temporary file and moved into place with their final permissions,
+    # so an interrupted run never leaves a half-written file behind
+    os.makedirs(out_file.parent, exist_ok=True)
+    if content is not None:
+        data = content.replace("\n", os.linesep).encode("UTF-8")
+    else:
+        if backup and out_file.exists():
+            shutil.copy(out_file, out_file.parent.joinpath(f"{out_file.name}.backup"))
+        with open(source, "rb") as f:
+            data = f.read()
+    utils.atomic_write(out_file, data, mode=_file_mode)
+
+    # print(f"Wrote {os.path.basename(out_file)}")  # Uncomment to debug
+    return "written"
+
+# Generated compilation databases go next to the other project files, out of the way of 'make clean'
+_compile_commands_file = Path(".vscode", "compile_commands.json")
+_compile_commands_setting = "${workspaceFolder}/.vscode/compile_commands.json"
+
+def _compile_commands(spec, overwrite):
+    """
+    Dry-run a project's Makefile into its compile_commands.json (see compdb.py).  Returns
+    (output file, "written"/"skipped"/"unchanged"), or None if the project has no Makefile or
+    the dry run failed, in which case only the include and browse paths are trimmed.
+    """
+    try: # Imported on first use to keep import time down
+        from . import compdb
+    except ImportError:
+        import compdb
+
+    out_path = Path(spec["out_root"]).joinpath(spec["out_stem"])
+    out_file = out_path.joinpath(_compile_commands_file)
+    if not out_path.joinpath("Makefile").exists():
+        return None
+    if out_file.exists() and not overwrite:
+        return (out_file, "skipped")
+
+    try:
+        entries = compdb.from_make(out_path, spec["target"], spec["board"], spec.get("maxim_path") or os.environ.get("MAXIM_PATH"))
+    except Exception as e:
+        print(f"Warning: failed to generate {out_file} ({e}).  Falling back to trimmed include paths.")
+        return None
+    if not entries:
+        return None
+
+    return (out_file, "written" if compdb.write(entries, out_file) else "unchanged")
+
+def create_projects(specs: list, workers: int = None) -> list:
+    """
+    Generates Visual Studio Code project files for a batch of projects.
+
+    Each spec is a dict of create_project arguments ("out_root", "out_stem", "target", and "board"
+    are required, any others that are missing or None use the template defaults).  The template folder is loaded once for the whole batch, identical renders
+    are shared between projects, and files are written through a thread pool of 'workers' threads.
+
+    Returns a report for each spec: {"path", "written", "skipped", "unchanged"}, where the last
+    three are lists of output files.  Files are "skipped" when they exist and overwrite is off.
+    """
+
+    global synced
+    if not synced:
+        try: # Imported on first use to keep import time down
+            from .maintain import sync
+        except ImportError:
+            from maintain import sync
+        sync()
+        synced = True
+
+    template = _load_template()
+
+    # Unchanged files get their digests from the persistent hash index instead of being re-read
+    hash_index = utils.default_hash_index()
+
+    # Projects that want a compile_commands.json are dry-run first, since their settings point at it
+    compile_commands = [None] * len(specs)
+    requested = [i for i, spec in enumerate(specs) if spec.get("compile_commands")]
+    if requested:
+        dry_run = lambda i: _compile_commands(specs[i], specs[i].get("overwrite", False))
+        if workers:
+            from concurrent.futures import ThreadPoolExecutor # Imported on demand to keep import time down
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for i, result in zip(requested, executor.map(dry_run, requested)):
+                    compile_commands[i] = result
         else:
-            # We're in the root template folder, no need to create a directory.
-            pass
+            for i in requested:
+                compile_commands[i] = dry_run(i)
 
-        
-        # Any files to copy?
-        for file in sorted(files):
+    rendered = {}
+    reports = []
+    jobs = []
+    for spec, database in zip(specs, compile_commands):
+        out_path = Path(spec["out_root"]).joinpath(spec["out_stem"])
+        values = _parse_spec(spec, _compile_commands_setting if database is not None else None)
+        values_key = tuple(values.items())
+        overwrite = spec.get("overwrite", False)
+        backup = spec.get("backup", False)
 
-            if file.startswith(template_prefix):
-
-                # There is a template file to copy.  Perform string substitution in output file.
-                out_file = Path(out_path).joinpath(file[len(template_prefix):])  # Remove prefix
-                template = Path(directory).joinpath(file)
-
-                content = None
-                with open(template, 'r', encoding="UTF-8") as f:
-                    content = f.read()
-                    content = content.replace("##__TARGET__##", target.upper()). \
-                        replace("##__BOARD__##", board). \
-                        replace("##__PROGRAM_FILE__##", program_file). \
-                        replace("##__SYMBOL_FILE__##", symbol_file). \
-                        replace("##__M4_OCD_INTERFACE_FILE__##", m4_ocd_interface_file). \
-                        replace("##__M4_OCD_TARGET_FILE__##", m4_ocd_target_file). \
-                        replace("##__RV_OCD_INTERFACE_FILE__##", rv_ocd_interface_file). \
-                        replace("##__RV_OCD_TARGET_FILE__##", rv_ocd_target_file). \
-                        replace("\"##__I_PATHS__##\"", i_paths_parsed). \
-                        replace("\"##__DEFINES__##\"", defines_parsed). \
-                        replace("\"##__V_PATHS__##\"", v_paths_parsed). \
-                        replace("##__V_ARM_GCC__##", v_arm_gcc). \
-                        replace("##__V_XPACK_GCC__##", v_xpack_gcc). \
-                        replace("##__OCD_PATH__##", ocd_path). \
-                        replace("##__ARM_GCC_PATH__##", arm_gcc_path). \
-                        replace("##__XPACK_GCC_PATH__##", xpack_gcc_path). \
-                        replace("##__MAKE_PATH__##", make_path). \
-                        replace("##__MSYS_PATH__##", msys_path)
-
-                write = True
-                if out_file.exists():
-                    if not overwrite or utils.compare_content(content, out_file):
-                        write = False
-
-                if write:
-                    with open(out_file, "w+", encoding="UTF-8") as f:
-                        f.write(content)
-                    os.chmod(out_file, stat.S_IRWXU | stat.S_IRGRP | stat.S_IWGRP | stat.S_IROTH)
-                    if out_file not in updated:
-                        updated.append(out_file)
-
-                    # print(f"Wrote {os.path.basename(out_loc)}")  # Uncomment to debug
+        report = {"path": out_path, "written": [], "skipped": [], "unchanged": []}
+        reports.append(report)
+        if database is not None:
+            report[database[1]].append(database[0])
 
-            else:
-                # There is a non-template file to copy
-                in_file = Path(directory).joinpath(file)
-                out_file = Path(out_path).joinpath(file)
-                
-                write = True
-                if out_file.exists():
-                    if not overwrite or (utils.hash_file(in_file) == utils.hash_file(out_file)):
-                        write = False
-
-                if write:
-                    if backup and out_file.exists():
-                        shutil.copy(out_file, out_path.joinpath(f"{out_file.name}.backup"))
-                    shutil.copy(in_file, out_path)
-                    os.chmod(out_file, stat.S_IRWXU | stat.S_IRGRP | stat.S_IWGRP | stat.S_IROTH)
-                    if out_file not in updated:
-                        updated.append(out_file)
-                    # print(f"Wrote {os.path.basename(file)}") # Uncomment to debug
-
-    return (len(updated) > 0)
+        for rel_dir, name, source, compiled in template:
+            content = None
+            if compiled is not None:
+                key = (source, values_key)
+                if key not in rendered:
+                    rendered[key] = compiled.render(values)
+                content = rendered[key]
+
+            out_file = out_path.joinpath(rel_dir, name)
+            jobs.append((report, out_file, (out_file, source, content, overwrite, backup, hash_index)))
+
+    if workers:
+        from concurrent.futures import ThreadPoolExecutor # Imported on demand to keep import time down
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda job: _write_file(*job[2]), jobs))
+    else:
+        results = [_write_file(*job[2]) for job in jobs]
+
+    for (report, out_file, _), result in zip(jobs, results):
+        report[result].append(out_file)
+
+    hash_index.save()
+
+    return reports
+
+def example_specs(maxim_path, targets: list = None, index=None, **options) -> list:
+    """
+    Build create_projects() specs for every example project in an MSDK installation, using the
+    SDK index (see sdk.py) to find them.  Each example gets the board its project.mk pins, or
+    else EvKit_V1 (or the target's first board if it has no EvKit_V1).  Any other keyword
+    arguments are copied into every spec.
+    """
+    if index is None:
+        try: # Imported on first use to keep import time down
+            from .sdk import SDKIndex
+        except ImportError:
+            from sdk import SDKIndex
+        index = SDKIndex(maxim_path)
+
+    specs = []
+    for target in (targets if targets is not None else index.targets()):
+        boards = index.boards(target)
+        default_board = "EvKit_V1" if "EvKit_V1" in boards or not boards else boards[0]
+        for example in index.examples(target):
+            spec = dict(options)
+            spec.setdefault("maxim_path", maxim_path)
+            spec.update({
+                "out_root": example.parent,
+                "out_stem": example.name,
+                "target": target,
+                "board": index.pinned_board(example) or default_board
+            })
+            specs.append(spec)
+
+    return specs
+
+def create_project(
+    out_root: str,
+    out_stem: str,
+    target: str,
+    board: str,
+    overwrite = False,
+    backup = False,
+    program_file: str = None,
+    symbol_file: str = None,
+    m4_ocd_interface_file: str = None,
+    m4_ocd_target_file: str = None,
+    rv_ocd_interface_file: str = None,
+    rv_ocd_target_file: str = None,
+    defines: list = None,
+    i_paths: list = None,
+    v_paths: list = None,
+    v_arm_gcc: str = None,
+    v_xpack_gcc: str = None,
+    ocd_path: str = None,
+    arm_gcc_path: str = None,
+    xpack_gcc_path: str = None,
+    make_path: str = None,
+    msys_path: str = None,
+    compiler_cache: bool = False,
+    compile_commands: bool = False,
+    trim_paths: bool = False,
+    maxim_path: str = None
+):
+    """
+    Generates Visual Studio Code project files from the VSCode-Maxim project.  Any optional
+    arguments left as None use the defaults from the master "inject" settings.json.  If
+    'compiler_cache' is set the project's build task compiles through the ccwrap object cache.
+
+    If 'compile_commands' is set the project's Makefile is dry-run into .vscode/compile_commands.json
+    for 'target' and 'board', and IntelliSense is pointed at it instead of the recursive include
+    paths.  'trim_paths' (implied by 'compile_commands') drops the include and browse paths that
+    don't exist for the target and board.  Both use 'maxim_path', or the MAXIM_PATH environment
+    variable if it's None.
+    """
+
+    spec = dict(locals())
+    report = create_projects([spec])[0]
+    return (len(report["written"]) > 0)
@@ -0,0 +1,271 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+# Change-impact selection for 'maintain.py test --changed ...'.
+#
+# Every build leaves compiler dependency files (.d, from -MD) next to its objects that list each
+# source and header the build read.  They're harvested before the build is cleaned and merged
+# into a persistent reverse index: file -> the (target, board, example) builds that read it.
+# Given a list of changed files, only the builds that read one of them need to run.
+#
+# The index can only vouch for files that were compiled, so everything else falls back to a
+# conservative rule based on where the file is:
+#   - builds with no dependency information yet, and builds that failed last time, are always
+#     selected
+#   - files inside an example select that example on every board
+#   - files under Libraries/Boards/<target>/<board> select that board's builds
+#   - files with a target name in their path select every build of that target
+#   - documentation and images are ignored
+#   - anything else (makefiles, linker scripts, new driver sources, ...) selects everything
+
+import json
+import os
+import re
+import subprocess
+from pathlib import Path
+
+try:
+    from . import utils
+except ImportError:
+    import utils
+
+# Files that can't change a build
+IGNORED_SUFFIXES = (".md", ".rst", ".txt", ".pdf", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".html", ".doxyfile")
+
+_DEP_SPLIT = re.compile(r"(?<!\\)\s+")
+
+def parse_depfile(text: str) -> list:
+    """Return every prerequisite listed in a make dependency (.d) file, in order"""
+    prerequisites = []
+    for rule in text.replace("\\\r\n", " ").replace("\\\n", " ").splitlines():
+        # "target: prerequisites".  The colon of a Windows drive letter is followed by a slash.
+        m = re.search(r":(?:\s|$)", rule)
+        if m is None:
+            continue
+        for p in _DEP_SPLIT.split(rule[m.end():].strip()):
+            if p:
+                prerequisites.append(p.replace("\\ ", " ").replace("$$", "$"))
+    return prerequisites
+
+def harvest(folders, cwd, maxim_path) -> list:
+    """
+    Collect the SDK files read by a build from the .d files in 'folders' (searched recursively).
+    Relative paths are resolved against 'cwd' (where make ran), or else the .d file's folder.
+    Returns sorted "/"-separated paths relative to 'maxim_path'; files outside it (toolchain
+    headers) are left out.
+    """
+    maxim_path = Path(maxim_path).resolve()
+    cwd = Path(cwd)
+    files = set()
+    for folder in folders:
+        for dirpath, _, names in os.walk(folder):
+            for name in names:
+                if not name.endswith(".d"):
+                    continue
+                try:
+                    with open(os.path.join(dirpath, name), "r", errors="replace") as f:
+                        prerequisites = parse_depfile(f.read())
+                except OSError:
+                    continue
+                for p in prerequisites:
+                    path = Path(p)
+                    if not path.is_absolute():
+                        path = cwd.joinpath(p) if cwd.joinpath(p).exists() else Path(dirpath, p)
+                    try:
+                        files.add(Path(os.path.normpath(path)).relative_to(maxim_path).as_posix())
+                    except ValueError:
+                        continue # Outside the SDK
+    return sorted(files)
+
+class DependencyIndex:
+    """
+    Persistent reverse index from SDK files to the builds that read them.  Builds are keyed on
+    (target, board, project), where 'project' is the example's "/"-separated path relative to
+    the SDK.  The index is a JSON file, saved by save().
+    """
+
+    VERSION = 2
+
+    def __init__(self, path, maxim_path):
+        self.path = Path(path)
+        self.maxim_path = str(Path(maxim_path).resolve())
+        self._files = []       # File id -> path
+        self._ids = {}         # Path -> file id
+        self._builds = {}      # (target, board, project) -> set of file ids
+        self._failed = set()   # Builds whose last result was a failure
+        self._dependents = None
+        self._dirty = False
+
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION and data.get("maxim_path") == self.maxim_path:
+                self._files = data["files"]
+                self._ids = {p: i for i, p in enumerate(self._files)}
+                self._builds = {tuple(k.split("|")): set(v) for k, v in data["builds"].items()}
+                self._failed = {tuple(k.split("|")) for k in data["failed"]}
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _id(self, path):
+        if path not in self._ids:
+            self._ids[path] = len(self._files)
+            self._files.append(path)
+        return self._ids[path]
+
+    def update(self, target, board, project, files, succeeded=True):
+        """
+        Record the files read by a build.  Successful builds replace the build's entry, while
+        failed builds (which may have stopped part-way) only add to it and are marked as failed
+        until they succeed again.  A build that read nothing isn't recorded at all.
+        """
+        ids = {self._id(f) for f in files}
+        key = (target, board, project)
+        if not succeeded:
+            ids |= self._builds.get(key, set())
+        if succeeded and key in self._failed:
+            self._failed.discard(key)
+            self._dirty = True
+        elif not succeeded and key not in self._failed:
+            self._failed.add(key)
+            self._dirty = True
+        if self._builds.get(key, set()) != ids:
+            if ids:
+                self._builds[key] = ids
+            else:
+                del self._builds[key]
+            self._dependents = None
+            self._dirty = True
+
+    def known(self, target, board, project) -> bool:
+        """Whether the files read by a build are known"""
+        return (target, board, project) in self._builds
+
+    def failed(self, target, board, project) -> bool:
+        """Whether a build failed last time it ran"""
+        return (target, board, project) in self._failed
+
+    def dependents(self, path) -> set:
+        """The builds that read 'path' ("/"-separated, relative to the SDK)"""
+        if self._dependents is None:
+            self._dependents = {}
+            for key, ids in self._builds.items():
+                for i in ids:
+                    self._dependents.setdefault(i, set()).add(key)
+        i = self._ids.get(path)
+        return set() if i is None else self._dependents.get(i, set())
+
+    def save(self):
+        if not self._dirty:
+            return
+
+        # Drop files that no build reads any more, and renumber the rest
+        live = sorted({i for ids in self._builds.values() for i in ids})
+        renumber = {old: new for new, old in enumerate(live)}
+        data = json.dumps({
+            "version": self.VERSION,
+            "maxim_path": self.maxim_path,
+            "files": [self._files[i] for i in live],
+            "builds": {"|".join(k): sorted(renumber[i] for i in ids) for k, ids in sorted(self._builds.items())},
+            "failed": sorted("|".join(k) for k in self._failed)
+        })
+        os.makedirs(self.path.parent, exist_ok=True)
+        utils.atomic_write(self.path, data.encode("utf-8"))
+        self._dirty = False
+
+def relative_paths(paths, maxim_path) -> list:
+    """
+    Convert changed paths (absolute, or relative to the SDK) to "/"-separated paths relative to
+    the SDK.  Paths outside the SDK are dropped.
+    """
+    maxim_path = Path(maxim_path).resolve()
+    result = []
+    for p in paths:
+        p = p.strip().replace("\\", "/")
+        if not p:
+            continue
+        path = Path(p)
+        if path.is_absolute():
+            try:
+                p = Path(os.path.normpath(path)).relative_to(maxim_path).as_posix()
+            except ValueError:
+                continue
+        result.append(os.path.normpath(p).replace("\\", "/"))
+    return result
+
+def git_changed(maxim_path, rev) -> list:
+    """
+    The files that differ between git revision 'rev' and the SDK's working tree (including
+    untracked files), relative to the SDK
+    """
+    changed = subprocess.run(["git", "-C", str(maxim_path), "diff", "--name-only", "--relative", rev],
+                             capture_output=True, text=True, check=True).stdout.splitlines()
+    changed += subprocess.run(["git", "-C", str(maxim_path), "ls-files", "--others", "--exclude-standard"],
+                              capture_output=True, text=True, check=True).stdout.splitlines()
+    return sorted(set(changed))
+
+def _in_example(maxim_path, parts) -> bool:
+    """Whether an Examples/... path is inside an example project (a folder with a Makefile)"""
+    for depth in range(len(parts) - 1, 2, -1):
+        if Path(maxim_path, *parts[:depth], "Makefile").exists():
+            return True
+    return False
+
+def select(index: DependencyIndex, changed: list, builds: list, targets: list, maxim_path) -> dict:
+    """
+    Pick the builds (a list of (target, board, project) keys) impacted by the 'changed' files
+    ("/"-separated, relative to the SDK).  'targets' are all of the SDK's targets, tested or not.
+    Returns {build: reason} for the selected builds.
+    """
+    selected = {}
+    for build in builds:
+        if index.failed(*build):
+            selected[build] = "Failed last time"
+        elif not index.known(*build):
+            selected[build] = "No dependency information yet"
+
+    targets = {t.upper() for t in targets}
+    for path in changed:
+        if path.lower().endswith(IGNORED_SUFFIXES):
+            continue
+
+        dependents = index.dependents(path)
+        if dependents:
+            for build in builds:
+                if build in dependents:
+                    selected.setdefault(build, f"Reads {path}")
+            continue
+
+        # Not something any build compiled, fall back on where it is
+        parts = path.split("/")
+        if parts[0] == "Examples" and _in_example(maxim_path, parts):
+            matched = [b for b in builds if path.startswith(f"{b[2]}/")] # Examples don't share files
+        elif parts[:2] == ["Libraries", "Boards"] and len(parts) > 4 and Path(maxim_path, *parts[:4], "board.mk").exists():
+            matched = [b for b in builds if b[0] == parts[2] and b[1] == parts[3]]
+        else:
+            components = {p.upper() for p in parts[:-1]} & targets
+            if components:
+                matched = [b for b in builds if b[0].upper() in components]
+            else:
+                matched = builds
+        for build in matched:
+            selected.setdefault(build, f"Might be affected by {path}")
+
+    return selected
@@ -0,0 +1,187 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+# Deduplicated, compressed store for the logs of failed builds.
+#
+# When a shared driver breaks, every example that uses it fails with the same errors, and the
+# logs differ only in paths, board names, and timestamps.  Each log is normalized (the SDK,
+# project, and temporary paths, board and target names, and timestamps are replaced with
+# placeholders) and keyed on a hash of its normalized diagnostics.  The first log seen for each
+# key is stored gzipped under objects/, and the other combinations just point at it.
+#
+# The store's index (index.db) maps every stored combination to its log and to the signature of
+# its first error, so failures can be grouped by cause across the whole matrix.
+
+import gzip
+import os
+import re
+import sqlite3
+from pathlib import Path
+
+try:
+    from . import utils
+    from . import streaming
+except ImportError:
+    import utils
+    import streaming
+
+_TIMESTAMP = re.compile(r"\[\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{1,2}:\d{1,2}\]")
+_TEMP_FILE = re.compile(r"(?:/tmp|[A-Za-z]:[\\/][^\s:]*?[\\/]Temp)[\\/](?:cc|tmp)[\w.-]+")
+MAX_DIAGNOSTICS = 1000 # Diagnostics hashed per log
+
+def normalize(text: str, replacements: dict) -> str:
+    """
+    Replace every key of 'replacements' in 'text' with its value, longest first, then replace
+    timestamps and compiler temporary files with placeholders.  Keys that look like words (board,
+    target names) are only replaced as whole words.
+    """
+    for old in sorted(replacements, key=len, reverse=True):
+        new = replacements[old]
+        if re.fullmatch(r"\w+", old):
+            text = re.sub(rf"(?<![\w]){re.escape(old)}(?![\w])", new, text)
+        else:
+            text = text.replace(old, new)
+    text = _TIMESTAMP.sub("[${TIME}]", text)
+    return _TEMP_FILE.sub("${TMPFILE}", text)
+
+def _signature(diagnostics: list, lines: list) -> str:
+    """The first error, or the last line of output if the log has no errors (timeouts, make errors)"""
+    for d in diagnostics:
+        if d["severity"] == "error":
+            return streaming.format_diagnostic(dict(d, column=None))
+    for line in reversed(lines):
+        if line.strip(" =\t"):
+            return line.strip()
+    return "(empty log)"
+
+class LogStore:
+    """
+    Store of normalized, deduplicated build logs in folder 'root'.  add() stores a log and returns
+    where it went.  Index rows are committed by commit() (or close()).
+    """
+    def __init__(self, root):
+        self.root = Path(root)
+        os.makedirs(self.root.joinpath("objects"), exist_ok=True)
+        self.conn = sqlite3.connect(self.root.joinpath("index.db"))
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS blobs (
+            digest TEXT PRIMARY KEY,
+            size INTEGER,
+            stored_size INTEGER
+        )""")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS logs (
+            run_id INTEGER,
+            target TEXT,
+            board TEXT,
+            project TEXT,
+            digest TEXT REFERENCES blobs(digest),
+            signature TEXT,
+            size INTEGER
+        )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS logs_signature ON logs(signature)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS logs_run ON logs(run_id)")
+        self.conn.commit()
+
+    def path(self, digest) -> Path:
+        return self.root.joinpath("objects", digest[:2], f"{digest}.log.gz")
+
+    def add(self, log_file, target, board, project, run_id=None, replacements=None) -> dict:
+        """
+        Normalize and store a log file.  'replacements' maps extra literal strings (ex: the SDK
+        and project folders) to placeholders; 'target' and 'board' are always replaced.
+        Returns {"digest", "signature", "path", "new"}, where 'new' is False if an identical log
+        was already stored.
+        """
+        with open(log_file, "rb") as f:
+            raw = f.read()
+        replacements = dict(replacements or {})
+        replacements.setdefault(board, "${BOARD}")
+        replacements.setdefault(target, "${TARGET}")
+        text = normalize(raw.decode("utf-8", errors="replace"), replacements)
+
+        # maintain.py appends the clean's output to the build log, leave it out
+        lines = text.splitlines()
+        end = next((i for i, l in enumerate(lines) if l.startswith("[CLEAN COMMAND]")), len(lines))
+        lines = lines[:end]
+        diagnostics = []
+        for line in lines:
+            d = streaming.parse_diagnostic(line[:streaming.MAX_LINE])
+            if d is not None:
+                diagnostics.append(d)
+                if len(diagnostics) == MAX_DIAGNOSTICS:
+                    break
+
+        # Logs with the same diagnostics are the same failure.  Without any, fall back to the
+        # end of the output, which is where make reports what went wrong.
+        if diagnostics:
+            key = "\n".join(streaming.format_diagnostic(d) for d in diagnostics)
+        else:
+            key = "\n".join(l for l in lines if not l.startswith("[BUILD COMMAND]"))[-4096:]
+        digest = utils.hash(key).hex()
+        signature = _signature(diagnostics, lines)
+
+        path = self.path(digest)
+        new = self.conn.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone() is None or not path.exists()
+        if new:
+            os.makedirs(path.parent, exist_ok=True)
+            data = gzip.compress(text.encode("utf-8"), compresslevel=6, mtime=0)
+            utils.atomic_write(path, data)
+            self.conn.execute("INSERT OR REPLACE INTO blobs (digest, size, stored_size) VALUES (?, ?, ?)", (digest, len(raw), len(data)))
+
+        self.conn.execute(
+            "INSERT INTO logs (run_id, target, board, project, digest, signature, size) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (run_id, target, board, project, digest, signature, len(raw))
+        )
+        return {"digest": digest, "signature": signature, "path": path, "new": new}
+
+    def read(self, digest) -> str:
+        with gzip.open(self.path(digest), "rt", encoding="utf-8") as f:
+            return f.read()
+
+    def signatures(self, run_id=None) -> dict:
+        """
+        Group stored logs by first-error signature: {signature: [{"target", "board", "project",
+        "digest"}]}, optionally for one run only.  Signatures are ordered by how many
+        combinations they affect.
+        """
+        query = "SELECT signature, target, board, project, digest FROM logs"
+        params = ()
+        if run_id is not None:
+            query += " WHERE run_id = ?"
+            params = (run_id,)
+        groups = {}
+        for signature, target, board, project, digest in self.conn.execute(query + " ORDER BY rowid", params):
+            groups.setdefault(signature, []).append({"target": target, "board": board, "project": project, "digest": digest})
+        return dict(sorted(groups.items(), key=lambda g: -len(g[1])))
+
+    def stats(self, run_id=None) -> dict:
+        """Number of logs and their total size, and the number and stored size of the unique logs among them"""
+        where = "" if run_id is None else " WHERE run_id = ?"
+        params = () if run_id is None else (run_id,)
+        logs, size = self.conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM logs{where}", params).fetchone()
+        unique, stored = self.conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(stored_size), 0) FROM blobs WHERE digest IN (SELECT digest FROM logs{where})", params).fetchone()
+        return {"logs": logs, "size": size, "unique": unique, "stored_size": stored}
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
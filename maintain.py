@@ -19,13 +19,35 @@
  ##############################################################################
 
 import os, sys
-from subprocess import run
+from subprocess import run, CalledProcessError
 import platform
 import time
 import shutil
+import stat
+import tempfile
 import argparse
 from pathlib import Path
 from datetime import date
+import importlib
+import json
+import re
+import threading
+
+# maintain.py is run directly as a script as well as imported as part of the package
+try:
+    from . import utils
+except ImportError:
+    import utils
+
+def _import(name):
+    """
+    Import one of this package's modules on first use, so that importing maintain (ex: for
+    generate's sync()) doesn't load the test harness
+    """
+    try:
+        return importlib.import_module(f".{name}", __package__)
+    except (ImportError, TypeError): # TypeError: run as a script, so there's no package
+        return importlib.import_module(name)
 
 # Get location of this file.
 # Need to use this so that template look-ups are decoupled from the caller's working directory 
@@ -34,55 +56,280 @@ _vscode_dir = here
 
 curplatform = platform.system() # Get OS
 
-def log(string, file):
-    with open(file, "a") as f:
+class Logger:
+    """
+    Prints to the console and writes to a log file.  The file is kept open (and buffered) for
+    the lifetime of the logger instead of being re-opened and flushed for every line.
+    """
+    def __init__(self, file):
+        self.file = open(file, "a", buffering=64 * 1024)
+
+    def __call__(self, string):
         print(string)
-        f.write(f"{string}\n")
-        f.flush()
+        self.file.write(f"{string}\n")
+
+    def close(self):
+        self.file.close()
 
 def timestamp():
     now = time.localtime()
     return f"[{now.tm_mon}/{now.tm_mday}/{now.tm_year} {now.tm_hour}:{now.tm_min}:{now.tm_sec}]"
 
 
-duration = 0
-def time_me(f):
+def _sync_manifest():
+    """
+    Return the (source, destination) file pairs kept in sync with the master "Inject" folder
+    """
+    inject_dir = _vscode_dir.joinpath("MaximSDK", "Inject", ".vscode")
+    new_proj_dir = _vscode_dir.joinpath("MaximSDK", "New_Project", ".vscode")
+    template_dir = _vscode_dir.joinpath("MaximSDK", "Template", ".vscode")
 
-    def wrapper(*args, **kwargs):
-        start = time.time() # Start timer
-        res = f(*args, **kwargs)
-        end = time.time() # Stop timer
-        global duration # Use global duration variable so main script can access elapsed time
-        duration = end - start # Calculate duration
-        
-        return res
+    # Inject .vscode folder into example projects
+    manifest = [(Path(f.path), new_proj_dir.joinpath(f.name)) for f in os.scandir(inject_dir) if f.is_file()]
+    manifest.append((inject_dir.parent / "Makefile", new_proj_dir.parent / "Makefile"))
 
-    return wrapper
+    # Copy files into template folder
+    for f in ["launch.json", "c_cpp_properties.json", "tasks.json", "flash.gdb"]:
+        manifest.append((inject_dir.joinpath(f), template_dir.joinpath(f)))
+    manifest.append((_vscode_dir.joinpath("README.md"), template_dir.joinpath("README.md")))
 
-@time_me
-def run_cmd(*args, **kwargs):
-    return run(*args, **kwargs)
+    return sorted(manifest)
 
-def sync():
-    # Inject .vscode folder into example projects
-    inject_dir = _vscode_dir.joinpath("MaximSDK", "Inject", ".vscode")
-    new_proj_dir = _vscode_dir.joinpath("MaximSDK", "New_Project", ".vscode")
-    template_dir = _vscode_dir.joinpath("MaximSDK", "Template", ".vscode")
+def _manifest_stats(manifest):
+    stats = []
+    for src, dst in manifest:
+        for f in (src, dst):
+            try:
+                st = os.stat(f)
+                stats.append((st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                stats.append(None)
+    return stats
+
+_last_sync = None
+
+def sync(check=False):
+    """
+    Copy any files from the master "Inject" folder whose content differs from the New_Project and
+    Template folders.  Files are written atomically, and unchanged files are left untouched so
+    their timestamps are preserved.  Returns the list of destination files that changed (or, with
+    'check' set, the files that would change, without writing anything).
+    """
+    global _last_sync
+
+    manifest = _sync_manifest()
+
+    # Skip the comparison entirely if nothing has been touched since the last sync in this process
+    if _manifest_stats(manifest) == _last_sync:
+        return []
 
     print("Syncing VSCode template...")
-    for f in os.scandir(inject_dir):
-        shutil.copy(f, new_proj_dir)
+    changed = []
+    for src, dst in manifest:
+        if dst.exists() and dst.stat().st_size == src.stat().st_size and utils.hash_file(src) == utils.hash_file(dst):
+            continue
 
-    shutil.copy(inject_dir.parent / "Makefile", new_proj_dir.parent)
+        changed.append(dst)
+        if not check:
+            os.makedirs(dst.parent, exist_ok=True)
+            utils.atomic_copy(src, dst)
 
-    # Copy files into template folder
-    shutil.copy(inject_dir.joinpath("launch.json"), template_dir)
-    shutil.copy(inject_dir.joinpath("c_cpp_properties.json"), template_dir)
-    shutil.copy(inject_dir.joinpath("tasks.json"), template_dir)
-    shutil.copy(inject_dir.joinpath("flash.gdb"), template_dir)
-    shutil.copy(_vscode_dir.joinpath("README.md"), template_dir)    
+    if not check:
+        _last_sync = _manifest_stats(manifest)
 
-def release(version):
+    return changed
+
+def inject(maxim_path, targets=None, jobs=8, overwrite=True, backup=False, compile_commands=False, trim_paths=False) -> list:
+    """
+    Inject the project template into every example project of a MaximSDK installation.  Examples
+    are found with the SDK index, and each example's target is taken from its Examples/<target>
+    folder.  Settings are rendered once per (target, board) and shared by all of its examples,
+    and files are written on a pool of 'jobs' threads.  Returns the create_projects() reports.
+    'compile_commands' and 'trim_paths' are passed on to every project (see generate.create_project).
+    """
+    try:
+        from . import generate
+    except ImportError:
+        import generate
+
+    maxim_path = Path(maxim_path).resolve()
+    sync()
+    generate.synced = True
+
+    sdk = _import("sdk")
+
+    start = time.perf_counter()
+    index = sdk.SDKIndex(maxim_path)
+    specs = generate.example_specs(maxim_path, targets, index=index, overwrite=overwrite, backup=backup,
+                                   compile_commands=compile_commands, trim_paths=trim_paths)
+    reports = generate.create_projects(specs, workers=jobs)
+    elapsed = time.perf_counter() - start
+
+    written = sum(len(r["written"]) for r in reports)
+    unchanged = sum(len(r["unchanged"]) for r in reports)
+    skipped = sum(len(r["skipped"]) for r in reports)
+    files = written + unchanged + skipped
+    print(f"[INJECT] {len(reports)} examples, {files} files ({written} written, {unchanged} unchanged, {skipped} skipped) in {elapsed:.2f}s ({files / elapsed if elapsed else 0:.0f} files/s)")
+    return reports
+
+def _release_manifest() -> dict:
+    """
+    Map each file of a release (by its "/"-separated path inside the release folder) to its
+    source file, in sorted order
+    """
+    manifest = {}
+    for folder in ("Inject", "New_Project"):
+        src_dir = Path("MaximSDK", folder)
+        for dirpath, subdirs, files in os.walk(src_dir):
+            for file in files:
+                src = Path(dirpath).joinpath(file)
+                manifest[f"{folder}/{src.relative_to(src_dir).as_posix()}"] = src
+
+    for file in ("README.md", "userguide.md", "LICENSE.md"):
+        manifest[file] = Path(file)
+
+    return dict(sorted(manifest.items()))
+
+# Where _mirror() records the files it has placed in each destination folder.  It's outside the
+# repository, so the records never end up in a release.
+MIRROR_STATE_DIR = Path.home().joinpath(".cache", "vscode-maxim", "mirrors")
+
+def _mirror_state(dst_dir: Path, state_dir=None) -> Path:
+    """
+    Return the file in 'state_dir' (default: MIRROR_STATE_DIR) that records which files _mirror()
+    has placed in 'dst_dir'
+    """
+    state_dir = Path(state_dir) if state_dir is not None else MIRROR_STATE_DIR
+    return state_dir.joinpath(f"{utils.hash(str(dst_dir.resolve())).hex()}.json")
+
+def _mirror(manifest: dict, dst_dir: Path, hardlink=False, index=None, state_dir=None) -> dict:
+    """
+    Make 'dst_dir' hold the files in 'manifest'.  Files whose content already matches are left
+    alone, and the rest are placed with utils.clone_file().  Files that an earlier _mirror() placed
+    in 'dst_dir' but that aren't in the manifest anymore are removed.  Any other files in 'dst_dir'
+    are never touched.  The placed files are recorded in 'state_dir' (see _mirror_state).
+    Returns a count of files per action ("unchanged", "removed", "copy", "reflink", "hardlink").
+    """
+    if index is None:
+        index = utils.default_hash_index()
+
+    state_file = _mirror_state(dst_dir, state_dir)
+    placed = []
+    if state_file.exists():
+        with open(state_file, "r") as f:
+            placed = json.load(f)
+
+    counts = {}
+    for rel, src in manifest.items():
+        dst = dst_dir.joinpath(rel)
+        try:
+            src_st = os.stat(src)
+            dst_st = os.stat(dst)
+            same = (src_st.st_ino == dst_st.st_ino and src_st.st_dev == dst_st.st_dev) or (
+                src_st.st_size == dst_st.st_size and index.hash_file(src) == index.hash_file(dst)
+            )
+        except FileNotFoundError:
+            same = False
+
+        if same:
+            action = "unchanged"
+        else:
+            os.makedirs(dst.parent, exist_ok=True)
+            action = utils.clone_file(src, dst, hardlink=hardlink)
+        counts[action] = counts.get(action, 0) + 1
+
+    for rel in placed:
+        if rel in manifest:
+            continue
+        path = dst_dir.joinpath(rel)
+        if path.exists():
+            os.remove(path)
+            counts["removed"] = counts.get("removed", 0) + 1
+        # Remove any folders that are now empty
+        for parent in list(Path(rel).parents)[:-1]:
+            try:
+                os.rmdir(dst_dir.joinpath(parent))
+            except OSError:
+                break
+
+    os.makedirs(state_file.parent, exist_ok=True)
+    utils.atomic_write(state_file, json.dumps(list(manifest)).encode("utf-8"))
+
+    return counts
+
+def _write_archive(manifest: dict, root: Path, out_file: Path, epoch: int):
+    """
+    Write the files in 'manifest' (read from 'root') to a .zip, .tar.gz, or .tar.zst archive in a
+    single streaming pass, under a top-level folder named after 'root'.  Entries are sorted and
+    get the timestamp 'epoch', fixed permissions, and no owner, so the same release contents
+    always produce a bit-identical archive.
+    """
+    name = out_file.name
+    prefix = root.name
+
+    def mode(path):
+        return 0o755 if os.stat(path).st_mode & stat.S_IXUSR else 0o644
+
+    fd, tmp = tempfile.mkstemp(dir=out_file.parent, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            if name.endswith(".zip"):
+                import zipfile
+                date_time = time.gmtime(max(epoch, 315532800))[:6] # Zip can't store dates before 1980
+                with zipfile.ZipFile(raw, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                    for rel in manifest:
+                        path = root.joinpath(rel)
+                        info = zipfile.ZipInfo(f"{prefix}/{rel}", date_time)
+                        info.compress_type = zipfile.ZIP_DEFLATED
+                        info.create_system = 3 # Unix, so that external_attr holds the permissions
+                        info.external_attr = (stat.S_IFREG | mode(path)) << 16
+                        with open(path, "rb") as f, archive.open(info, "w") as entry:
+                            shutil.copyfileobj(f, entry, utils.CHUNK_SIZE)
+
+            elif name.endswith(".tar.gz") or name.endswith(".tar.zst"):
+                import tarfile
+                if name.endswith(".tar.gz"):
+                    import gzip
+                    stream = gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=epoch)
+                else:
+                    try:
+                        import zstandard
+                    except ImportError:
+                        raise Exception("Writing .tar.zst archives requires the 'zstandard' package (pip install zstandard).")
+                    stream = zstandard.ZstdCompressor(level=19).stream_writer(raw, closefd=False)
+
+                with stream, tarfile.open(fileobj=stream, mode="w|", format=tarfile.PAX_FORMAT) as archive:
+                    for rel in manifest:
+                        path = root.joinpath(rel)
+                        info = tarfile.TarInfo(f"{prefix}/{rel}")
+                        info.size = os.stat(path).st_size
+                        info.mtime = epoch
+                        info.mode = mode(path)
+                        with open(path, "rb") as f:
+                            archive.addfile(info, f)
+
+            else:
+                raise Exception(f"Unsupported archive format '{name}'.  Supported formats are .zip, .tar.gz, and .tar.zst")
+
+        os.chmod(tmp, 0o644) # mkstemp creates the file owner-only
+        os.replace(tmp, out_file)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def release(version, archives=None, links=True, state_dir=None):
+    """
+    Package a release into Releases/VSCode-Maxim-<version> and the installer's data folder.
+
+    Both folders are mirrored from a manifest of the release contents, so only files that
+    changed since the last release build are copied.  Copies are reflinked where the filesystem
+    supports it, and if 'links' is set the installer's copy is hardlinked to the release folder.
+    'archives' is a list of archive formats ("zip", "tar.gz", "tar.zst") to write next to the
+    release folder.  Archive timestamps come from the SOURCE_DATE_EPOCH environment variable, or
+    the date of the last commit, so archives are reproducible.  'state_dir' is where the
+    mirrored files are recorded (see _mirror_state).
+    """
     sync()
     
     r_dir = Path(f"./Releases/VSCode-Maxim-{version}") # Release directory
@@ -94,18 +341,30 @@ def release(version):
     #     out_dir = r_dir.joinpath(Path(str(i).replace(i.anchor, ""))) # Strip drive info and pre-pend output directory
     #     shutil.copytree(i, out_dir, dirs_exist_ok=True)
 
-    print("Copying Inject & New_Project folders")
-    shutil.copytree(Path("MaximSDK/Inject"), r_dir.joinpath("Inject"), dirs_exist_ok=True)
-    shutil.copytree(Path("MaximSDK/New_Project"), r_dir.joinpath("New_Project"), dirs_exist_ok=True)
+    manifest = _release_manifest()
+    index = utils.default_hash_index()
 
-    print("Copying markdown files")
-    shutil.copy("README.md", r_dir)
-    shutil.copy("userguide.md", r_dir)
-    shutil.copy("LICENSE.md", r_dir)
+    print("Copying Inject & New_Project folders, markdown files")
+    counts = _mirror(manifest, r_dir, index=index, state_dir=state_dir)
+    print(f"{r_dir}: {counts}")
 
     # Copy in to installer package
     print("Updating installer package...")
-    shutil.copytree(r_dir, Path("./installer/com.maximintegrated.dist.vscodemaxim/data/Tools/VSCode-Maxim"), dirs_exist_ok=True)
+    installer_dir = Path("./installer/com.maximintegrated.dist.vscodemaxim/data/Tools/VSCode-Maxim")
+    counts = _mirror({rel: r_dir.joinpath(rel) for rel in manifest}, installer_dir, hardlink=links, index=index, state_dir=state_dir)
+    print(f"{installer_dir}: {counts}")
+
+    index.save()
+
+    if archives:
+        epoch = os.environ.get("SOURCE_DATE_EPOCH")
+        if epoch is None:
+            res = run(["git", "log", "-1", "--format=%ct"], capture_output=True, text=True)
+            epoch = res.stdout.strip() if res.returncode == 0 and res.stdout.strip() else 0
+        for fmt in archives:
+            out_file = r_dir.parent.joinpath(f"{r_dir.name}.{fmt}")
+            print(f"Writing {out_file}")
+            _write_archive(manifest, r_dir, out_file, int(epoch))
 
     # Update version # and release date in package.xml
     # ---
@@ -138,14 +397,424 @@ def release(version):
     with open(installscript_path, "w") as js:
         js.writelines(lines)
 
-    # Update dat afolder in installer package
-    shutil.copytree(r_dir, Path("installer/com.maximintegrated.dist.vscodemaxim/data/Tools/VSCode-Maxim/"), dirs_exist_ok=True)
-
     # Update release date
     print("Done!")
 
+def _toolchain_version(env):
+    """
+    Return the version banners of the Arm and RISC-V compilers on the PATH, or an empty string
+    for any compiler that can't be found.
+    """
+    version = ""
+    for compiler in ["arm-none-eabi-gcc", "riscv-none-elf-gcc"]:
+        exe = shutil.which(compiler, path=env.get("PATH"))
+        if exe is not None:
+            res = run([exe, "--version"], env=env, capture_output=True, encoding="utf-8")
+            version += res.stdout.splitlines()[0] if res.stdout else ""
+        version += "\n"
+    return version
+
+def _project_libraries(maxim_path, project):
+    """
+    Return the folders under Libraries/ for any optional libraries enabled in the project's
+    project.mk (ex: LIB_FREERTOS = 1 -> Libraries/FreeRTOS)
+    """
+    projectmk = project.joinpath("project.mk")
+    if not projectmk.exists():
+        return []
+
+    with open(projectmk, "r", encoding="utf-8", errors="replace") as f:
+        enabled = re.findall(r"^\s*LIB_(\w+)\s*[:?+]?=\s*1\s*$", f.read(), re.MULTILINE)
+
+    libs_dir = maxim_path.joinpath("Libraries")
+    available = {d.name.upper(): Path(d.path) for d in os.scandir(libs_dir) if d.is_dir()}
+    return [available[lib.upper()] for lib in sorted(set(enabled)) if lib.upper() in available]
+
+# Project-level variables that the peripheral driver library build also reads
+_PERIPH_BUILD_VARS = ("PROJ_CFLAGS", "PROJ_AFLAGS", "MXC_OPTIMIZE_CFLAGS", "MFLOAT_ABI", "MFPU", "RISCV_CORE", "RISCV_LOAD", "DEBUG")
+
+def _project_build_vars(project):
+    """
+    Return the project.mk assignments (ex: "MFLOAT_ABI = soft") to any of the variables that
+    change how the peripheral driver library is built, in the order they appear
+    """
+    projectmk = project.joinpath("project.mk")
+    if not projectmk.exists():
+        return []
+
+    with open(projectmk, "r", encoding="utf-8", errors="replace") as f:
+        text = re.sub(r"\\\n", " ", f.read()) # Join continued lines
+
+    pattern = r"^\s*(?:override\s+|export\s+)?((?:" + "|".join(_PERIPH_BUILD_VARS) + r")\s*[:?+]?=.*?)\s*$"
+    return [" ".join(assignment.split()) for assignment in re.findall(pattern, text, re.MULTILINE)]
+
+def _combination_key(maxim_path, target, board, project, toolchain, tree_digest):
+    """
+    Compute the incremental-test cache key for a (project, board) combination.  This covers
+    the example folder, the board's BSP, the libraries it builds against, and the toolchain version.
+    'tree_digest' is a (memoized) function that hashes a file or folder.
+    """
+    libs_dir = maxim_path.joinpath("Libraries")
+    trees = [
+        project,
+        libs_dir.joinpath("Boards", target, board),
+        libs_dir.joinpath("PeriphDrivers"),
+        libs_dir.joinpath("CMSIS", "Device", "Maxim", target.upper()),
+        libs_dir.joinpath("CMSIS", "Include"),
+        libs_dir.joinpath("MiscDrivers")
+    ] + _project_libraries(maxim_path, project)
+
+    key = f"{target}\n{board}\n{project.relative_to(maxim_path).as_posix()}\n{toolchain}"
+    for tree in trees:
+        key += f"{tree.relative_to(maxim_path).as_posix()}:{tree_digest(tree)}\n"
+
+    # Top-level library makefiles (libs.mk, etc.)
+    for f in sorted(libs_dir.glob("*.mk")):
+        key += f"{f.name}:{tree_digest(f)}\n"
+
+    return utils.hash(key).hex()
+
+def _periph_key(maxim_path, target, board, project, toolchain, tree_digest):
+    """
+    Compute the content address of a prebuilt peripheral driver library for a (target, board, toolchain).
+    Projects that override any of the library's build variables (see _project_build_vars) get a
+    library of their own, while all other projects share one.
+    """
+    libs_dir = maxim_path.joinpath("Libraries")
+    key = f"{target}\n{board}\n{toolchain}"
+    for assignment in _project_build_vars(project):
+        key += f"{assignment}\n"
+    for tree in [libs_dir.joinpath("PeriphDrivers"), libs_dir.joinpath("CMSIS", "Device", "Maxim", target.upper())]:
+        key += f"{tree.relative_to(maxim_path).as_posix()}:{tree_digest(tree)}\n"
+    return utils.hash(key).hex()
+
+class PeriphCache:
+    """
+    Content-addressed cache of prebuilt peripheral driver libraries.  Every example build for the
+    same (target, board, toolchain) links against the same library folder.  The first build that
+    uses a library folder in a test run builds (or refreshes) it, and any other builds that need it
+    wait until it's ready.
+    """
+    def __init__(self, root):
+        self.root = Path(root).resolve()
+        self._ready = set()
+        self._locks = {}
+
+    def path(self, target, key):
+        return self.root.joinpath(target, key[:16])
+
+    async def build(self, periph_dir, build_fn, slots=None):
+        """
+        Run the coroutine function 'build_fn', making sure 'periph_dir' is only built by one build
+        at a time.  'slots' is the caller's job semaphore, which is handed back while waiting for
+        another build to finish the library, so that other builds can use it meanwhile.
+        """
+        import asyncio
+        lock = self._locks.setdefault(periph_dir, asyncio.Lock())
+
+        while slots is not None and lock.locked() and periph_dir not in self._ready:
+            slots.release()
+            try:
+                async with lock:
+                    pass
+            finally:
+                await slots.acquire()
+
+        async with lock:
+            if periph_dir not in self._ready:
+                res = await build_fn()
+                if res.returncode == 0:
+                    self._ready.add(periph_dir)
+                return res
+
+        return await build_fn()
+
+async def _build_project(maxim_path, target, board, project, env, make_jobs, isolate, log_file, periph_cache=None, periph_dir=None, profile=None,
+                         timeout=None, cancel=None, on_diagnostic=None, compdb_file=None, slots=None):
+    """
+    Build and clean a single (project, board) combination.  When 'isolate' is set the build
+    products go to a board-specific build directory, so the same project can be built for
+    multiple boards at the same time.  When a 'periph_cache' is given the project links against
+    the prebuilt peripheral driver library in 'periph_dir' and the library is not cleaned.
+    'slots' is the job semaphore the build holds, if any (see PeriphCache.build).
+    When a 'profile' file is given, every compiler invocation made by the build is recorded to
+    it (the compiler shims must already be on the PATH).  Likewise, every compile's command line
+    is recorded to the 'compdb_file', if one is given.
+
+    The output of both commands is streamed to 'log_file' (see streaming.stream_cmd), and each
+    command is stopped if it takes longer than 'timeout' seconds or 'cancel' is set.  The clean
+    is skipped if the build was cancelled.  The firmware's footprint (see footprint.measure)
+    is taken between a successful build and the clean, along with the SDK files the build read
+    (from the compiler's .d files, see impact.harvest).
+    """
+    import asyncio
+    streaming, footprint, impact = _import("streaming"), _import("footprint"), _import("impact")
+
+    if profile is not None:
+        if profile.exists():
+            os.remove(profile)
+        env = dict(env, MSDK_CCWRAP_PROFILE=str(profile))
+    if compdb_file is not None:
+        if compdb_file.exists():
+            os.remove(compdb_file)
+        env = dict(env, MSDK_CCWRAP_COMPDB=str(compdb_file))
+
+    build_args = f"TARGET={target} MAXIM_PATH={maxim_path.as_posix()} BOARD={board} MAKE=make"
+    build_dir = project.joinpath("build")
+    if isolate:
+        build_dir = project.joinpath("build", board)
+        build_args += f" BUILD_DIR={build_dir.as_posix()}"
+        if periph_cache is None:
+            build_args += f" PERIPH_DRIVER_BUILD_DIR={build_dir.joinpath('PeriphDriver').as_posix()}"
+    if periph_cache is not None:
+        build_args += f" PERIPH_DRIVER_BUILD_DIR={periph_dir.as_posix()}"
+
+    # Test build (make all)
+    build_cmd = f"make -r -j {make_jobs} {build_args}"
+    header = f"===============\n{timestamp()}\n[PROJECT] {project}\n[BOARD] {board}\n[BUILD COMMAND] {build_cmd}\n===============\n"
+    build_fn = lambda: streaming.stream_cmd(build_cmd, log_file, env=env, cwd=project, timeout=timeout, cancel=cancel,
+                                            on_diagnostic=on_diagnostic, header=header) # Run build command
+    if periph_cache is not None:
+        build = await periph_cache.build(periph_dir, build_fn, slots=slots)
+    else:
+        build = await build_fn()
+
+    # Measure the firmware before it's cleaned.  Parsing runs on a worker thread so that other
+    # builds' output keeps streaming, and a firmware that can't be parsed doesn't fail the build.
+    size = None
+    if build.returncode == 0:
+        try:
+            size = await asyncio.get_running_loop().run_in_executor(None, footprint.measure, build_dir, maxim_path)
+        except Exception as e:
+            print(f"Failed to measure the footprint of {project} for {board}: {e}")
+    dependencies = None
+    if not build.cancelled:
+        dep_dirs = [build_dir] + ([periph_dir] if periph_dir is not None else [])
+        dependencies = await asyncio.get_running_loop().run_in_executor(None, impact.harvest, dep_dirs, project, maxim_path)
+
+    # Test clean (make clean).  'distclean' also cleans the peripheral library, so leave
+    # that out if the library is shared through the cache.
+    clean_cmd = f"make {'clean' if periph_cache is not None else 'distclean'} {build_args}"
+    clean = None
+    if not build.cancelled:
+        clean = await streaming.stream_cmd(clean_cmd, log_file, env=env, cwd=project, timeout=timeout,
+                                           header=f"===============\n[CLEAN COMMAND] {clean_cmd}\n===============\n", append=True) # Run clean command
+
+    if isolate:
+        # Remove the shared parent folder once the last board build for this project has been cleaned
+        try:
+            os.rmdir(project.joinpath("build"))
+        except OSError:
+            pass
+
+    return {
+        "build_cmd": build_cmd,
+        "build": build,
+        "clean": clean,
+        "footprint": size,
+        "dependencies": dependencies
+    }
+
+class _BuildRunner:
+    """
+    Runs _build_project() calls on an event loop, 'jobs' at a time.  With 'fail_fast', the first
+    error diagnostic (or failed build) stops every other build that's running and any that
+    haven't started yet.  The build that failed first is left to finish so its log is complete.
+    stop() must be called from the event loop's thread.
+    """
+    def __init__(self, jobs, timeout=None, fail_fast=False):
+        self.jobs = jobs
+        self.timeout = timeout
+        self.fail_fast = fail_fast
+        self.stopped = False
+        self._events = {}
+        self._slots = None
+
+    def stop(self, origin=None):
+        if not self.stopped:
+            self.stopped = True
+            for combination, event in self._events.items():
+                if combination != origin:
+                    event.set()
+
+    async def build(self, combination, *args, **kwargs):
+        """Run _build_project(*args, **kwargs), or return None if the runner was stopped first"""
+        import asyncio
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.jobs)
+
+        async with self._slots:
+            if self.stopped:
+                return None # Stopped before it started
+            self._events[combination] = asyncio.Event()
+            on_diagnostic = None
+            if self.fail_fast:
+                on_diagnostic = lambda d: self.stop(combination) if d["severity"] == "error" else None
+            try:
+                result = await _build_project(*args, **kwargs, timeout=self.timeout, cancel=self._events[combination], on_diagnostic=on_diagnostic,
+                                              slots=self._slots)
+            finally:
+                del self._events[combination]
+            if self.fail_fast and result["build"].returncode != 0 and not result["build"].cancelled:
+                self.stop(combination)
+            return result
+
+def worker(maxim_path, host="127.0.0.1", port=None, jobs=1, make_jobs=8, token=None):
+    """
+    Serve build requests from a 'maintain.py test --workers ...' coordinator (see distributed.py).
+    Builds run in this machine's SDK at 'maxim_path', 'jobs' at a time, with isolated build
+    folders.  Only targets, boards, and examples that exist in the SDK are accepted.
+    """
+    import asyncio
+    sdk, distributed = _import("sdk"), _import("distributed")
+    if port is None:
+        port = distributed.DEFAULT_PORT
+
+    maxim_path = Path(maxim_path).resolve()
+    index = sdk.SDKIndex(maxim_path)
+    env = os.environ.copy()
+    log_dir = Path(tempfile.mkdtemp(prefix="msdk-worker-"))
+
+    def run_shard(request, cancel):
+        builds = []
+        for b in request["builds"]:
+            project = maxim_path.joinpath(b["project"]).resolve()
+            if b["target"] not in index.targets() or b["board"] not in index.boards(b["target"]) or project not in index.examples(b["target"]):
+                raise Exception(f"Unknown build {b}")
+            builds.append((b["target"], project, b["board"]))
+
+        runner = _BuildRunner(jobs, timeout=request.get("timeout"), fail_fast=request.get("fail_fast", False))
+
+        async def watch():
+            while not cancel.is_set():
+                await asyncio.sleep(0.25)
+            runner.stop()
+
+        async def run():
+            watcher = asyncio.ensure_future(watch())
+            try:
+                return await asyncio.gather(*(
+                    runner.build((target, project, board), maxim_path, target, board, project, env, make_jobs, True,
+                                 log_dir.joinpath(f"{target}_{board}_{project.name}_{threading.get_ident()}.log"))
+                    for target, project, board in builds
+                ))
+            finally:
+                watcher.cancel()
+
+        results = []
+        for (target, project, board), result in zip(builds, asyncio.run(run())):
+            if result is None:
+                results.append(None)
+                continue
+            with open(result["build"].log_path, "rb") as f:
+                log = distributed.encode_log(f.read())
+            os.remove(result["build"].log_path)
+            results.append({
+                "build_cmd": result["build_cmd"],
+                "build": distributed.result_to_json(result["build"]),
+                "clean": distributed.result_to_json(result["clean"]),
+                "footprint": result["footprint"],
+                "dependencies": result["dependencies"],
+                "log": log
+            })
+            print(f"{timestamp()} {target} {board} {project.name}: {'cancelled' if result['build'].cancelled else result['build'].returncode}")
+        return results
+
+    info = {"maxim_path": str(maxim_path), "jobs": jobs, "make_jobs": make_jobs}
+    server = distributed.WorkerServer((host, port), run_shard, info, token=token)
+    print(f"Build worker for {maxim_path} listening on {host}:{server.server_address[1]} ({jobs} job(s) x {make_jobs} make job(s))")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+def _generation_service(maxim_path, jobs, token=None):
+    try: # Imported on first use, like generate
+        from . import daemon
+    except ImportError:
+        import daemon
+
+    start = time.perf_counter()
+    service = daemon.GenerationService(sync, maxim_path=maxim_path, workers=jobs, token=token)
+    print(f"[SERVICE] Template and SDK index loaded in {time.perf_counter() - start:.3f}s")
+    return daemon, service
+
+def serve(maxim_path=None, host="127.0.0.1", port=None, poll=None, jobs=8, token=None):
+    """
+    Serve project generation requests from a warm process (see daemon.py), and regenerate the
+    projects it has generated whenever the Inject or Template folders change.  'poll' is the
+    number of seconds between checks for changes (0 disables watching).
+    """
+    daemon, service = _generation_service(maxim_path, jobs, token)
+    server = daemon.GenerationServer((host, port if port is not None else daemon.DEFAULT_PORT), service)
+    stop = threading.Event()
+    if poll != 0:
+        threading.Thread(target=service.watch, args=(stop, poll or daemon.DEFAULT_POLL), daemon=True).start()
+
+    print(f"Generation service listening on {host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+
+def watch(maxim_path, targets=None, poll=None, jobs=8):
+    """
+    Inject the project template into every example (see inject), then keep them up to date
+    as the Inject and Template folders change, until interrupted
+    """
+    daemon, service = _generation_service(maxim_path, jobs)
+    reports = service.inject(targets)
+    print(f"[WATCH] Watching the template for {len(reports)} examples ({sum(len(r['written']) for r in reports)} files written)")
+    try:
+        service.watch(threading.Event(), poll or daemon.DEFAULT_POLL)
+    except KeyboardInterrupt:
+        pass
+
+def _log_profile(report, report_file, logger, top=10):
+    """
+    Write a build profile hot-spot report to 'report_file' and log the top entries of each ranking
+    """
+    with open(report_file, "w") as f:
+        json.dump(report, f, indent=4)
+
+    logger("====================")
+    logger(f"[PROFILE] Slowest source files (total compile time across all builds)")
+    for s in report["sources"][:top]:
+        logger(f"\t{round(s['total_time'], 3)}s\t({s['count']}x, mean {round(s['mean_time'], 3)}s, max RSS {s['peak_rss_kb']}KB)\t{s['source']}")
+    logger(f"[PROFILE] Slowest links")
+    for l in report["links"][:top]:
+        logger(f"\t{round(l['wall_time'], 3)}s\t{l['target']}/{l['board']}/{l['project']}")
+    logger(f"[PROFILE] Slowest examples (total build time across all boards)")
+    for e in report["examples"][:top]:
+        logger(f"\t{round(e['total_time'], 3)}s\t{e['name']}")
+    logger(f"[PROFILE] Slowest boards (total build time across all examples)")
+    for b in report["boards"][:top]:
+        logger(f"\t{round(b['total_time'], 3)}s\t{b['name']}")
+    logger(f"[PROFILE] Highest peak memory builds")
+    for b in report["peak_rss"][:top]:
+        logger(f"\t{b['peak_rss_kb']}KB\t{b['name']}")
+    logger(f"[PROFILE] Full report in {report_file}")
+
+# Combinations listed per failure signature in the test summary
+_SUMMARY_FAILURES = 20
+
 # Tests cleaning and compiling example projects for target platforms.  If no targets, boards, projects, etc. are specified then it will auto-detect
-def test(maxim_path, targets=None, boards=None, projects=None):
+def test(maxim_path, targets=None, boards=None, projects=None, jobs=1, make_jobs=8, cpus=None, incremental=False, periph_cache=None, profile=False, ccache=None, ccache_size="5G", timeout=None, fail_fast=False,
+         prune=False, representative=False, workers=None, token=None, compile_commands=False,
+         footprint_baseline=None, save_footprint_baseline=None, footprint_threshold=0.01, keep_logs=False,
+         changed=None, changed_from_git=None):
+    import asyncio
+    import concurrent.futures
+    results, ccwrap, sdk, streaming = _import("results"), _import("ccwrap"), _import("sdk"), _import("streaming")
+    buildmatrix, distributed, compdb = _import("buildmatrix"), _import("distributed"), _import("compdb")
+    footprint, logstore, impact = _import("footprint"), _import("logstore"), _import("impact")
+
     maxim_path = Path(maxim_path).resolve()
     env = os.environ.copy()
 
@@ -161,24 +830,78 @@ def test(maxim_path, targets=None, boards=None, projects=None):
     if not log_dir.exists():
         os.mkdir(log_dir)
     logfile = log_dir.joinpath("test.log")
+    logger = Logger(logfile)
+
+    # Every build is also recorded in a structured results database
+    db = results.ResultsDB(log_dir.joinpath("results.db"))
+    run_id = db.start_run(time.strftime("%Y-%m-%dT%H:%M:%S"), platform.platform(), maxim_path)
+
+    # Failed build logs are normalized and deduplicated into the log store (see logstore.py)
+    log_store = logstore.LogStore(log_dir.joinpath("store"))
     
     # Log system info
-    log(timestamp(), logfile)
-    log(f"[PLATFORM] {platform.platform()}", logfile)
-    log(f"[MAXIM_PATH] {maxim_path}", logfile)
+    logger(timestamp())
+    logger(f"[PLATFORM] {platform.platform()}")
+    logger(f"[MAXIM_PATH] {maxim_path}")
+
+    # In profiling and compiler-cache modes every compiler invocation goes through the ccwrap
+    # launcher.  It records per-translation-unit compile times, link times, and peak memory, and
+    # puts a content-addressed object cache in front of the compiler.
+    if workers and (profile or periph_cache is not None or ccache is not None or compile_commands):
+        logger("[WORKERS] --profile, --periph-cache, --ccache, and --compile-commands only apply to local builds and are ignored")
+        profile = False
+        periph_cache = None
+        ccache = None
+        compile_commands = False
+
+    profile_dir = log_dir.joinpath("profile")
+    compdb_dir = log_dir.joinpath("compdb")
+    if profile or ccache is not None or compile_commands:
+        shim_dir = ccwrap.install_shims(log_dir.joinpath("ccwrap-bin"))
+        env["PATH"] = f"{shim_dir}{os.pathsep}{env.get('PATH', '')}"
+        logger(f"[CCWRAP] Compiler shims installed in {shim_dir}")
+    profiled = []
+
+    ccache_stats = log_dir.joinpath("ccache-stats.log")
+    if ccache is not None:
+        ccache = Path(ccache).resolve()
+        ccache_size = ccwrap.parse_size(ccache_size)
+        env["MSDK_CCWRAP_CACHE"] = str(ccache)
+        env["MSDK_CCWRAP_CACHE_SIZE"] = str(ccache_size)
+        env["MSDK_CCWRAP_STATS"] = str(ccache_stats)
+        if ccache_stats.exists():
+            os.remove(ccache_stats)
+
+        tool = ccwrap.cache_tool(env) # The same choice the compiler shims make
+        if tool is not None:
+            env["CCACHE_DIR"] = str(ccache.joinpath("ccache"))
+            env["CCACHE_MAXSIZE"] = str(ccache_size)
+            run([tool, "--zero-stats"], env=env, capture_output=True)
+        logger(f"[CCACHE] {ccache} ({tool if tool is not None else 'Python object cache'}, limit {ccache_size // (1024 * 1024)}MB)")
+
+    # Split the CPU budget between parallel builds and make's own jobs so that
+    # jobs * make_jobs never oversubscribes the machine.
+    if cpus is None:
+        cpus = os.cpu_count() or 1
+    jobs = max(1, min(jobs, cpus))
+    if jobs * make_jobs > cpus:
+        make_jobs = max(1, cpus // jobs)
+    logger(f"[JOBS] {jobs} parallel build(s) x {make_jobs} make job(s) ({cpus} CPUs)")
+
+    # Targets, boards, and examples all come from the SDK index, which only re-lists the
+    # directories that changed since the last run
+    index = sdk.SDKIndex(maxim_path)
+    logger(f"[INDEX] {index.cache_file} ({index.scanned} director{'y' if index.scanned == 1 else 'ies'} rescanned)")
 
     # Get list of target micros if none is specified
     if targets is None:
-        targets = []
-
-        for dir in os.scandir(f"{maxim_path}/Examples"):
-            targets.append(dir.name) # Append subdirectories of Examples to list of target micros
+        targets = index.targets() # Subdirectories of Examples are the target micros
 
-        log(f"[TARGETS] Detected targets {targets}", logfile)
+        logger(f"[TARGETS] Detected targets {targets}")
     
     else:
         assert(type(targets) is list)
-        log(f"[TARGETS] Testing {targets}", logfile)
+        logger(f"[TARGETS] Testing {targets}")
 
     # Enforce alphabetical ordering
     targets = sorted(targets)
@@ -188,125 +911,490 @@ def test(maxim_path, targets=None, boards=None, projects=None):
         sub_dir = log_dir.joinpath(t)
         if not sub_dir.exists():
             os.mkdir(sub_dir)
+        if profile:
+            os.makedirs(profile_dir.joinpath(t), exist_ok=True)
+        if compile_commands:
+            os.makedirs(compdb_dir.joinpath(t), exist_ok=True)
 
-    # Track failed projects for end summary
-    failed = []
-    count = 0
-
+    # Resolve the build matrix up-front so that every (project, board) combination
+    # can be scheduled at once.  Each entry is (target, log lines, boards, projects)
+    matrix = []
     for target in targets:
-        log("====================", logfile)
-        log(f"[TARGET] {target}", logfile)
+        target_log = []
 
         # Get list of supported boards for this target.
         if boards is None:
-            boards = []
-            for dirpath, subdirs, items in os.walk(maxim_path.joinpath("Libraries", "Boards", target)):
-                if "board.mk" in items:
-                    boards.append(Path(dirpath).name)
+            target_boards = index.boards(target)
 
-            log(f"[BOARDS] Detected {boards}", logfile)
+            target_log.append(f"[BOARDS] Detected {target_boards}")
 
         else:
             assert(type(boards) is list)
-            log(f"[BOARDS] Testing {boards}", logfile)
+            target_boards = boards
+            target_log.append(f"[BOARDS] Testing {target_boards}")
 
-        boards = sorted(boards) # Enforce alphabetical ordering
+        target_boards = sorted(target_boards) # Enforce alphabetical ordering
                 
         # Get list of examples for this target.  If a Makefile is in the root directory it's an example.
-        if projects is None:
-            projects = []
-            for dirpath, subdirs, items in os.walk(maxim_path.joinpath("Examples", target)):
-                if 'Makefile' in items and ("main.c" in items or "project.mk" in items):
-                    projects.append(Path(dirpath)) 
+        target_projects = index.examples(target)
 
-            log(f"[PROJECTS] Detected {projects}", logfile)
+        if projects is None:
+            target_log.append(f"[PROJECTS] Detected {target_projects}")
 
         else:
             assert(type(projects) is list)
-            log(f"[PROJECTS] Testing {projects}", logfile)
-
-        projects = sorted(projects) # Enforce alphabetical ordering
-
-        # Test each project
-        for project in projects:
-            project_name = project.name
-            print(project_name)
-
-            log("---------------------", logfile)
-            log(f"[{target}]\t[{project_name}]", logfile)
-
-            for board in boards:
-                buildlog = f"{target}_{board}_{project_name}.log"
-                success = True
-
-                # Test build (make all)
-                build_cmd = f"make -r -j 8 TARGET={target} MAXIM_PATH={maxim_path.as_posix()} BOARD={board} MAKE=make"
-                res = run_cmd(build_cmd, env=env, cwd=project, shell=True, capture_output=True, encoding="utf-8") # Run build command
-
-                # Error check build command
-                if res.returncode != 0:
-                    # Fail
-                    success = False                    
-                    log(f"{timestamp()}[{board}] --- [BUILD]\t[FAILED] Return code {res.returncode}.  See buildlogs/{buildlog}", logfile)            
-                    
-                    # Log detailed output to separate output file
-                    with open(log_dir.joinpath(target, buildlog), 'w') as f:
-                        f.write("===============\n")
-                        f.write(timestamp() + '\n')
-                        f.write(f"[PROJECT] {project}\n")
-                        f.write(f"[BOARD] {board}\n")
-                        f.write(f"[BUILD COMMAND] {build_cmd}\n")
-                        f.write("===============\n")
-                        f.write(res.stdout + res.stderr)
-
-                else: log(f"{timestamp()}[{board}] --- [BUILD]\t[SUCCESS] {round(duration, 4)}s", logfile)                
-
-                # Test clean (make clean)
-                clean_cmd = f"make distclean TARGET={target} MAXIM_PATH={maxim_path} BOARD={board} MAKE=make"
-                res = run_cmd(clean_cmd, env=env, cwd=project, shell=True, capture_output=True, encoding="utf-8") # Run clean command
-
-                # Error check clean command
-                if res.returncode != 0:
-                    log(f"{timestamp()}[{board}] --- [CLEAN]\t[SUCCESS] {res.stderr}", logfile)
-                    success = False
-                else: log(f"{timestamp()}[{board}] --- [CLEAN]\t[SUCCESS] {round(duration, 4)}s", logfile)
-
-                # Add any failed projects to running list
-                project_info = {
-                    "target":target,
-                    "project":project_name,
-                    "board":board,
-                    "path":project,
-                    "logfile":f"buildlogs/{buildlog}"
-                    }
-                if not success and project_info not in failed: failed.append(project_info)
-                count += 1
-
-        log("====================", logfile)
-        boards = None # Reset boards list
-        projects = None # Reset targets list
-
-    log(f"[SUMMARY] Tested {count} projects.  {count - len(failed)}/{count} succeeded.  Failed projects: ", logfile)
-    for pinfo in failed:
-        log(f"[{pinfo['target']}] {pinfo['project']} for {pinfo['board']}...  see {pinfo['logfile']}", logfile)
-
-parser = argparse.ArgumentParser("VSCode-Maxim maintainer utilities")
-parser.add_argument("--maxim_path", type=str, help="(Optional) Location of the MaximSDK.  If this is not specified then the script will attempt to use the MAXIM_PATH environment variable.")
-
-cmd_parser = parser.add_subparsers(dest="cmd", help="sub-command", required=True)
-
-release_parser = cmd_parser.add_parser("release", help="Package a release")
-release_parser.add_argument("version", type=str, help="Version # for the release")
-
-sync_parser = cmd_parser.add_parser("sync", help="Sync all .vscode project folders")
-
-test_parser = cmd_parser.add_parser("test", help="Run a build test of the SDK.")
-test_parser.add_argument("--targets", type=str, nargs="+", required=False, help="Target microcontrollers to test.")
-test_parser.add_argument("--boards", type=str, nargs="+", required=False, help="Boards to test.  Should match the BSP folder-name exactly.")
-test_parser.add_argument("--projects", type=str, nargs="+", required=False, help="Examples to populate.  Should match the example's folder name.")
+            # Projects are specified by folder name
+            target_projects = [p for p in target_projects if p.name in projects]
+            target_log.append(f"[PROJECTS] Testing {target_projects}")
+
+        target_projects = sorted(target_projects) # Enforce alphabetical ordering
+        matrix.append((target, target_log, target_boards, target_projects))
+
+    # Leave out (project, board) combinations that can never build (see buildmatrix.py), and
+    # optionally everything outside a representative subset that still covers every driver source
+    skipped = {}
+    if prune or representative:
+        for target, target_log, target_boards, target_projects in matrix:
+            valid, pruned = buildmatrix.analyze(maxim_path, target, target_boards, target_projects)
+            for (project, board), reason in pruned.items():
+                skipped[(target, project, board)] = f"[PRUNED] {reason}"
+            if representative:
+                chosen = set(buildmatrix.representative(valid))
+                for combination in valid:
+                    if combination not in chosen:
+                        skipped[(target, *combination)] = "[SKIPPED] Covered by the representative subset"
+                target_log.append(f"[MATRIX] {len(chosen)} representative of {len(valid)} valid combinations ({len(pruned)} pruned)")
+            else:
+                target_log.append(f"[MATRIX] {len(valid)} valid combinations ({len(pruned)} pruned)")
+
+    # Only build what a change touches, using the dependencies harvested from earlier builds
+    dep_index = impact.DependencyIndex(log_dir.joinpath("depindex.json"), maxim_path)
+    if changed is not None or changed_from_git is not None:
+        builds = {
+            (target, board, project.relative_to(maxim_path).as_posix()): (target, project, board)
+            for target, _, target_boards, target_projects in matrix
+            for project in target_projects
+            for board in target_boards
+            if (target, project, board) not in skipped
+        }
+        changed_paths = impact.relative_paths(changed or [], maxim_path)
+        selected = None
+        if changed_from_git is not None:
+            try:
+                changed_paths += impact.git_changed(maxim_path, changed_from_git)
+            except (OSError, CalledProcessError) as e:
+                logger(f"[IMPACT] Failed to list the changes since {changed_from_git} ({e}), testing everything")
+                selected = dict.fromkeys(builds, "Unknown change")
+        if selected is None:
+            selected = impact.select(dep_index, changed_paths, list(builds), index.targets(), maxim_path)
+
+        for key, combination in builds.items():
+            if key not in selected:
+                skipped[combination] = "[SKIPPED] Not affected by the change"
+        unknown = sum(reason == "No dependency information yet" for reason in selected.values())
+        failed_before = sum(reason == "Failed last time" for reason in selected.values())
+        logger(f"[IMPACT] {len(changed_paths)} changed file(s) select {len(selected)} of {len(builds)} build(s) ({unknown} with no dependency information yet, {failed_before} that failed last time)")
+
+    # Load the results of previous passes.  Combinations whose inputs haven't changed since
+    # they last passed are reported as cached passes without invoking make.
+    cachefile = log_dir.joinpath("testcache.json")
+    cache = {}
+    keys = {}
+
+    # Folder hashes are shared by the incremental cache keys and the peripheral library cache.
+    # Unchanged files are looked up in a persistent index instead of being re-read.
+    hash_index = utils.HashIndex(log_dir.joinpath("hashindex.jsonl"), algorithm="blake2b")
+    digests = {}
+    def tree_digest(tree):
+        if tree not in digests:
+            if tree.is_file():
+                digests[tree] = hash_index.hash_file(tree).hex()
+            else:
+                digests[tree] = utils.hash_folder(tree, workers=8, index=hash_index).hex() if tree.exists() else ""
+        return digests[tree]
+
+    if incremental or periph_cache is not None:
+        toolchain = _toolchain_version(env)
+
+    # Build each peripheral driver library once per run, and share it across all examples with the same library build flags
+    periph_dirs = {}
+    if periph_cache is not None:
+        periph_cache = PeriphCache(periph_cache)
+        logger(f"[PERIPH_CACHE] {periph_cache.root}")
+        for target, _, target_boards, target_projects in matrix:
+            for project in target_projects:
+                for board in target_boards:
+                    periph_dirs[(target, project, board)] = periph_cache.path(target, _periph_key(maxim_path, target, board, project, toolchain, tree_digest))
+
+    if incremental:
+        if cachefile.exists():
+            with open(cachefile, "r") as f:
+                cache = json.load(f)
+
+        # Hash everything before any builds start, so that build outputs don't end up in the keys
+        for target, _, target_boards, target_projects in matrix:
+            for project in target_projects:
+                for board in target_boards:
+                    if (target, project, board) in skipped:
+                        continue
+                    keys[(target, project, board)] = _combination_key(maxim_path, target, board, project, toolchain, tree_digest)
+
+    hash_index.save()
+
+    # Track failed projects for end summary
+    failed = {}
+    count = 0
+    cached = 0
+    cancelled = 0
+
+    # Local builds run as asyncio subprocesses supervised by a single event loop thread, which
+    # streams each build's output to its log file as it arrives.
+    loop = asyncio.new_event_loop()
+    loop_thread = threading.Thread(target=loop.run_forever, name="builds", daemon=True)
+    loop_thread.start()
+    runner = _BuildRunner(jobs, timeout=timeout, fail_fast=fail_fast)
+
+    # Submit everything, then collect the results in matrix order so that the
+    # log output stays ordered per project regardless of completion order.
+    pending = [
+        (target, project, board)
+        for target, _, target_boards, target_projects in matrix
+        for project in target_projects
+        for board in target_boards
+        if keys.get((target, project, board)) not in cache and (target, project, board) not in skipped
+    ]
+
+    coordinator = None
+    if workers:
+        # Hand the matrix out to the build workers instead, in shards sized from past build times
+        coordinator = distributed.Coordinator(workers, token=token, logger=logger)
+        history = db.durations()
+        estimates = {c: history[(c[0], c[2], c[1].name)] for c in pending if (c[0], c[2], c[1].name) in history}
+
+        def on_result(combination, result):
+            target, project, board = combination
+            log_path = log_dir.joinpath(target, f"{target}_{board}_{project.name}.log")
+            if result is None:
+                return None
+            with open(log_path, "wb") as f:
+                f.write(distributed.decode_log(result["log"]))
+            build = distributed.result_from_json(result["build"], log_path)
+            if fail_fast and build.returncode != 0 and not build.cancelled:
+                coordinator.stop()
+            return {
+                "build_cmd": result["build_cmd"],
+                "build": build,
+                "clean": distributed.result_from_json(result["clean"], log_path),
+                "footprint": result.get("footprint"),
+                "dependencies": result.get("dependencies")
+            }
+
+        builds = {c: {"target": c[0], "board": c[2], "project": c[1].relative_to(maxim_path).as_posix()} for c in pending}
+        futures = coordinator.submit(builds, estimates, {"timeout": timeout, "fail_fast": fail_fast}, on_result)
+    else:
+        futures = {}
+        for target, project, board in pending:
+            futures[(target, project, board)] = asyncio.run_coroutine_threadsafe(runner.build(
+                (target, project, board), maxim_path, target, board, project, env, make_jobs, jobs > 1,
+                log_dir.joinpath(target, f"{target}_{board}_{project.name}.log"),
+                periph_cache, periph_dirs.get((target, project, board)),
+                profile_dir.joinpath(target, f"{board}_{project.name}.jsonl") if profile else None,
+                compdb_file=compdb_dir.joinpath(target, f"{board}_{project.name}.jsonl") if compile_commands else None
+            ), loop)
+
+    try:
+        for target, target_log, target_boards, target_projects in matrix:
+            logger("====================")
+            logger(f"[TARGET] {target}")
+            for line in target_log:
+                logger(line)
+
+            # Test each project
+            for project in target_projects:
+                project_name = project.name
+                print(project_name)
+
+                logger("---------------------")
+                logger(f"[{target}]\t[{project_name}]")
+
+                for board in target_boards:
+                    buildlog = f"{target}_{board}_{project_name}.log"
+                    success = True
+
+                    if (target, project, board) in skipped:
+                        logger(f"{timestamp()}[{board}] --- [BUILD]\t{skipped[(target, project, board)]}")
+                        db.record(run_id, target, board, project_name, "build", "skipped",
+                                  reason=re.sub(r"^\[\w+\] ", "", skipped[(target, project, board)]))
+                        continue
+
+                    key = keys.get((target, project, board))
+                    if key in cache:
+                        logger(f"{timestamp()}[{board}] --- [BUILD]\t[CACHED] Passed on {cache[key]['date']}")
+                        db.record(run_id, target, board, project_name, "build", "cached")
+                        cached += 1
+                        count += 1
+                        continue
+
+                    try:
+                        result = futures.pop((target, project, board)).result()
+                    except distributed.ShardError as e:
+                        # The build worker rejected the build, so there's no build log.  The reason goes in test.log.
+                        logger(f"{timestamp()}[{board}] --- [BUILD]\t[FAILED] {e}")
+                        db.record(run_id, target, board, project_name, "build", "failed", first_error=str(e))
+                        dep_index.update(target, board, project.relative_to(maxim_path).as_posix(), [], succeeded=False)
+                        failed[(target, project, board)] = {"target":target, "project":project_name, "board":board,
+                                                            "path":project, "logfile":"buildlogs/test.log", "signature":None}
+                        count += 1
+                        continue
+                    if result is None or result["build"].cancelled:
+                        logger(f"{timestamp()}[{board}] --- [BUILD]\t[CANCELLED] Stopped by --fail-fast")
+                        db.record(run_id, target, board, project_name, "build", "cancelled")
+                        cancelled += 1
+                        continue
+
+                    res = result["build"]
+                    buildlog = f"{target}/{buildlog}" # The full output was streamed to buildlogs/<target>/
+                    log_path = res.log_path
+                    signature = None
+
+                    # Error check build command
+                    if res.returncode != 0:
+                        # Fail
+                        success = False
+                        reason = f"Timed out after {timeout}s" if res.timed_out else f"Return code {res.returncode}"
+                        if res.first_error is not None:
+                            reason += f" ({res.errors} error{'s' if res.errors != 1 else ''}, first: {streaming.format_diagnostic(res.first_error)})"
+
+                        # The clean has already run, so the log is complete
+                        stored = log_store.add(res.log_path, target, board, project_name, run_id, {
+                            project.as_posix(): "${PROJECT_DIR}",
+                            str(project): "${PROJECT_DIR}",
+                            maxim_path.as_posix(): "${MAXIM_PATH}",
+                            str(maxim_path): "${MAXIM_PATH}",
+                            log_dir.as_posix(): "${BUILDLOGS}"
+                        })
+                        signature = stored["signature"]
+                        if not keep_logs:
+                            os.remove(res.log_path)
+                            log_path = stored["path"]
+                            buildlog = stored["path"].relative_to(log_dir).as_posix()
+                        logger(f"{timestamp()}[{board}] --- [BUILD]\t[FAILED] {reason}.  See buildlogs/{buildlog}")
+
+                    else: logger(f"{timestamp()}[{board}] --- [BUILD]\t[SUCCESS] {round(res.duration, 4)}s{f' ({res.warnings} warnings)' if res.warnings else ''}")
+
+                    db.record(run_id, target, board, project_name, "build", "passed" if res.returncode == 0 else "failed",
+                              res.returncode, res.duration, res.cpu_time, res.peak_rss, log_path,
+                              errors=res.errors, warnings=res.warnings,
+                              first_error=None if res.first_error is None else streaming.format_diagnostic(res.first_error))
+                    if result.get("footprint") is not None:
+                        db.record_footprint(run_id, target, board, project_name, result["footprint"])
+                    if result.get("dependencies") is not None:
+                        dep_index.update(target, board, project.relative_to(maxim_path).as_posix(), result["dependencies"], succeeded=res.returncode == 0)
+
+                    if profile:
+                        profiled.append({
+                            "target":target,
+                            "board":board,
+                            "project":project_name,
+                            "wall_time":res.duration,
+                            "peak_rss_kb":res.peak_rss,
+                            "records":ccwrap.load_profile(profile_dir.joinpath(target, f"{board}_{project_name}.jsonl"))
+                            })
+
+                    if compile_commands:
+                        # The exact compiles of the build, as a compile_commands.json for this board
+                        records = compdb_dir.joinpath(target, f"{board}_{project_name}.jsonl")
+                        compdb.write(compdb.from_records(ccwrap.load_profile(records)), records.with_suffix(".json"))
+                        if records.exists():
+                            os.remove(records)
+
+                    res = result["clean"]
+
+                    # Error check clean command
+                    if res.returncode != 0:
+                        logger(f"{timestamp()}[{board}] --- [CLEAN]\t[FAILED] {res.stdout}")
+                        success = False
+                    else: logger(f"{timestamp()}[{board}] --- [CLEAN]\t[SUCCESS] {round(res.duration, 4)}s")
+
+                    db.record(run_id, target, board, project_name, "clean", "passed" if res.returncode == 0 else "failed",
+                              res.returncode, res.duration, res.cpu_time, res.peak_rss, log_path)
+
+                    # Add any failed projects to running list
+                    project_info = {
+                        "target":target,
+                        "project":project_name,
+                        "board":board,
+                        "path":project,
+                        "logfile":f"buildlogs/{buildlog}",
+                        "signature":signature
+                        }
+                    if not success: failed[(target, project, board)] = project_info
+                    if success and key is not None:
+                        cache[key] = {
+                            "target":target,
+                            "project":project_name,
+                            "board":board,
+                            "date":date.today().isoformat()
+                            }
+                        if incremental:
+                            # Save as we go, so an interrupted run keeps what it has already built
+                            utils.atomic_write(cachefile, json.dumps(cache, indent=4).encode("utf-8"))
+                    count += 1
+
+            logger("====================")
+
+    finally:
+        if futures:
+            # Interrupted, so stop whatever is still running before the event loop goes away
+            if coordinator is not None:
+                coordinator.close()
+            loop.call_soon_threadsafe(runner.stop)
+            concurrent.futures.wait(list(futures.values()), timeout=2 * streaming.KILL_GRACE + 5)
+        loop.call_soon_threadsafe(loop.stop)
+        loop_thread.join()
+        loop.close()
+
+    if cancelled:
+        logger(f"[FAIL_FAST] Stopped after the first failure, {cancelled} build(s) cancelled")
+    if skipped:
+        logger(f"[MATRIX] {len(skipped)} combination(s) not built ({sum(r.startswith('[PRUNED]') for r in skipped.values())} pruned as incompatible)")
+    logger(f"[SUMMARY] Tested {count} projects ({cached} cached).  {count - len(failed)}/{count} succeeded.  Failed projects: ")
+
+    # Group the failures by their first error, most common first, so one broken driver
+    # shows up as one entry instead of hundreds
+    groups = {}
+    for pinfo in failed.values():
+        groups.setdefault(pinfo["signature"], []).append(pinfo)
+    for signature, pinfos in sorted(groups.items(), key=lambda g: -len(g[1])):
+        if signature is not None:
+            logger(f"[{len(pinfos)} failure(s)] {signature}")
+        indent = "\t" if signature is not None else ""
+        shown = pinfos if signature is None else pinfos[:_SUMMARY_FAILURES]
+        for pinfo in shown:
+            logger(f"{indent}[{pinfo['target']}] {pinfo['project']} for {pinfo['board']}...  see {pinfo['logfile']}")
+        if len(shown) < len(pinfos):
+            logger(f"{indent}... and {len(pinfos) - len(shown)} more (all of them are in {log_store.root.joinpath('index.db')})")
+
+    stats = log_store.stats(run_id)
+    if stats["logs"]:
+        logger(f"[LOGSTORE] {stats['logs']} failed build log(s) ({stats['size'] // 1024}KB) stored as {stats['unique']} unique log(s) ({stats['stored_size'] // 1024}KB compressed) in {log_store.root}")
+    log_store.close()
+
+    if profile:
+        _log_profile(ccwrap.profile_report(profiled, maxim_path), profile_dir.joinpath("report.json"), logger)
+
+    if ccache is not None:
+        if tool is not None:
+            res = run([tool, "--show-stats"], env=env, capture_output=True, encoding="utf-8")
+            for line in res.stdout.splitlines():
+                logger(f"[CCACHE] {line}")
+        else:
+            stats = ccwrap.cache_stats(ccache_stats)
+            lookups = stats["hit"] + stats["miss"]
+            size = ccwrap.evict(ccache, ccache_size)
+            logger(f"[CCACHE] {stats['hit']} hits, {stats['miss']} misses ({round(100 * stats['hit'] / lookups, 1) if lookups else 0}% hit rate), {stats['uncacheable']} uncacheable.  Cache size {round(size / (1024 * 1024), 1)}MB")
+
+    dep_index.save()
+
+    # Firmware footprints, compared against a saved baseline
+    db.commit()
+    footprints = db.footprints(run_id)
+    footprint.save(footprints, log_dir.joinpath("footprint.json"), {"run": run_id, "maxim_path": str(maxim_path)})
+    if footprints:
+        logger(f"[FOOTPRINT] Measured {len(footprints)} firmware image(s).  See {log_dir.joinpath('footprint.json')}")
+    if footprint_baseline is not None:
+        if Path(footprint_baseline).exists():
+            regressions = footprint.compare(footprints, footprint.load(footprint_baseline), footprint_threshold)
+            logger(f"[FOOTPRINT] {len(regressions)} regression(s) above {footprint_threshold * 100:g}% against {footprint_baseline}")
+            for r in regressions:
+                logger(f"[FOOTPRINT]\t{r}")
+        else:
+            logger(f"[FOOTPRINT] No baseline at {footprint_baseline}, nothing to compare")
+    if save_footprint_baseline is not None:
+        footprint.save(footprints, save_footprint_baseline, {"run": run_id, "maxim_path": str(maxim_path), "date": date.today().isoformat()})
+        logger(f"[FOOTPRINT] Saved baseline to {save_footprint_baseline}")
+
+    # Export this run's results
+    db.export_json(run_id, log_dir.joinpath("results.json"))
+    db.export_junit(run_id, log_dir.joinpath("junit.xml"))
+    db.close()
+    logger(f"[RESULTS] {log_dir.joinpath('results.json')}, {log_dir.joinpath('junit.xml')} (history in {log_dir.joinpath('results.db')})")
+    logger.close()
+
+def _parser():
+    # Only built when run as a script, so importing this module stays cheap
+    ccwrap, distributed = _import("ccwrap"), _import("distributed")
+
+    parser = argparse.ArgumentParser("VSCode-Maxim maintainer utilities")
+    parser.add_argument("--maxim_path", type=str, help="(Optional) Location of the MaximSDK.  If this is not specified then the script will attempt to use the MAXIM_PATH environment variable.")
+
+    cmd_parser = parser.add_subparsers(dest="cmd", help="sub-command", required=True)
+
+    release_parser = cmd_parser.add_parser("release", help="Package a release")
+    release_parser.add_argument("version", type=str, help="Version # for the release")
+    release_parser.add_argument("--archive", type=str, nargs="+", choices=["zip", "tar.gz", "tar.zst"], required=False, help="Also write reproducible release archives in these formats.  tar.zst requires the 'zstandard' package.")
+    release_parser.add_argument("--no-links", action="store_true", help="Always make byte-for-byte copies for the installer package instead of hardlinking it to the release folder.")
+
+    sync_parser = cmd_parser.add_parser("sync", help="Sync all .vscode project folders")
+    sync_parser.add_argument("--check", action="store_true", help="Report files that are out of sync without writing anything.  Exits with an error if any are found.")
+
+    inject_parser = cmd_parser.add_parser("inject", help="Inject the project template into every example in the MaximSDK")
+    inject_parser.add_argument("--targets", type=str, nargs="+", required=False, help="Only inject into the examples for these target microcontrollers.")
+    inject_parser.add_argument("--jobs", type=int, default=8, help="Number of threads writing project files.")
+    inject_parser.add_argument("--no-overwrite", action="store_true", help="Leave existing project files untouched.")
+    inject_parser.add_argument("--backup", action="store_true", help="Back up existing files before overwriting them.")
+    inject_parser.add_argument("--compile-commands", action="store_true", help="Dry-run each example's Makefile into a .vscode/compile_commands.json and point IntelliSense at it instead of the recursive include paths.")
+    inject_parser.add_argument("--trim-paths", action="store_true", help="Drop the include and browse paths that don't exist for each example's target and board.")
+
+    test_parser = cmd_parser.add_parser("test", help="Run a build test of the SDK.")
+    test_parser.add_argument("--targets", type=str, nargs="+", required=False, help="Target microcontrollers to test.")
+    test_parser.add_argument("--boards", type=str, nargs="+", required=False, help="Boards to test.  Should match the BSP folder-name exactly.")
+    test_parser.add_argument("--projects", type=str, nargs="+", required=False, help="Examples to populate.  Should match the example's folder name.")
+    test_parser.add_argument("--jobs", type=int, default=1, help="Number of (project, board) builds to run in parallel.  Parallel builds use isolated build directories.")
+    test_parser.add_argument("--make-jobs", type=int, default=8, help="Number of jobs passed to each make invocation ('make -j').")
+    test_parser.add_argument("--incremental", action="store_true", help="Skip (project, board) combinations whose sources, BSP, libraries, and toolchain haven't changed since they last passed.")
+    test_parser.add_argument("--periph-cache", type=str, nargs="?", const="buildlogs/periph-cache", required=False, help="Build each peripheral driver library once per (target, board, toolchain) and share it across all example builds that don't override its build flags (PROJ_CFLAGS, MFLOAT_ABI, DEBUG, ...) in their project.mk.  Libraries are kept in a content-addressed cache folder (default: buildlogs/periph-cache).")
+    test_parser.add_argument("--profile", action="store_true", help="Record per-file compile times, link times, and peak memory for every build, and report the slowest source files, examples, and boards.")
+    test_parser.add_argument("--ccache", type=str, nargs="?", const=str(ccwrap.default_cache_dir()), required=False, help="Put a content-addressed object cache in front of the compilers.  Uses ccache if it's installed, otherwise a built-in cache.  Optionally specify the cache folder (default: ~/.cache/vscode-maxim/ccache).")
+    test_parser.add_argument("--compile-commands", action="store_true", help="Record the exact compiles of every build as a compile_commands.json in buildlogs/compdb/<target>/<board>_<project>.json.")
+    test_parser.add_argument("--ccache-size", type=str, default="5G", help="Size limit for the compiler cache (ex: 500M, 5G).  The least recently used objects are evicted.")
+    test_parser.add_argument("--timeout", type=float, required=False, help="(Optional) Stop any build or clean that takes longer than this many seconds and report it as failed.")
+    test_parser.add_argument("--fail-fast", action="store_true", help="Stop the whole test run at the first compiler error or failed build.")
+    test_parser.add_argument("--prune", action="store_true", help="Skip (project, board) combinations that can't build, based on each example's project.mk and sources and each board's board.mk (pinned boards, $(error) checks, camera/display drivers, ...).")
+    test_parser.add_argument("--representative", action="store_true", help="Implies --prune.  Only build the fewest combinations that still cover every board support source, peripheral driver, and library used by the full matrix, and build every example at least once.  Useful for quick pre-merge checks.")
+    test_parser.add_argument("--workers", type=str, nargs="+", required=False, help="(Optional) Build on these 'maintain.py worker' hosts (HOST:PORT) instead of locally.  The matrix is split into shards sized from past build times in buildlogs/results.db.")
+    test_parser.add_argument("--token", type=str, default=os.environ.get("MSDK_WORKER_TOKEN"), help="Shared secret for the build workers (default: the MSDK_WORKER_TOKEN environment variable).")
+    test_parser.add_argument("--footprint-baseline", type=str, required=False, help="(Optional) Compare the flash and RAM use of every built firmware against this baseline file and report regressions.")
+    test_parser.add_argument("--save-footprint-baseline", type=str, required=False, help="(Optional) Save this run's firmware footprints as a baseline file.")
+    test_parser.add_argument("--footprint-threshold", type=float, default=1.0, help="Percentage growth in flash or RAM use reported as a footprint regression (default 1%%).  Growth under 64 bytes is ignored.")
+    test_parser.add_argument("--keep-logs", action="store_true", help="Keep the plain-text logs of failed builds in buildlogs/<target>/ as well as in the deduplicated log store (buildlogs/store).")
+    test_parser.add_argument("--changed", type=str, nargs="+", required=False, help="(Optional) Only build the (project, board) combinations affected by these changed files (absolute, or relative to MAXIM_PATH).  Use '-' to read the list from stdin (ex: git diff --name-only | maintain.py test --changed -).  Uses the dependencies recorded by earlier test runs in buildlogs/depindex.json.")
+    test_parser.add_argument("--changed-from-git", type=str, required=False, metavar="REV", help="(Optional) Like --changed, for the files that differ between git revision REV and the MAXIM_PATH working tree.")
+    test_parser.add_argument("--cpus", type=int, required=False, help="(Optional) CPU budget shared by all builds.  Defaults to the number of CPUs on this machine.  jobs x make-jobs is limited to this value.")
+
+    worker_parser = cmd_parser.add_parser("worker", help="Serve builds for 'test --workers' coordinators")
+    worker_parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on.  Use 0.0.0.0 to accept builds from other machines.")
+    worker_parser.add_argument("--port", type=int, default=distributed.DEFAULT_PORT, help=f"Port to listen on (default {distributed.DEFAULT_PORT}).")
+    worker_parser.add_argument("--jobs", type=int, default=1, help="Number of builds to run in parallel.")
+    worker_parser.add_argument("--make-jobs", type=int, default=8, help="Number of jobs passed to each make invocation ('make -j').")
+    worker_parser.add_argument("--token", type=str, default=os.environ.get("MSDK_WORKER_TOKEN"), help="Shared secret that coordinators must send (default: the MSDK_WORKER_TOKEN environment variable).")
+
+    serve_parser = cmd_parser.add_parser("serve", help="Serve project generation requests from a warm process, and regenerate its projects when the template changes")
+    serve_parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on.")
+    serve_parser.add_argument("--port", type=int, required=False, help="Port to listen on (default 8710).")
+    serve_parser.add_argument("--poll", type=float, required=False, help="Seconds between checks of the Inject and Template folders for changes (default 0.5).  0 disables watching.")
+    serve_parser.add_argument("--jobs", type=int, default=8, help="Number of threads writing project files.")
+    serve_parser.add_argument("--token", type=str, default=os.environ.get("MSDK_SERVE_TOKEN"), help="Shared secret that clients must send (default: the MSDK_SERVE_TOKEN environment variable).")
+
+    watch_parser = cmd_parser.add_parser("watch", help="Inject the template into every example and keep them up to date as the template changes")
+    watch_parser.add_argument("--targets", type=str, nargs="+", required=False, help="Only watch the examples for these target microcontrollers.")
+    watch_parser.add_argument("--poll", type=float, required=False, help="Seconds between checks of the Inject and Template folders for changes (default 0.5).")
+    watch_parser.add_argument("--jobs", type=int, default=8, help="Number of threads writing project files.")
+
+    return parser
 
 if __name__ == "__main__":
-    args = parser.parse_args()
+    args = _parser().parse_args()
 
     # Auto-detect MAXIM_PATH
     if args.maxim_path is None:
@@ -321,10 +1409,31 @@ if __name__ == "__main__":
             exit()
 
     if args.cmd == "release":
-        release(args.version)
+        release(args.version, archives=args.archive, links=not args.no_links)
     
     elif args.cmd == "sync":
-        sync()
+        changed = sync(check=args.check)
+        for f in changed:
+            print(f"{'Out of sync' if args.check else 'Updated'}: {f}")
+        if args.check and changed:
+            sys.exit(1)
     
+    elif args.cmd == "inject":
+        inject(args.maxim_path, targets=args.targets, jobs=args.jobs, overwrite=not args.no_overwrite, backup=args.backup,
+               compile_commands=args.compile_commands, trim_paths=args.trim_paths)
+
     elif args.cmd == "test":
-        test(args.maxim_path, targets=args.targets, boards=args.boards, projects=args.projects)
+        test(args.maxim_path, targets=args.targets, boards=args.boards, projects=args.projects, jobs=args.jobs, make_jobs=args.make_jobs, cpus=args.cpus, incremental=args.incremental, periph_cache=args.periph_cache, profile=args.profile, ccache=args.ccache, ccache_size=args.ccache_size, timeout=args.timeout, fail_fast=args.fail_fast, prune=args.prune, representative=args.representative, workers=args.workers, token=args.token,
+             compile_commands=args.compile_commands, footprint_baseline=args.footprint_baseline,
+             save_footprint_baseline=args.save_footprint_baseline, footprint_threshold=args.footprint_threshold / 100,
+             keep_logs=args.keep_logs, changed=sys.stdin.read().splitlines() if args.changed == ["-"] else args.changed,
+             changed_from_git=args.changed_from_git)
+
+    elif args.cmd == "serve":
+        serve(args.maxim_path, host=args.host, port=args.port, poll=args.poll, jobs=args.jobs, token=args.token)
+
+    elif args.cmd == "watch":
+        watch(args.maxim_path, targets=args.targets, poll=args.poll, jobs=args.jobs)
+
+    elif args.cmd == "worker":
+        worker(args.maxim_path, host=args.host, port=args.port, jobs=args.jobs, make_jobs=args.make_jobs, token=args.token)
@@ -0,0 +1,234 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+import json
+import sqlite3
+from pathlib import Path
+from xml.etree import ElementTree
+
+class ResultsDB:
+    """
+    SQLite store of build-test results.  Every run of 'maintain.py test' gets a row in the 'runs'
+    table, and every phase (build, clean, ...) of every (target, board, project) combination gets
+    a row in the 'builds' table.  The database is kept across runs so that build times can be
+    tracked across SDK releases.  Firmware sizes go in the 'footprints' table, with a
+    breakdown by object file in 'footprint_objects'.
+    """
+
+    # Columns added to the 'builds' table after its first version
+    BUILD_COLUMNS = {
+        "errors": "INTEGER",
+        "warnings": "INTEGER",
+        "first_error": "TEXT",
+        "reason": "TEXT"
+    }
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started TEXT,
+            platform TEXT,
+            maxim_path TEXT
+        )""")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS builds (
+            run_id INTEGER REFERENCES runs(id),
+            target TEXT,
+            board TEXT,
+            project TEXT,
+            phase TEXT,
+            status TEXT,
+            returncode INTEGER,
+            wall_time REAL,
+            cpu_time REAL,
+            peak_rss_kb INTEGER,
+            log_path TEXT,
+            errors INTEGER,
+            warnings INTEGER,
+            first_error TEXT,
+            reason TEXT
+        )""")
+
+        # Add any columns that are missing from databases created by older versions
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(builds)")}
+        for column, type in self.BUILD_COLUMNS.items():
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE builds ADD COLUMN {column} {type}")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS footprints (
+            run_id INTEGER REFERENCES runs(id),
+            target TEXT,
+            board TEXT,
+            project TEXT,
+            elf TEXT,
+            text INTEGER,
+            data INTEGER,
+            bss INTEGER
+        )""")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS footprint_objects (
+            run_id INTEGER REFERENCES runs(id),
+            target TEXT,
+            board TEXT,
+            project TEXT,
+            object TEXT,
+            text INTEGER,
+            data INTEGER,
+            bss INTEGER
+        )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS builds_run ON builds(run_id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS footprints_run ON footprints(run_id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS footprint_objects_run ON footprint_objects(run_id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS builds_combination ON builds(target, board, project)")
+        self.conn.commit()
+
+    def start_run(self, started, platform, maxim_path) -> int:
+        cur = self.conn.execute(
+            "INSERT INTO runs (started, platform, maxim_path) VALUES (?, ?, ?)",
+            (started, platform, str(maxim_path))
+        )
+        self.conn.commit()
+        return cur.lastrowid
+
+    def record(self, run_id, target, board, project, phase, status, returncode=None,
+               wall_time=None, cpu_time=None, peak_rss_kb=None, log_path=None,
+               errors=None, warnings=None, first_error=None, reason=None):
+        """
+        Record one phase of a build.  'status' is one of "passed", "failed", "cached",
+        "cancelled", or "skipped".  'errors' and 'warnings' count the compiler diagnostics in the build's output.
+        'reason' says why a build was skipped.
+        Records are committed by commit() (or close()) so they can be written in bulk.
+        """
+        self.conn.execute(
+            """INSERT INTO builds (run_id, target, board, project, phase, status, returncode, wall_time, cpu_time,
+                                   peak_rss_kb, log_path, errors, warnings, first_error, reason)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (run_id, target, board, project, phase, status, returncode, wall_time, cpu_time, peak_rss_kb,
+             None if log_path is None else str(log_path), errors, warnings, first_error, reason)
+        )
+
+    def record_footprint(self, run_id, target, board, project, footprint: dict):
+        """
+        Record the firmware size of a build (see footprint.measure).  Committed along with the
+        build records.
+        """
+        self.conn.execute(
+            "INSERT INTO footprints (run_id, target, board, project, elf, text, data, bss) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, target, board, project, footprint["elf"], footprint["text"], footprint["data"], footprint["bss"])
+        )
+        self.conn.executemany(
+            "INSERT INTO footprint_objects (run_id, target, board, project, object, text, data, bss) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, target, board, project, obj, s["text"], s["data"], s["bss"]) for obj, s in footprint["objects"].items()]
+        )
+
+    def footprints(self, run_id) -> dict:
+        """
+        The footprints recorded in a run, as {"target/board/project": {"elf", "text", "data", "bss", "objects"}}
+        """
+        footprints = {}
+        for target, board, project, elf, text, data, bss in self.conn.execute(
+                "SELECT target, board, project, elf, text, data, bss FROM footprints WHERE run_id = ? ORDER BY rowid", (run_id,)):
+            footprints[f"{target}/{board}/{project}"] = {"elf": elf, "text": text, "data": data, "bss": bss, "objects": {}}
+        for target, board, project, obj, text, data, bss in self.conn.execute(
+                "SELECT target, board, project, object, text, data, bss FROM footprint_objects WHERE run_id = ? ORDER BY rowid", (run_id,)):
+            footprints[f"{target}/{board}/{project}"]["objects"][obj] = {"text": text, "data": data, "bss": bss}
+        return footprints
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def builds(self, run_id) -> list:
+        self.conn.row_factory = sqlite3.Row
+        rows = self.conn.execute("SELECT * FROM builds WHERE run_id = ? ORDER BY rowid", (run_id,)).fetchall()
+        self.conn.row_factory = None
+        return [dict(r) for r in rows]
+
+    def durations(self, phase="build", runs=5) -> dict:
+        """
+        Average wall time of each (target, board, project) over its last 'runs' completed (passed
+        or failed) builds, used to balance the build matrix across workers
+        """
+        rows = self.conn.execute(
+            """SELECT target, board, project, wall_time FROM builds
+                WHERE phase = ? AND status IN ('passed', 'failed') AND wall_time IS NOT NULL
+                ORDER BY run_id DESC""", (phase,)
+        ).fetchall()
+        times = {}
+        for target, board, project, wall_time in rows:
+            t = times.setdefault((target, board, project), [])
+            if len(t) < runs:
+                t.append(wall_time)
+        return {key: sum(t) / len(t) for key, t in times.items()}
+
+    def export_json(self, run_id, path):
+        run = self.conn.execute("SELECT started, platform, maxim_path FROM runs WHERE id = ?", (run_id,)).fetchone()
+        with open(path, "w") as f:
+            json.dump({
+                "run": run_id,
+                "started": run[0],
+                "platform": run[1],
+                "maxim_path": run[2],
+                "builds": self.builds(run_id)
+            }, f, indent=4)
+
+    def export_junit(self, run_id, path):
+        """
+        Export a run as JUnit XML.  There's a test suite per target, and a test case per
+        (board, project) combination with its phases combined.
+        """
+        cases = {}
+        for b in self.builds(run_id):
+            case = cases.setdefault((b["target"], b["board"], b["project"]), {"time": 0.0, "failures": [], "cached": False, "skipped": None})
+            case["time"] += b["wall_time"] or 0.0
+            if b["status"] == "failed":
+                case["failures"].append(b)
+            elif b["status"] == "cached":
+                case["cached"] = True
+            elif b["status"] == "cancelled":
+                case["skipped"] = "Cancelled by --fail-fast"
+            elif b["status"] == "skipped":
+                case["skipped"] = b["reason"] or "Not built"
+
+        root = ElementTree.Element("testsuites", name="maintain.py test")
+        suites = {}
+        for (target, board, project), case in cases.items():
+            if target not in suites:
+                suites[target] = ElementTree.SubElement(root, "testsuite", name=target, tests="0", failures="0", time="0")
+            suite = suites[target]
+            suite.set("tests", str(int(suite.get("tests")) + 1))
+            suite.set("time", str(round(float(suite.get("time")) + case["time"], 4)))
+
+            testcase = ElementTree.SubElement(suite, "testcase", classname=f"{target}.{board}", name=project, time=str(round(case["time"], 4)))
+            if case["failures"]:
+                suite.set("failures", str(int(suite.get("failures")) + 1))
+            for failure in case["failures"]:
+                message = f"{failure['phase']} failed" + (f" with return code {failure['returncode']}" if failure["returncode"] is not None else "")
+                el = ElementTree.SubElement(testcase, "failure", message=message)
+                text = [failure["first_error"], f"See {failure['log_path']}" if failure["log_path"] else None]
+                el.text = "\n".join(t for t in text if t) or None
+            if case["skipped"]:
+                ElementTree.SubElement(testcase, "skipped", message=case["skipped"])
+            if case["cached"]:
+                ElementTree.SubElement(testcase, "system-out").text = "Passed in a previous run (cached)"
+
+        ElementTree.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
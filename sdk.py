@@ -0,0 +1,215 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+# Index of the targets, boards, and example projects in an MSDK installation.
+#
+# Finding the examples for a target used to mean a full os.walk of Examples/<target> and
+# Libraries/Boards/<target>, which takes minutes on network-mounted checkouts.  The index is built
+# in a single os.scandir pass and saved along with the mtime of every directory it read.  Adding,
+# removing, or renaming an entry updates its parent directory's mtime, so when the index is
+# re-opened only directories whose mtime has changed are listed again - the rest of the tree
+# costs one stat per directory.  project.mk files are also stat'd, since edits to them don't
+# show up in their directory's mtime.
+
+import json
+import os
+import re
+from pathlib import Path
+
+try:
+    from . import utils
+except ImportError:
+    import utils
+
+# Only the entries that identify examples and boards are kept for each directory
+_MARKERS = ("Makefile", "main.c", "project.mk", "board.mk")
+
+# A project.mk that assigns BOARD (rather than defaulting it with ?=) only builds for that board
+_PINNED_BOARD = re.compile(r"^\s*(?:override\s+)?BOARD\s*:?=\s*(\S+)", re.MULTILINE)
+_MK_COND = re.compile(r"^\s*(ifeq|ifneq|ifdef|ifndef)\b")
+
+def find_pinned_board(lines):
+    """
+    Return the board that a project.mk's lines pin BOARD to, or None.  Only unconditional
+    assignments of a literal board count: one inside an ifeq/ifdef block may not apply, and one
+    that references another variable ($(...)) can't be resolved here.
+    """
+    pinned = None
+    depth = 0
+    for line in lines:
+        if _MK_COND.match(line):
+            depth += 1
+        elif line.strip() == "endif":
+            depth = max(depth - 1, 0)
+        elif depth == 0:
+            match = _PINNED_BOARD.match(line)
+            if match:
+                pinned = None if "$" in match.group(1) else match.group(1)
+    return pinned
+
+class SDKIndex:
+    """
+    Index of an MSDK installation's targets, boards, and examples.  Open it with 'SDKIndex(maxim_path)',
+    which loads the saved index (if any) and refreshes whatever changed on disk.
+    """
+
+    VERSION = 2
+
+    def __init__(self, maxim_path, cache_file=None):
+        self.maxim_path = Path(maxim_path).resolve()
+        if cache_file is None:
+            cache_file = default_cache_file(self.maxim_path)
+        self.cache_file = Path(cache_file)
+        self.scanned = 0 # Directories listed (rather than just stat'd) while refreshing
+
+        saved = {}
+        try:
+            with open(self.cache_file, "r") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION and data.get("maxim_path") == str(self.maxim_path):
+                saved = data
+        except (OSError, ValueError):
+            pass
+
+        self._dirs = saved.get("dirs", {})
+        self._pinned = saved.get("pinned", {})
+        self.refresh()
+
+    def refresh(self) -> int:
+        """
+        Bring the index up to date with the SDK on disk, and save it if anything changed.  Called
+        on open, and again by long-running callers (see daemon.py).  Returns the number of
+        directories that were re-listed.
+        """
+        scanned = self.scanned
+        saved_dirs, saved_pinned = self._dirs, self._pinned
+        self._dirs = {}
+        self._pinned = {}
+        for root in ("Examples", "Libraries/Boards"):
+            self._refresh(root, saved_dirs)
+        for rel, entries in self._dirs.items():
+            if "project.mk" in entries["files"]:
+                self._refresh_pinned(rel, saved_pinned.get(rel))
+
+        if self._dirs != saved_dirs or self._pinned != saved_pinned:
+            self.save()
+        return self.scanned - scanned
+
+    def _refresh(self, rel, saved_dirs):
+        """
+        Bring the entry for directory 'rel' (relative to maxim_path, "/"-separated) and everything
+        below it up to date, re-listing only directories whose mtime has changed.
+        """
+        path = self.maxim_path.joinpath(rel)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return
+
+        entries = saved_dirs.get(rel)
+        if entries is None or entries["mtime"] != mtime:
+            self.scanned += 1
+            subdirs = []
+            files = []
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if entry.is_dir():
+                            subdirs.append(entry.name)
+                        elif entry.name in _MARKERS:
+                            files.append(entry.name)
+            except OSError:
+                return
+            entries = {"mtime": mtime, "dirs": sorted(subdirs), "files": sorted(files)}
+
+        self._dirs[rel] = entries
+        for name in entries["dirs"]:
+            self._refresh(f"{rel}/{name}", saved_dirs)
+
+    def _refresh_pinned(self, rel, saved):
+        project_mk = self.maxim_path.joinpath(rel, "project.mk")
+        try:
+            mtime = os.stat(project_mk).st_mtime_ns
+        except OSError:
+            return
+        if saved is not None and saved[0] == mtime:
+            self._pinned[rel] = saved
+            return
+
+        with open(project_mk, "r", errors="replace") as f:
+            pinned = find_pinned_board(f.read().splitlines())
+        self._pinned[rel] = [mtime, pinned]
+
+    def save(self):
+        data = json.dumps({
+            "version": self.VERSION,
+            "maxim_path": str(self.maxim_path),
+            "dirs": self._dirs,
+            "pinned": self._pinned
+        })
+        try:
+            os.makedirs(self.cache_file.parent, exist_ok=True)
+            utils.atomic_write(self.cache_file, data.encode("utf-8"))
+        except OSError:
+            pass # The index is only a cache
+
+    def _walk(self, rel):
+        """Yield (rel, files) for 'rel' and every directory below it, in sorted order."""
+        entries = self._dirs.get(rel)
+        if entries is None:
+            return
+        yield rel, entries["files"]
+        for name in entries["dirs"]:
+            yield from self._walk(f"{rel}/{name}")
+
+    def targets(self) -> list:
+        """Targets are the subdirectories of Examples"""
+        return list(self._dirs.get("Examples", {}).get("dirs", []))
+
+    def boards(self, target) -> list:
+        """Boards supported by 'target', i.e. the folders under Libraries/Boards/<target> with a board.mk"""
+        return sorted({Path(rel).name for rel, files in self._walk(f"Libraries/Boards/{target}") if "board.mk" in files})
+
+    def examples(self, target) -> list:
+        """Example projects for 'target'.  A folder with a Makefile and a main.c or project.mk is an example."""
+        return sorted(
+            self.maxim_path.joinpath(rel) for rel, files in self._walk(f"Examples/{target}")
+            if "Makefile" in files and ("main.c" in files or "project.mk" in files)
+        )
+
+    def pinned_board(self, example) -> str:
+        """The board an example's project.mk fixes BOARD to, or None if it builds for any board"""
+        rel = Path(example).resolve().relative_to(self.maxim_path).as_posix()
+        pinned = self._pinned.get(rel)
+        return pinned[1] if pinned else None
+
+    def compatible(self, target, board) -> list:
+        """Examples for 'target' that can be built for 'board'"""
+        if board not in self.boards(target):
+            return []
+        return [e for e in self.examples(target) if self.pinned_board(e) in (None, board)]
+
+def default_cache_file(maxim_path) -> Path:
+    """
+    Location of the saved index for an SDK.  The directory can be overridden with the
+    VSCODE_MAXIM_SDK_INDEX_DIR environment variable.
+    """
+    cache_dir = os.environ.get("VSCODE_MAXIM_SDK_INDEX_DIR", Path.home().joinpath(".cache", "vscode-maxim"))
+    return Path(cache_dir).joinpath(f"sdkindex-{utils.hash(str(maxim_path)).hex()[:16]}.json")
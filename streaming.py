@@ -0,0 +1,233 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+# Streaming runner for build commands.
+#
+# Build output is copied to the build's log file as it arrives instead of being buffered until
+# the command exits, so hung or runaway builds can be watched with 'tail -f'.  Only the last
+# few lines are kept in memory.  Compiler and linker diagnostics are parsed from the stream as
+# they arrive, which lets the test harness stop the whole matrix as soon as the first error
+# shows up.  Commands run as asyncio subprocesses, so one thread can supervise many builds.
+
+import asyncio
+import os
+import re
+import signal
+import sys
+import time
+from collections import deque
+from subprocess import Popen, PIPE, STDOUT, CompletedProcess
+
+CHUNK_SIZE = 64 * 1024
+TAIL_LINES = 50       # Lines of output kept in memory for log messages
+MAX_LINE = 16 * 1024  # Longer lines are truncated for parsing (the log file gets all of them)
+MAX_DIAGNOSTICS = 100 # Diagnostics kept per command.  All of them are counted.
+KILL_GRACE = 5        # Seconds between asking a timed-out build to stop and killing it
+
+# GCC-style "file:line[:column]: severity: message", "collect2: error: ...", and linker errors
+# like "main.c:(.text.main+0x8): undefined reference to `foo'"
+_COMPILER = re.compile(r"^(?P<file>(?:[A-Za-z]:)?[^:]+):(?P<line>\d+):(?:(?P<column>\d+):)?\s+(?P<severity>fatal error|error|warning):\s+(?P<message>.*)$")
+_TOOL = re.compile(r"^(?P<file>(?:[A-Za-z]:)?[^:\s]+):\s+(?P<severity>fatal error|error):\s+(?P<message>.*)$")
+_LINKER = re.compile(r"^(?P<file>(?:[A-Za-z]:)?[^:]+):\(.*?\):\s+(?P<message>(?:undefined reference to|multiple definition of) .*)$")
+
+def parse_diagnostic(line: str) -> dict:
+    """
+    Parse a line of build output into a diagnostic {"file", "line", "column", "severity",
+    "message"}, or return None if it isn't one.  "fatal error" is reported as an "error".
+    """
+    for pattern in (_COMPILER, _LINKER, _TOOL):
+        match = pattern.match(line)
+        if match:
+            d = match.groupdict()
+            return {
+                "file": d["file"],
+                "line": int(d["line"]) if d.get("line") else None,
+                "column": int(d["column"]) if d.get("column") else None,
+                "severity": "warning" if d.get("severity") == "warning" else "error",
+                "message": d["message"].strip()
+            }
+    return None
+
+class _Process:
+    """
+    A shell command with its combined stdout/stderr connected to an asyncio stream.  On POSIX the
+    process is reaped with os.wait4() so that its CPU time and peak RSS can be reported, which
+    asyncio's own subprocesses don't expose.
+    """
+    @classmethod
+    async def start(cls, cmd, env=None, cwd=None):
+        self = cls()
+        loop = asyncio.get_running_loop()
+        if hasattr(os, "wait4"):
+            # A new session puts the build and everything it starts in one process group
+            self.popen = Popen(cmd, shell=True, env=env, cwd=cwd, stdin=PIPE, stdout=PIPE, stderr=STDOUT, start_new_session=True)
+            self.popen.stdin.close()
+            self.stdout = asyncio.StreamReader(limit=CHUNK_SIZE)
+            await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(self.stdout), self.popen.stdout)
+            self.pid = self.popen.pid
+            self.proc = None
+        else:
+            self.proc = await asyncio.create_subprocess_shell(cmd, env=env, cwd=cwd, stdin=asyncio.subprocess.DEVNULL, stdout=PIPE, stderr=STDOUT)
+            self.stdout = self.proc.stdout
+            self.pid = self.proc.pid
+        return self
+
+    def signal(self, kill=False):
+        """Ask the process and all of its children to stop, or kill them if 'kill' is set"""
+        try:
+            if self.proc is None:
+                os.killpg(self.pid, signal.SIGKILL if kill else signal.SIGTERM)
+            elif sys.platform == "win32":
+                Popen(f"taskkill /T /F /PID {self.pid}", shell=True, stdout=PIPE, stderr=STDOUT).wait()
+            else:
+                self.proc.kill() if kill else self.proc.terminate()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    async def wait(self):
+        """Wait for the process to exit and return (returncode, cpu_time, peak_rss_kb)"""
+        if self.proc is not None:
+            return await self.proc.wait(), None, None
+
+        loop = asyncio.get_running_loop()
+        _, status, usage = await loop.run_in_executor(None, os.wait4, self.pid, 0)
+        self.popen.returncode = os.waitstatus_to_exitcode(status)
+        peak_rss = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+        return self.popen.returncode, usage.ru_utime + usage.ru_stime, peak_rss
+
+async def stream_cmd(cmd, log_file, env=None, cwd=None, timeout=None, cancel=None, on_diagnostic=None, header=None, append=False):
+    """
+    Run a shell command, streaming its combined stdout/stderr to 'log_file' (after 'header', if
+    given).  'on_diagnostic' is called with each diagnostic as it's parsed.  The command is
+    stopped if it runs longer than 'timeout' seconds, or if the 'cancel' asyncio.Event is set.
+
+    Returns a CompletedProcess whose 'stdout' holds the last TAIL_LINES lines of output, annotated
+    with 'duration', 'cpu_time', 'peak_rss' (KB), 'diagnostics' (the first MAX_DIAGNOSTICS),
+    'errors' and 'warnings' (counts), 'first_error', 'timed_out', 'cancelled', and 'log_path'.
+    """
+    start = time.perf_counter()
+    tail = deque(maxlen=TAIL_LINES)
+    diagnostics = []
+    counts = {"error": 0, "warning": 0}
+    first_error = None
+
+    def handle(raw: bytes):
+        nonlocal first_error
+        line = raw[:MAX_LINE].decode("utf-8", errors="replace").rstrip("\r")
+        tail.append(line)
+        d = parse_diagnostic(line)
+        if d is None:
+            return
+        counts[d["severity"]] += 1
+        if len(diagnostics) < MAX_DIAGNOSTICS:
+            diagnostics.append(d)
+        if d["severity"] == "error" and first_error is None:
+            first_error = d
+        if on_diagnostic is not None:
+            on_diagnostic(d)
+
+    with open(log_file, "ab" if append else "wb") as log:
+        if header:
+            log.write(header.encode("utf-8"))
+            log.flush()
+
+        proc = await _Process.start(cmd, env=env, cwd=cwd)
+
+        async def pump():
+            pending = b""
+            while (chunk := await proc.stdout.read(CHUNK_SIZE)):
+                log.write(chunk)
+                log.flush()
+                lines = (pending + chunk).split(b"\n")
+                pending = lines.pop()[:MAX_LINE]
+                for line in lines:
+                    handle(line)
+            if pending:
+                handle(pending)
+
+        # The timeout and 'cancel' cover the whole command: its output reaching EOF and its exit
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        pump_task = asyncio.ensure_future(pump())
+        exit_task = asyncio.ensure_future(proc.wait())
+        cancel_task = None
+        if cancel is not None:
+            cancel_task = asyncio.ensure_future(cancel.wait())
+
+        timed_out = cancelled = False
+        while not (pump_task.done() and exit_task.done()):
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                timed_out = True
+                break
+            waiters = [t for t in (pump_task, exit_task, cancel_task) if t is not None and not t.done()]
+            done, _ = await asyncio.wait(waiters, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if cancel_task in done:
+                cancelled = True
+                break
+        if cancel_task is not None:
+            cancel_task.cancel()
+
+        if timed_out or cancelled:
+            proc.signal()
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.gather(pump_task, exit_task)), KILL_GRACE)
+            except asyncio.TimeoutError:
+                proc.signal(kill=True)
+                try:
+                    await asyncio.wait_for(asyncio.shield(pump_task), KILL_GRACE)
+                except asyncio.TimeoutError:
+                    pass # Something outside the process group is holding the pipe open
+
+        # Stop reading before the log file is closed
+        if not pump_task.done():
+            pump_task.cancel()
+        try:
+            await pump_task
+        except asyncio.CancelledError:
+            pass
+
+        if timed_out or cancelled:
+            reason = f"Timed out after {timeout}s" if timed_out else "Cancelled"
+            log.write(f"\n[{'TIMEOUT' if timed_out else 'CANCELLED'}] {reason}\n".encode("utf-8"))
+            tail.append(reason)
+
+        returncode, cpu_time, peak_rss = await exit_task
+
+    res = CompletedProcess(cmd, returncode, stdout="\n".join(tail), stderr="")
+    res.duration = time.perf_counter() - start
+    res.cpu_time = cpu_time
+    res.peak_rss = peak_rss
+    res.diagnostics = diagnostics
+    res.errors = counts["error"]
+    res.warnings = counts["warning"]
+    res.first_error = first_error
+    res.timed_out = timed_out
+    res.cancelled = cancelled
+    res.log_path = log_file
+    return res
+
+def format_diagnostic(d: dict) -> str:
+    location = d["file"]
+    if d["line"] is not None:
+        location += f":{d['line']}"
+        if d["column"] is not None:
+            location += f":{d['column']}"
+    return f"{location}: {d['severity']}: {d['message']}"
@@ -0,0 +1,40 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+import buildmatrix
+import sdk
+
+def test_pinned_board_ignores_conditional_and_variable_assignments():
+    assert sdk.find_pinned_board(["BOARD=FTHR_RevA"]) == "FTHR_RevA"
+    assert sdk.find_pinned_board(["BOARD?=FTHR_RevA"]) is None
+    assert sdk.find_pinned_board(["ifeq ($(CAMERA),OV7692)", "BOARD=FTHR_RevA", "endif"]) is None
+    assert sdk.find_pinned_board(["BOARD=$(DEFAULT_BOARD)"]) is None
+
+def test_representative_builds_every_example():
+    valid = {
+        ("A", "EvKit_V1"): {"PeriphDrivers/gpio.h"},
+        ("A", "FTHR_RevA"): {"PeriphDrivers/gpio.h", "PeriphDrivers/uart.h"},
+        ("B", "EvKit_V1"): {"PeriphDrivers/gpio.h"},
+    }
+    assert buildmatrix.representative(valid) == [("A", "FTHR_RevA"), ("B", "EvKit_V1")]
+
+def test_representative_without_units_builds_everything():
+    valid = {("A", "EvKit_V1"): set(), ("B", "EvKit_V1"): set()}
+    assert buildmatrix.representative(valid) == [("A", "EvKit_V1"), ("B", "EvKit_V1")]
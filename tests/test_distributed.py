@@ -0,0 +1,156 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+
+import time
+import threading
+import pytest
+
+import distributed
+
+def _start_worker(run_shard):
+    server = distributed.WorkerServer(("127.0.0.1", 0), run_shard, {"maxim_path": "/sdk", "jobs": 1, "make_jobs": 1})
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"127.0.0.1:{server.server_address[1]}"
+
+@pytest.fixture
+def workers():
+    servers = []
+    def start(run_shard):
+        server, url = _start_worker(run_shard)
+        servers.append(server)
+        return server, url
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def _builds(n):
+    return {i: {"target": "MAX78000", "board": "EvKit_V1", "project": f"Examples/MAX78000/P{i}"} for i in range(n)}
+
+def _build_all(builds):
+    return [{"project": b["project"]} for b in builds]
+
+def test_dead_worker_shards_move_to_the_others(workers):
+    built = []
+    def good(request, cancel):
+        built.extend(b["project"] for b in request["builds"])
+        time.sleep(0.05) # Leave some shards for the dead worker to pick up
+        return _build_all(request["builds"])
+
+    _, good_url = workers(good)
+    dead, dead_url = workers(good)
+    coordinator = distributed.Coordinator([good_url, dead_url], logger=lambda s: None)
+    dead.shutdown()
+    dead.server_close()
+
+    builds = _builds(12)
+    futures = coordinator.submit(builds, {}, {})
+    results = {key: f.result(timeout=10) for key, f in futures.items()}
+    assert {key: r["project"] for key, r in results.items()} == {key: b["project"] for key, b in builds.items()}
+    assert sorted(built) == sorted(b["project"] for b in builds.values())
+    assert coordinator.workers == [f"http://{good_url}"]
+
+def test_hung_worker_times_out_and_is_cancelled(workers, monkeypatch):
+    monkeypatch.setattr(distributed, "SHARD_TIMEOUT_MIN", 1.0)
+    cancelled = threading.Event()
+    def hung(request, cancel):
+        if cancel.wait(10):
+            cancelled.set()
+        return [None for _ in request["builds"]]
+
+    def good(request, cancel):
+        return _build_all(request["builds"])
+
+    _, hung_url = workers(hung)
+    _, good_url = workers(good)
+    coordinator = distributed.Coordinator([hung_url, good_url], logger=lambda s: None)
+
+    builds = _builds(8)
+    futures = coordinator.submit(builds, {key: 0.1 for key in builds}, {})
+    assert all(f.result(timeout=15) is not None for f in futures.values())
+    assert cancelled.wait(5)
+
+def test_slow_worker_that_answers_cancel_stays_in_use(workers, monkeypatch):
+    monkeypatch.setattr(distributed, "SHARD_TIMEOUT_MIN", 1.0)
+    first = threading.Event()
+    def slow_once(request, cancel):
+        if not first.is_set():
+            first.set()
+            cancel.wait(10)
+            return [None for _ in request["builds"]]
+        return _build_all(request["builds"])
+
+    _, url = workers(slow_once)
+    coordinator = distributed.Coordinator([url], logger=lambda s: None)
+
+    builds = _builds(4)
+    futures = coordinator.submit(builds, {key: 0.1 for key in builds}, {})
+    assert all(f.result(timeout=15) is not None for f in futures.values())
+    assert coordinator.workers == [f"http://{url}"]
+
+def test_hung_workers_run_out_of_budget_and_fail_the_rest(workers, monkeypatch):
+    monkeypatch.setattr(distributed, "SHARD_TIMEOUT_MIN", 1.0)
+    def hung(request, cancel):
+        cancel.wait(10)
+        return [None for _ in request["builds"]]
+
+    _, url = workers(hung)
+    coordinator = distributed.Coordinator([url], logger=lambda s: None)
+
+    builds = _builds(2)
+    futures = coordinator.submit(builds, {key: 0.1 for key in builds}, {})
+    for f in futures.values():
+        with pytest.raises(distributed.ShardError, match="No build workers left"):
+            f.result(timeout=15)
+    assert coordinator.workers == []
+
+def test_rejected_shard_fails_only_its_builds(workers):
+    def picky(request, cancel):
+        for b in request["builds"]:
+            if b["project"].endswith("P3"):
+                raise Exception(f"Unknown build {b}")
+        return _build_all(request["builds"])
+
+    _, url_a = workers(picky)
+    _, url_b = workers(picky)
+    coordinator = distributed.Coordinator([url_a, url_b], logger=lambda s: None)
+
+    builds = _builds(16)
+    futures = coordinator.submit(builds, {}, {})
+    rejected = []
+    for key, f in futures.items():
+        try:
+            assert f.result(timeout=10)["project"] == builds[key]["project"]
+        except distributed.ShardError as e:
+            assert "Unknown build" in str(e)
+            rejected.append(key)
+
+    # Only the shard holding P3 fails, and both workers stay in use
+    assert 3 in rejected and len(rejected) < len(builds)
+    assert len(coordinator.workers) == 2
+
+def test_plan_shards_balances_estimates():
+    estimates = {i: float(i) for i in range(1, 21)}
+    shards = distributed.plan_shards(list(estimates), estimates, workers=2, shards_per_worker=2)
+    assert sorted(b for _, shard in shards for b in shard) == list(estimates)
+    costs = [cost for cost, _ in shards]
+    assert costs == sorted(costs, reverse=True)
+    assert max(costs) - min(costs) <= max(estimates.values())
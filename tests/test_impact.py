@@ -0,0 +1,41 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+import impact
+
+def test_failed_and_empty_builds_are_always_selected(tmp_path):
+    index = impact.DependencyIndex(tmp_path.joinpath("depindex.json"), tmp_path)
+    ok = ("MAX78000", "EvKit_V1", "Examples/MAX78000/Hello_World")
+    broken = ("MAX78000", "EvKit_V1", "Examples/MAX78000/GPIO")
+    empty = ("MAX78000", "EvKit_V1", "Examples/MAX78000/CameraIF")
+    index.update(*ok, ["Examples/MAX78000/Hello_World/main.c"])
+    index.update(*broken, [], succeeded=False)
+    index.update(*empty, [])
+    index.save()
+
+    index = impact.DependencyIndex(tmp_path.joinpath("depindex.json"), tmp_path)
+    selected = impact.select(index, ["Examples/MAX78000/Hello_World/main.c"], [ok, broken, empty], ["MAX78000"], tmp_path)
+    assert selected[ok] == "Reads Examples/MAX78000/Hello_World/main.c"
+    assert selected[broken] == "Failed last time"
+    assert selected[empty] == "No dependency information yet"
+
+    # Succeeding again clears the failure
+    index.update(*broken, ["Examples/MAX78000/GPIO/main.c"])
+    assert not index.failed(*broken) and index.known(*broken)
@@ -0,0 +1,61 @@
+###############################################################################
+ #
+ # Copyright (C) 2022-2023 Maxim Integrated Products, Inc. (now owned by
+ # Analog Devices, Inc.),
+ # Copyright (C) 2023-2024 Analog Devices, Inc.
+ #
+ # Licensed under the Apache License, Version 2.0 (the "License");
+ # you may not use this file except in compliance with the License.
+ # You may obtain a copy of the License at
+ #
+ #     http://www.apache.org/licenses/LICENSE-2.0
+ #
+ # Unless required by applicable law or agreed to in writing, software
+ # distributed under the License is distributed on an "AS IS" BASIS,
+ # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ # See the License for the specific language governing permissions and
+ # limitations under the License.
+ #
+ ##############################################################################
+
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+here = Path(__file__).parent.parent
+
+# Import-time budget for 'import generate' in a fresh interpreter, in milliseconds.  Slower
+# machines can raise it with the MSDK_IMPORT_BUDGET_MS environment variable.
+IMPORT_BUDGET_MS = float(os.environ.get("MSDK_IMPORT_BUDGET_MS", 50))
+
+_SCRIPT = """
+import sys, time, json
+t = time.perf_counter()
+import generate
+elapsed = time.perf_counter() - t
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+def _import_generate():
+    res = subprocess.run([sys.executable, "-c", _SCRIPT], cwd=here, capture_output=True, text=True, check=True)
+    return json.loads(res.stdout)
+
+def test_import_generate_within_budget():
+    # Best of a few runs, so that a busy machine doesn't fail the test
+    elapsed = min(_import_generate()["elapsed"] for _ in range(5)) * 1000
+    assert elapsed <= IMPORT_BUDGET_MS, f"'import generate' took {elapsed:.1f} ms (budget: {IMPORT_BUDGET_MS:.0f} ms)"
+
+def test_import_generate_is_lazy():
+    modules = _import_generate()["modules"]
+    for module in ["maintain", "argparse", "concurrent.futures"]:
+        assert module not in modules, f"'import generate' also imported {module}"
+
+def test_import_maintain_is_lazy():
+    # generate imports maintain for sync(), so the test harness modules are only loaded by its subcommands
+    res = subprocess.run([sys.executable, "-c", "import sys, json, maintain; print(json.dumps(sorted(sys.modules)))"],
+                         cwd=here, capture_output=True, text=True, check=True)
+    modules = json.loads(res.stdout)
+    for module in ["asyncio", "results", "streaming", "distributed", "footprint", "logstore", "impact"]:
+        assert module not in modules, f"'import maintain' also imported {module}"
@@ -23,6 +23,12 @@ import json
 from pathlib import Path
 import hashlib
 import os
+import mmap
+import shutil
+import stat
+import tempfile
+import threading
+import time
 
 class UpperDict(MutableMapping):
     def __init__(self, *args, **kwargs):
@@ -51,12 +57,11 @@ def parse_json(filename):
     """
     Parse values from a json file into a template-friendly (all-caps keys) dictionary
     """
-    f = open(filename, "r")
-    d = json.load(f)
+    with open(filename, "r") as f:
+        d = json.load(f)
     return UpperDict(d)
 
 # Timer wrapper function
-import time
 def time_me(f):
 
     def wrapper(*args, **kwargs):
@@ -70,41 +75,289 @@ def time_me(f):
 
     return wrapper
 
-def hash(val):
+# Files are hashed in fixed-size chunks so that large binaries (CNN weights, libraries, etc.)
+# are never loaded into memory all at once.  Files above the mmap threshold are hashed straight
+# from a read-only memory map instead.
+CHUNK_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+def hash(val, algorithm="sha1"):
     if not isinstance(val, bytes):
         val = bytes(val, encoding="utf-8")
-    return hashlib.sha1(val).digest()
+    return hashlib.new(algorithm, val).digest()
+
+def hash_file(filepath, algorithm="sha1", chunk_size=CHUNK_SIZE, use_mmap=None) -> bytes:
+    """
+    Hash the contents of a file without reading the whole file into memory.  'algorithm' can be
+    any algorithm supported by hashlib (ex: "blake2b" is faster than sha1 on 64-bit machines).
+    If 'use_mmap' is None, files larger than MMAP_THRESHOLD are memory-mapped.
+    """
+    h = hashlib.new(algorithm)
+    with open(Path(filepath), 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if use_mmap is None:
+            use_mmap = size >= MMAP_THRESHOLD
+
+        if use_mmap and size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                h.update(m)
+        else:
+            buf = bytearray(chunk_size)
+            view = memoryview(buf)
+            while (n := f.readinto(buf)):
+                h.update(view[:n])
+
+    return h.digest()
+
+class HashIndex:
+    """
+    Persistent index of file digests, keyed on each file's (path, size, mtime_ns, inode).
+
+    Files whose stat info hasn't changed since they were last hashed get their digest from the
+    index instead of being re-read.  New digests are kept in memory and appended to the index file
+    in bulk by save().  The index file is a JSON-lines file, one entry per line, where later entries
+    for the same path win.
+    """
+
+    # Files modified within this window of being hashed aren't recorded.  A file that is modified
+    # again within the same timestamp tick would otherwise keep a stale digest.
+    RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+    def __init__(self, path, algorithm="sha1"):
+        self.path = Path(path)
+        self.algorithm = algorithm
+        self._entries = {}
+        self._dirty = {}
+        self._lines = 0
+        self._lock = threading.Lock()
+
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except ValueError:
+                        continue # Skip lines truncated by an interrupted save
+
+                    if e.get("algorithm") == algorithm:
+                        self._entries[e["path"]] = (e["size"], e["mtime_ns"], e["ino"], e["digest"])
+                    self._lines += 1
+
+    def hash_file(self, filepath) -> bytes:
+        filepath = os.path.abspath(filepath)
+        st = os.stat(filepath)
+        key = (st.st_size, st.st_mtime_ns, st.st_ino)
+
+        entry = self._entries.get(filepath)
+        if entry is not None and entry[:3] == key:
+            return bytes.fromhex(entry[3])
+
+        digest = hash_file(filepath, self.algorithm)
+        if time.time_ns() - st.st_mtime_ns > self.RACY_WINDOW_NS:
+            with self._lock:
+                self._entries[filepath] = self._dirty[filepath] = key + (digest.hex(),)
+
+        return digest
+
+    def save(self):
+        """
+        Write any new entries to the index file.  The file is compacted when it holds
+        more than twice as many lines as there are live entries.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self._lines + len(self._dirty) > 2 * len(self._entries):
+                entries, mode = self._entries, "w"
+                self._lines = 0
+            else:
+                entries, mode = self._dirty, "a"
+
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp") if mode == "w" else self.path
+            with open(tmp, mode, encoding="utf-8") as f:
+                for path, (size, mtime_ns, ino, digest) in entries.items():
+                    f.write(json.dumps({
+                        "path":path,
+                        "size":size,
+                        "mtime_ns":mtime_ns,
+                        "ino":ino,
+                        "algorithm":self.algorithm,
+                        "digest":digest
+                        }) + "\n")
+            if mode == "w":
+                os.replace(tmp, self.path)
+
+            self._lines += len(entries)
+            self._dirty = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.save()
 
-def hash_file(filepath):
-    return hash(open(Path(filepath), 'rb').read())
+_default_hash_index = None
+def default_hash_index() -> HashIndex:
+    """
+    Get the per-user hash index, opening it on first use.  Its location can be overridden with
+    the VSCODE_MAXIM_HASH_INDEX environment variable.
+    """
+    global _default_hash_index
+    if _default_hash_index is None:
+        path = os.environ.get("VSCODE_MAXIM_HASH_INDEX", Path.home().joinpath(".cache", "vscode-maxim", "hashindex.jsonl"))
+        _default_hash_index = HashIndex(path)
+    return _default_hash_index
+
+def hash_folder(folderpath, algorithm="sha1", workers=None, index=None) -> bytes:
+    """
+    Hash the contents and relative paths of every file in a folder tree.  The tree is walked in
+    sorted order so the result doesn't depend on the filesystem.  If 'workers' is set, files are
+    hashed concurrently on a thread pool of that size.  If a HashIndex is given, unchanged files
+    are looked up in the index instead of being re-read (the index's algorithm is used).
+    """
+    if index is not None:
+        algorithm = index.algorithm
+        hash_fn = index.hash_file
+    else:
+        hash_fn = lambda f: hash_file(f, algorithm)
 
-def hash_folder(folderpath) -> bytes:
     folderpath = Path(folderpath)
-    result = b''
-    for dir, subdirs, files in os.walk(folderpath):
-        for f in sorted(files):
-            file_path = Path(dir).joinpath(f)
-            relative_path = file_path.relative_to(folderpath)
+    files = []
+    for dir, subdirs, names in os.walk(folderpath):
+        subdirs.sort()
+        for f in sorted(names):
+            files.append(Path(dir).joinpath(f))
+
+    if workers:
+        from concurrent.futures import ThreadPoolExecutor # Imported on demand to keep import time down
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            digests = list(executor.map(hash_fn, files))
+    else:
+        digests = (hash_fn(f) for f in files)
+
+    # Feed everything into a single incremental hasher
+    result = hashlib.new(algorithm)
+    for file_path, digest in zip(files, digests):
+        relative_path = file_path.relative_to(folderpath)
+        result.update(bytes(relative_path.as_posix(), encoding="utf-8") + b"\0" + digest)
+
+    return result.digest()
+
+# Permissions of the files generated into projects (rwxrw-r--)
+PROJECT_FILE_MODE = stat.S_IRWXU | stat.S_IRGRP | stat.S_IWGRP | stat.S_IROTH
+
+# The process umask, read once at import since reading it means briefly changing it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def atomic_write(path, data: bytes, mode=None):
+    """
+    Write 'data' to a temporary file next to 'path' and then move it into place, so that readers
+    never see a half-written file.  'mode' sets the file's permissions; by default an existing
+    file keeps its own, and a new one gets the umask's default (like open() would give it).
+    """
+    path = Path(path)
+    if mode is None:
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
 
-            result = hash(result + hash_file(file_path) + bytes(str(relative_path), encoding="utf-8"))
-            
-    return result
+def atomic_copy(src, dst):
+    """
+    Copy the contents and permissions of 'src' to 'dst' through a temporary file (see atomic_write)
+    """
+    with open(src, "rb") as f:
+        data = f.read()
+    atomic_write(dst, data, stat.S_IMODE(os.stat(src).st_mode))
+
+# ioctl(2) request that makes a file share another file's data blocks (copy-on-write) on
+# filesystems that support it (Btrfs, XFS, bcachefs, ...)
+_FICLONE = 0x40049409
+
+def clone_file(src, dst, hardlink=False) -> str:
+    """
+    Place a copy of 'src' at 'dst' as cheaply as the filesystem allows, through a temporary file
+    (see atomic_write).  A reflink is tried first, then a hardlink if 'hardlink' is set, and a
+    byte-for-byte copy otherwise.  Hardlinks share the file with 'src', so they should only be
+    used between output folders that are never edited in place.
+
+    Returns the method that was used: "reflink", "hardlink", or "copy".
+    """
+    dst = Path(dst)
+    fd, tmp = tempfile.mkstemp(dir=dst.parent, prefix=f".{dst.name}.", suffix=".tmp")
+    try:
+        method = None
+        try:
+            import fcntl
+            with open(src, "rb") as f:
+                fcntl.ioctl(fd, _FICLONE, f.fileno())
+            method = "reflink"
+        except (ImportError, OSError):
+            pass
+        os.close(fd)
+        fd = None
+
+        if method is None and hardlink:
+            try:
+                os.remove(tmp)
+                os.link(src, tmp)
+                method = "hardlink"
+            except OSError:
+                pass
+
+        if method is None:
+            shutil.copyfile(src, tmp)
+            method = "copy"
+
+        if method != "hardlink":
+            shutil.copystat(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if fd is not None:
+            os.close(fd)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    return method
 
 def compare_content(content: str, file: Path) -> bool:
     """
     Compare the 'content' string to the existing content in 'file'.
 
-    It seems that when a file gets written there may be some metadata that is affecting
-    the hash functions.  As a result, this function writes 'content' to a temporary file,
-    then checks for equality using the temp file.
+    'content' is encoded in memory exactly as it would be written to disk in text mode (UTF-8,
+    with newlines translated to the platform's line separator), so no temporary file is needed.
+    A file with a different size is rejected without being read, otherwise it's compared chunk
+    by chunk.
     """
-    if not file.exists():
+    try:
+        size = os.stat(file).st_size
+    except FileNotFoundError:
+        return False
+
+    if os.linesep != "\n":
+        content = content.replace("\n", os.linesep)
+    expected = memoryview(content.encode("utf-8"))
+    if size != len(expected):
         return False
 
-    tmp = file.parent.joinpath("tmp")
-    with open(tmp, "w", encoding='utf-8') as f:
-        f.write(content)
+    offset = 0
+    with open(file, "rb") as f:
+        while (chunk := f.read(CHUNK_SIZE)):
+            if chunk != expected[offset:offset + len(chunk)]:
+                return False
+            offset += len(chunk)
 
-    match = (hash_file(file) == hash_file(tmp))
-    os.remove(tmp)
-    return match
\ No newline at end of file
+    return offset == len(expected)